@@ -0,0 +1,201 @@
+"""
+Replay example inputs (and synthetically scaled versions of them) through the full
+grouping pipeline with the offline embeddings stand-in, and report per-stage wall time,
+peak RSS, groups found and the tail size as JSON, to compare results between commits
+(and between the clustering engines).
+
+Run from the `backend` directory: `python -m benchmarks.clusterizer --output results.json`
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import resource
+import subprocess  # nosec
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from benchmarks.fake_embeddings import create_fake_embeddings_client
+from web_app.config import get_settings
+from web_app.models.clusterizer import GroupingPhrasesInput
+from web_app.tools.clusterizer import Clusterizer
+from web_app.tools.clusterizer.engines import create_clustering_engine
+
+settings = get_settings()
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+# Words to extend example phrases with, to scale the inputs synthetically
+SCALING_MODIFIERS = [
+    "2024",
+    "2025",
+    "tutorial",
+    "reaction",
+    "live",
+    "compilation",
+    "best",
+    "funny",
+    "shorts",
+    "tiktok",
+    "behind the scenes",
+    "slow motion",
+    "full video",
+    "new",
+    "explained",
+    "meme",
+]
+
+
+def load_example_phrases(example: str) -> list[str]:
+    with open(EXAMPLES_DIR / example / "input.json") as file:
+        return json.load(file)["phrases"]
+
+
+def scale_phrases(phrases: list[str], size: int) -> list[str]:
+    """
+    Extend the phrases deterministically with modifiers (and their pairs)
+    until reaching the requested number of unique phrases.
+    """
+    scaled = list(dict.fromkeys(phrases))
+    seen = set(scaled)
+    modifiers = SCALING_MODIFIERS + [
+        f"{x} {y}" for x in SCALING_MODIFIERS for y in SCALING_MODIFIERS if x != y
+    ]
+    for modifier in modifiers:
+        for phrase in phrases:
+            if len(scaled) >= size:
+                return scaled[:size]
+            candidate = f"{phrase} {modifier}"
+            if candidate not in seen:
+                seen.add(candidate)
+                scaled.append(candidate)
+    return scaled[:size]
+
+
+def _get_peak_rss_mb() -> float:
+    # Linux reports `ru_maxrss` in kilobytes, include parallel workers (children)
+    return round(
+        max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        )
+        / 1024,
+        1,
+    )
+
+
+async def _get_embeddings(phrases: list[str], dimensions: int) -> tuple[list[str], Any]:
+    async with create_fake_embeddings_client(dimensions=dimensions) as client:
+        return await Clusterizer.get_all_phrases_embeddings(
+            phrases_input=phrases, client=client, use_cache=False
+        )
+
+
+def run_case(
+    name: str, phrases: list[str], dimensions: int, engine: str
+) -> dict[str, Any]:
+    """
+    Run a single benchmark case, expected to run in a fresh process to measure peak RSS.
+    """
+    stages: dict[str, float] = {}
+    start = time.perf_counter()
+    sorted_unique_phrases = GroupingPhrasesInput(phrases=phrases).sorted_unique_phrases
+    embedded_phrases, embeddings = asyncio.run(
+        _get_embeddings(sorted_unique_phrases, dimensions)
+    )
+    stages["embeddings"] = time.perf_counter() - start
+    start = time.perf_counter()
+    groups, singles = create_clustering_engine(engine).clusterize_phrases(
+        embedded_phrases=embedded_phrases,
+        embeddings=embeddings,
+        max_tail_size=int(
+            len(embeddings)
+            * settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_TAIL_PERCENTAGE
+        ),
+    )
+    stages["clustering"] = time.perf_counter() - start
+    sizes = np.array([len(x.phrases) for x in groups.values()])
+    distances = np.array([x.avg_distance or 0 for x in groups.values()])
+    return {
+        "name": name,
+        "engine": engine,
+        "phrases": len(sorted_unique_phrases),
+        "dimensions": dimensions,
+        "stages_seconds": {x: round(y, 3) for x, y in stages.items()},
+        "total_seconds": round(sum(stages.values()), 3),
+        "peak_rss_mb": _get_peak_rss_mb(),
+        "groups": len(groups),
+        "grouped_phrases": sum(len(x.phrases) for x in groups.values()),
+        "tail_size": len(singles.phrases),
+        # Average similarity within groups, weighted by the group size
+        "weighted_avg_distance": (
+            round(float((sizes * distances).sum() / sizes.sum()), 4)
+            if len(sizes)
+            else None
+        ),
+    }
+
+
+def _get_commit() -> str | None:
+    try:
+        return subprocess.run(  # nosec
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--example", default="taylor_swift_dancing")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=[1000, 2000, 4000, 8000],
+        help="Synthetic input sizes, up to the API limit (8000).",
+    )
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=["kmeans", "threshold"],
+        help="Clustering engines to compare.",
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+    phrases = load_example_phrases(args.example)
+    cases = [(args.example, phrases)] + [
+        (f"{args.example}_x{size}", scale_phrases(phrases, size)) for size in args.sizes
+    ]
+    results = []
+    for name, case_phrases in cases:
+        for engine in args.engines:
+            # Fresh process per case, so peak RSS isn't affected by the previous cases
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                result = executor.submit(
+                    run_case, name, case_phrases, args.dimensions, engine
+                ).result()
+            print(json.dumps(result))
+            results.append(result)
+    report = {
+        "commit": _get_commit(),
+        "settings": asdict(settings.clusterizer),
+        "cases": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare parsing time of the embeddings API response for JSON floats vs base64.
+
+Run from the `backend` directory: `python -m benchmarks.embeddings_decoding`
+"""
+
+import argparse
+import base64
+import json
+import time
+from typing import Callable
+
+import httpx
+import numpy as np
+
+from web_app.tools.similarity_processor import (
+    parse_base64_embeddings,
+    parse_float_embeddings,
+)
+
+
+def _build_response(embeddings: np.ndarray, encoding_format: str) -> httpx.Response:
+    if encoding_format == "base64":
+        data = [
+            base64.b64encode(x.astype("<f4").tobytes()).decode() for x in embeddings
+        ]
+    else:
+        data = embeddings.tolist()
+    content = json.dumps(
+        {
+            "data": [
+                {"object": "embedding", "embedding": x, "index": i}
+                for i, x in enumerate(data)
+            ]
+        }
+    ).encode()
+    return httpx.Response(
+        200, content=content, headers={"Content-Type": "application/json"}
+    )
+
+
+def _measure(
+    parser: Callable[[httpx.Response], np.ndarray],
+    response: httpx.Response,
+    repeats: int,
+) -> float:
+    timings = []
+    for _ in range(repeats):
+        # Create a new response each time, as httpx caches the decoded text
+        fresh_response = httpx.Response(
+            200, content=response.content, headers=response.headers
+        )
+        start = time.perf_counter()
+        parser(fresh_response)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--phrases", type=int, default=1000)
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    embeddings = (
+        np.random.default_rng(42)
+        .normal(size=(args.phrases, args.dimensions))
+        .astype(np.float32)
+    )
+    results = {}
+    for encoding_format, format_parser in (
+        ("float", parse_float_embeddings),
+        ("base64", parse_base64_embeddings),
+    ):
+        response = _build_response(embeddings, encoding_format)
+        results[encoding_format] = {
+            "payload_mb": round(len(response.content) / 1024 / 1024, 2),
+            "parse_seconds": round(_measure(format_parser, response, args.repeats), 4),
+        }
+    results["speedup"] = round(
+        results["float"]["parse_seconds"] / results["base64"]["parse_seconds"], 1
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
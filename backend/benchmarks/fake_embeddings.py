@@ -0,0 +1,64 @@
+"""
+Deterministic offline stand-in for the OpenAI embeddings API, to run the pipeline
+without network. Phrases sharing words get close vectors, so the grouping behaves
+similar to the real embeddings (tighter for more shared words).
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+from functools import lru_cache
+
+import httpx
+import numpy as np
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.md5(text.encode(), usedforsecurity=False).hexdigest()[:8], 16)
+
+
+# Cached, so the repeated requests cost the simulated latency only
+@lru_cache(maxsize=None)
+def fake_embedding(phrase: str, dimensions: int) -> np.ndarray:
+    vector = np.zeros(dimensions, dtype=np.float64)
+    for token in phrase.split():
+        vector += np.random.default_rng(_seed(token)).normal(size=dimensions)
+    # Phrase-specific noise, so different phrases are never identical
+    vector += np.random.default_rng(_seed(phrase)).normal(scale=0.3, size=dimensions)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def create_fake_embeddings_client(
+    dimensions: int = 3072, latency: float = 0.0
+) -> httpx.AsyncClient:
+    """
+    Client that answers embeddings requests locally, in the same format as the API
+    (base64 or float, based on the requested `encoding_format`).
+    :param latency: Seconds to wait per request, to simulate the network
+    (between a half and the full latency, deterministic per request).
+    """
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if latency:
+            await asyncio.sleep(
+                latency * (0.5 + _seed(json.dumps(body["input"])) / 2**33)
+            )
+        data = []
+        for i, phrase in enumerate(body["input"]):
+            embedding = fake_embedding(phrase, body.get("dimensions") or dimensions)
+            data.append(
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": (
+                        base64.b64encode(embedding.astype("<f4").tobytes()).decode()
+                        if body.get("encoding_format") == "base64"
+                        else embedding.tolist()
+                    ),
+                }
+            )
+        return httpx.Response(200, json={"object": "list", "data": data})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
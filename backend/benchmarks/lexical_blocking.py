@@ -0,0 +1,66 @@
+"""
+Compare grouping with the lexical pre-blocking stage (phrases sharing distinctive words
+are clustered within their blocks) with the default KMeans chunking of all the phrases:
+clustering wall time and groups quality on the example inputs.
+
+Run from the `backend` directory: `python -m benchmarks.lexical_blocking`
+"""
+
+import argparse
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from benchmarks.clusterizer import load_example_phrases, scale_phrases
+from benchmarks.warm_start import run_variant
+
+VARIANTS: dict[str, dict[str, Any]] = {
+    "kmeans_chunks": {"LEXICAL_BLOCKING_ENABLED": False},
+    "lexical_blocks": {"LEXICAL_BLOCKING_ENABLED": True},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--example", default="taylor_swift_dancing")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[2000, 4000])
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    phrases = load_example_phrases(args.example)
+    cases = [(args.example, phrases)] + [
+        (f"{args.example}_x{size}", scale_phrases(phrases, size)) for size in args.sizes
+    ]
+    for name, case_phrases in cases:
+        results = []
+        for variant, overrides in VARIANTS.items():
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                results.append(
+                    executor.submit(
+                        run_variant,
+                        variant,
+                        overrides,
+                        case_phrases,
+                        args.dimensions,
+                        args.repeats,
+                    ).result()
+                )
+        chunks, blocks = results
+        print(
+            json.dumps(
+                {
+                    "case": name,
+                    "variants": results,
+                    "speedup": round(
+                        chunks["clustering_seconds"] / blocks["clustering_seconds"], 2
+                    ),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Measure lookups per second of the groups lookup index (search only, embeddings excluded)
+for different batch sizes.
+
+Run from the `backend` directory: `python -m benchmarks.lookup --backend brute`
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from web_app.tools.lookup.backends import create_lookup_index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", default="brute")
+    parser.add_argument("--groups", type=int, default=2000)
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+    start = time.perf_counter()
+    index = create_lookup_index(
+        args.backend,
+        rng.normal(size=(args.groups, args.dimensions)).astype(np.float32),
+    )
+    results: dict = {
+        "backend": args.backend,
+        "groups": args.groups,
+        "dimensions": args.dimensions,
+        "build_seconds": round(time.perf_counter() - start, 3),
+        "lookups_per_second": {},
+    }
+    for batch_size in args.batch_sizes:
+        embeddings = rng.normal(size=(batch_size, args.dimensions)).astype(np.float32)
+        lookups = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < args.seconds:
+            index.search(embeddings)
+            lookups += batch_size
+        results["lookups_per_second"][batch_size] = round(
+            lookups / (time.perf_counter() - start)
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Compare the regular grouping pipeline with the out-of-core one (embeddings in
+a memory-mapped file, grouped by partitions) on synthetically scaled inputs:
+peak anonymous memory of the process and of the clustering workers (file-backed pages
+of the memory-mapped embeddings aren't counted, the OS can drop them), wall time,
+groups found and the tail size.
+
+Run from the `backend` directory: `python -m benchmarks.out_of_core`
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+
+import benchmarks.fake_embeddings
+from benchmarks.clusterizer import load_example_phrases, scale_phrases
+from benchmarks.fake_embeddings import create_fake_embeddings_client
+from web_app.config import get_settings
+from web_app.models.clusterizer import LargeGroupingPhrasesInput
+from web_app.tools.executor import ClusteringExecutor
+from web_app.tools.grouping import run_grouping
+from web_app.tools.grouping.out_of_core import run_out_of_core_grouping
+
+settings = get_settings()
+
+VARIANTS = ["in_memory", "out_of_core"]
+
+
+def _get_anonymous_memory_mb(pid: int | str = "self") -> float:
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return 0.0
+
+
+class _MemorySampler(threading.Thread):
+    """
+    Sample anonymous memory (Linux) of the process and its children (workers).
+    """
+
+    def __init__(self, interval: float = 0.05) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = 0.0
+        self.peak_workers_mb = 0.0
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _get_anonymous_memory_mb())
+            for child in multiprocessing.active_children():
+                self.peak_workers_mb = max(
+                    self.peak_workers_mb, _get_anonymous_memory_mb(child.pid or 0)
+                )
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+async def _run_grouping(
+    variant: str, phrases: list[str], dimensions: int
+) -> dict[str, Any]:
+    clustering_executor = ClusteringExecutor()
+    sampler = _MemorySampler()
+    try:
+        async with create_fake_embeddings_client(dimensions) as client:
+            baseline_mb = _get_anonymous_memory_mb()
+            sampler.start()
+            start = time.perf_counter()
+            if variant == "out_of_core":
+                output = await run_out_of_core_grouping(
+                    phrases_input=phrases,
+                    client=client,
+                    clustering_executor=clustering_executor,
+                )
+            else:
+                output = await run_grouping(
+                    phrases_input=phrases,
+                    client=client,
+                    clustering_executor=clustering_executor,
+                    wait_for_executor=True,
+                )
+            total_seconds = time.perf_counter() - start
+            sampler.stop()
+    finally:
+        clustering_executor.shutdown()
+    sizes = np.array([len(x.phrases) for x in output.groups.values()])
+    distances = np.array([x.avg_distance or 0 for x in output.groups.values()])
+    return {
+        "total_seconds": round(total_seconds, 3),
+        "peak_memory_mb": round(sampler.peak_mb - baseline_mb, 1),
+        "peak_worker_memory_mb": round(sampler.peak_workers_mb, 1),
+        "groups": len(output.groups),
+        "grouped_phrases": int(sizes.sum()) if len(sizes) else 0,
+        "tail_size": len(output.singles),
+        # Average similarity within groups, weighted by the group size
+        "weighted_avg_distance": (
+            round(float((sizes * distances).sum() / sizes.sum()), 4)
+            if len(sizes)
+            else None
+        ),
+    }
+
+
+def run_variant(
+    variant: str, phrases: list[str], dimensions: int, partition_size: int
+) -> dict[str, Any]:
+    """
+    Run in a fresh process, as the variant overrides the (frozen) settings of the process.
+    Caches are disabled, so every run requests all the embeddings.
+    """
+    object.__setattr__(
+        settings.out_of_core, "OUT_OF_CORE_PARTITION_SIZE", partition_size
+    )
+    object.__setattr__(settings.embeddings_cache, "EMBEDDINGS_CACHE_ENABLED", False)
+    object.__setattr__(settings.grouping_cache, "GROUPING_CACHE_ENABLED", False)
+    object.__setattr__(settings.results_store, "RESULTS_STORE_ENABLED", False)
+    # The stand-in's cache would keep all the embeddings in memory
+    benchmarks.fake_embeddings.fake_embedding = (  # type: ignore[misc]
+        benchmarks.fake_embeddings.fake_embedding.__wrapped__
+    )
+    return {
+        "variant": variant,
+        **asyncio.run(
+            _run_grouping(
+                variant,
+                LargeGroupingPhrasesInput(phrases=phrases).sorted_unique_phrases,
+                dimensions,
+            )
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--example", default="taylor_swift_dancing")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[8000, 20000])
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument(
+        "--partition-size",
+        type=int,
+        default=settings.out_of_core.OUT_OF_CORE_PARTITION_SIZE,
+    )
+    args = parser.parse_args()
+    phrases = load_example_phrases(args.example)
+    for size in args.sizes:
+        results = []
+        for variant in VARIANTS:
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                results.append(
+                    executor.submit(
+                        run_variant,
+                        variant,
+                        scale_phrases(phrases, size),
+                        args.dimensions,
+                        args.partition_size,
+                    ).result()
+                )
+        print(json.dumps({"case": f"{args.example}_x{size}", "variants": results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Compare the full grouping pipeline with the embeddings requests overlapped
+with clustering (`EMBEDDINGS_PIPELINE_ENABLED`) and without it: end-to-end wall time
+(with simulated embeddings API latency) and groups quality on the example inputs.
+
+Run from the `backend` directory: `python -m benchmarks.pipeline`
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+
+from benchmarks.clusterizer import load_example_phrases, scale_phrases
+from benchmarks.fake_embeddings import create_fake_embeddings_client
+from web_app.config import get_settings
+from web_app.models.clusterizer import GroupingPhrasesInput
+from web_app.tools.clusterizer import Clusterizer
+from web_app.tools.executor import ClusteringExecutor
+from web_app.tools.grouping import run_grouping
+
+settings = get_settings()
+
+VARIANTS: dict[str, dict[str, Any]] = {
+    "sequential": {"EMBEDDINGS_PIPELINE_ENABLED": False},
+    "pipelined": {"EMBEDDINGS_PIPELINE_ENABLED": True},
+}
+
+
+async def _run_grouping(
+    phrases: list[str], dimensions: int, latency: float
+) -> dict[str, Any]:
+    clustering_executor = ClusteringExecutor()
+    try:
+        async with create_fake_embeddings_client(dimensions, latency) as client:
+            start = time.perf_counter()
+            await Clusterizer.get_all_phrases_embeddings(
+                phrases_input=phrases, client=client, use_cache=False
+            )
+            fetch_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            output = await run_grouping(
+                phrases_input=phrases,
+                client=client,
+                clustering_executor=clustering_executor,
+                wait_for_executor=True,
+            )
+            total_seconds = time.perf_counter() - start
+    finally:
+        clustering_executor.shutdown()
+    sizes = np.array([len(x.phrases) for x in output.groups.values()])
+    distances = np.array([x.avg_distance or 0 for x in output.groups.values()])
+    return {
+        "fetch_seconds": round(fetch_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "groups": len(output.groups),
+        "grouped_phrases": int(sizes.sum()) if len(sizes) else 0,
+        "tail_size": len(output.singles),
+        # Average similarity within groups, weighted by the group size
+        "weighted_avg_distance": (
+            round(float((sizes * distances).sum() / sizes.sum()), 4)
+            if len(sizes)
+            else None
+        ),
+    }
+
+
+def run_variant(
+    variant: str, phrases: list[str], dimensions: int, latency: float
+) -> dict[str, Any]:
+    """
+    Run in a fresh process, as the variant overrides the (frozen) settings of the process.
+    Caches are disabled, so every run requests all the embeddings.
+    """
+    for name, value in VARIANTS[variant].items():
+        object.__setattr__(settings.clusterizer, name, value)
+    object.__setattr__(settings.embeddings_cache, "EMBEDDINGS_CACHE_ENABLED", False)
+    object.__setattr__(settings.grouping_cache, "GROUPING_CACHE_ENABLED", False)
+    object.__setattr__(settings.results_store, "RESULTS_STORE_ENABLED", False)
+    return {
+        "variant": variant,
+        **asyncio.run(
+            _run_grouping(
+                GroupingPhrasesInput(phrases=phrases).sorted_unique_phrases,
+                dimensions,
+                latency,
+            )
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--example", default="taylor_swift_dancing")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[4000, 8000])
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument(
+        "--latency", type=float, default=3.0, help="Embeddings request latency, sec."
+    )
+    args = parser.parse_args()
+    phrases = load_example_phrases(args.example)
+    cases = [(args.example, phrases)] + [
+        (f"{args.example}_x{size}", scale_phrases(phrases, size)) for size in args.sizes
+    ]
+    for name, case_phrases in cases:
+        results = []
+        for variant in VARIANTS:
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                results.append(
+                    executor.submit(
+                        run_variant,
+                        variant,
+                        case_phrases,
+                        args.dimensions,
+                        args.latency,
+                    ).result()
+                )
+        sequential, pipelined = results
+        print(
+            json.dumps(
+                {
+                    "case": name,
+                    "variants": results,
+                    "speedup": round(
+                        sequential["total_seconds"] / pipelined["total_seconds"], 2
+                    ),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
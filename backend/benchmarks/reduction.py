@@ -0,0 +1,137 @@
+"""
+Check how far the groups drift when clustering reduced embeddings, compared with
+clustering the full-dimension ones: clustering wall time, groups found, the average
+similarity within groups (of the full embeddings) and the agreement of the groups
+with the full-dimension result (adjusted Rand index, singles count as separate groups).
+
+Run from the `backend` directory: `python -m benchmarks.reduction`
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any
+
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+from benchmarks.clusterizer import _get_embeddings, load_example_phrases, scale_phrases
+from web_app.config import get_settings
+from web_app.models.clusterizer import GroupingPhrasesInput, PhrasesGroup
+from web_app.tools.clusterizer import Clusterizer
+from web_app.tools.clusterizer.reduction import reduce_embeddings
+from web_app.tools.clusterizer.utils import avg_cosine_similarity
+
+settings = get_settings()
+
+
+def _get_labels(
+    embedded_phrases: list[str], groups: dict[str, PhrasesGroup]
+) -> np.ndarray:
+    rows = {phrase: i for i, phrase in enumerate(embedded_phrases)}
+    # Each single is a group of its own
+    labels = np.arange(len(embedded_phrases)) + len(groups)
+    for i, group in enumerate(groups.values()):
+        labels[[rows[x] for x in group.phrases]] = i
+    return labels
+
+
+def run_variant(
+    embedded_phrases: list[str],
+    embeddings: np.ndarray,
+    method: str | None,
+    dimensions: int,
+    float16: bool,
+    reference_labels: np.ndarray | None,
+) -> tuple[dict[str, Any], np.ndarray]:
+    start = time.perf_counter()
+    reduced = reduce_embeddings(embeddings, method, dimensions, float16)
+    groups, singles = Clusterizer.clusterize_phrases(
+        embedded_phrases=embedded_phrases,
+        embeddings=reduced,
+        max_tail_size=int(
+            len(embeddings)
+            * settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_TAIL_PERCENTAGE
+        ),
+    )
+    seconds = time.perf_counter() - start
+    rows = {phrase: i for i, phrase in enumerate(embedded_phrases)}
+    sizes = np.array([len(x.phrases) for x in groups.values()])
+    # Measure the similarity within groups on the full embeddings, to compare variants
+    distances = np.array(
+        [
+            avg_cosine_similarity(embeddings[[rows[x] for x in group.phrases]])
+            for group in groups.values()
+        ]
+    )
+    labels = _get_labels(embedded_phrases, groups)
+    return {
+        "variant": f"{method or 'full'}_{dimensions if method else embeddings.shape[1]}"
+        + ("_float16" if float16 else ""),
+        "seconds": round(seconds, 3),
+        "groups": len(groups),
+        "grouped_phrases": int(sizes.sum()) if len(sizes) else 0,
+        "tail_size": len(singles.phrases),
+        "weighted_avg_distance": (
+            round(float((sizes * distances).sum() / sizes.sum()), 4)
+            if len(sizes)
+            else None
+        ),
+        "adjusted_rand_index": (
+            round(float(adjusted_rand_score(reference_labels, labels)), 4)
+            if reference_labels is not None
+            else 1.0
+        ),
+    }, labels
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--example", default="taylor_swift_dancing")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[2000])
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument(
+        "--methods", nargs="*", default=["truncate", "pca", "random_projection"]
+    )
+    parser.add_argument(
+        "--reduced-dimensions", type=int, nargs="*", default=[256, 512, 1024]
+    )
+    args = parser.parse_args()
+    phrases = load_example_phrases(args.example)
+    cases = [(args.example, phrases)] + [
+        (f"{args.example}_x{size}", scale_phrases(phrases, size)) for size in args.sizes
+    ]
+    for name, case_phrases in cases:
+        embedded_phrases, embeddings = asyncio.run(
+            _get_embeddings(
+                GroupingPhrasesInput(phrases=case_phrases).sorted_unique_phrases,
+                args.dimensions,
+            )
+        )
+        reference, reference_labels = run_variant(
+            embedded_phrases, embeddings, None, args.dimensions, False, None
+        )
+        results = [
+            reference,
+            run_variant(embedded_phrases, embeddings, None, 0, True, reference_labels)[
+                0
+            ],
+        ]
+        for method in args.methods:
+            for dimensions in args.reduced_dimensions:
+                results.append(
+                    run_variant(
+                        embedded_phrases,
+                        embeddings,
+                        method,
+                        dimensions,
+                        False,
+                        reference_labels,
+                    )[0]
+                )
+        print(json.dumps({"case": name, "variants": results}))
+
+
+if __name__ == "__main__":
+    main()
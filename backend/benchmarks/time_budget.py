@@ -0,0 +1,88 @@
+"""
+Compare the grouping with per-request time budgets (`time_budget`) with the unbounded
+one: wall time of the clustering (embeddings are requested in advance), groups found,
+the tail size and whether the budget was exhausted.
+
+Run from the `backend` directory: `python -m benchmarks.time_budget`
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any
+
+from benchmarks.clusterizer import load_example_phrases, scale_phrases
+from benchmarks.fake_embeddings import create_fake_embeddings_client
+from web_app.config import get_settings
+from web_app.models.clusterizer import GroupingPhrasesInput
+from web_app.tools.clusterizer import Clusterizer
+from web_app.tools.executor import ClusteringExecutor
+from web_app.tools.grouping import run_grouping
+
+settings = get_settings()
+
+
+async def _run_budgets(
+    phrases: list[str], dimensions: int, budgets: list[float | None]
+) -> list[dict[str, Any]]:
+    clustering_executor = ClusteringExecutor()
+    results = []
+    try:
+        async with create_fake_embeddings_client(dimensions) as client:
+            # Keep the embeddings in the cache, so only the clustering is measured
+            await Clusterizer.get_all_phrases_embeddings(
+                phrases_input=phrases, client=client
+            )
+            for budget in budgets:
+                start = time.perf_counter()
+                output = await run_grouping(
+                    phrases_input=phrases,
+                    client=client,
+                    clustering_executor=clustering_executor,
+                    wait_for_executor=True,
+                    time_budget=budget,
+                )
+                results.append(
+                    {
+                        "time_budget": budget,
+                        "total_seconds": round(time.perf_counter() - start, 3),
+                        "groups": len(output.groups),
+                        "tail_size": len(output.singles),
+                        "budget_exhausted": output.budget_exhausted,
+                    }
+                )
+    finally:
+        clustering_executor.shutdown()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--example", default="taylor_swift_dancing")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[4000, 8000])
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument(
+        "--budgets", type=float, nargs="*", default=[1.0, 2.0, 5.0, 10.0]
+    )
+    args = parser.parse_args()
+    # Every run groups the phrases from scratch
+    object.__setattr__(settings.grouping_cache, "GROUPING_CACHE_ENABLED", False)
+    object.__setattr__(settings.results_store, "RESULTS_STORE_ENABLED", False)
+    phrases = load_example_phrases(args.example)
+    cases = [(args.example, phrases)] + [
+        (f"{args.example}_x{size}", scale_phrases(phrases, size)) for size in args.sizes
+    ]
+    for name, case_phrases in cases:
+        results = asyncio.run(
+            _run_budgets(
+                GroupingPhrasesInput(phrases=case_phrases).sorted_unique_phrases,
+                args.dimensions,
+                [None, *args.budgets],
+            )
+        )
+        print(json.dumps({"case": name, "budgets": results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Compare the grouping rounds seeded from the previous round's centroids (with adaptive
+KMeans restarts) with the cold-started rounds (k-means++ with all the restarts each time):
+clustering wall time and groups quality on the example inputs.
+
+Run from the `backend` directory: `python -m benchmarks.warm_start`
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+
+from benchmarks.clusterizer import _get_embeddings, load_example_phrases, scale_phrases
+from web_app.config import get_settings
+from web_app.models.clusterizer import GroupingPhrasesInput
+from web_app.tools.clusterizer import Clusterizer
+
+settings = get_settings()
+
+VARIANTS: dict[str, dict[str, Any]] = {
+    "cold_start": {
+        "EMBEDDINGS_CLUSTERING_WARM_START": False,
+        "EMBEDDINGS_CLUSTERING_FULL_N_INIT_SAMPLES": None,
+    },
+    "warm_start": {
+        "EMBEDDINGS_CLUSTERING_WARM_START": True,
+        "EMBEDDINGS_CLUSTERING_FULL_N_INIT_SAMPLES": settings.clusterizer.EMBEDDINGS_CLUSTERING_FULL_N_INIT_SAMPLES
+        or 100,
+    },
+}
+
+
+def run_variant(
+    variant: str,
+    overrides: dict[str, Any],
+    phrases: list[str],
+    dimensions: int,
+    repeats: int,
+) -> dict[str, Any]:
+    """
+    Run in a fresh process, as the variant overrides the (frozen) settings of the process.
+    """
+    for name, value in overrides.items():
+        object.__setattr__(settings.clusterizer, name, value)
+    embedded_phrases, embeddings = asyncio.run(
+        _get_embeddings(
+            GroupingPhrasesInput(phrases=phrases).sorted_unique_phrases, dimensions
+        )
+    )
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        groups, singles = Clusterizer.clusterize_phrases(
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            max_tail_size=int(
+                len(embeddings)
+                * settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_TAIL_PERCENTAGE
+            ),
+        )
+        timings.append(time.perf_counter() - start)
+    sizes = np.array([len(x.phrases) for x in groups.values()])
+    distances = np.array([x.avg_distance or 0 for x in groups.values()])
+    return {
+        "variant": variant,
+        "clustering_seconds": round(min(timings), 3),
+        "groups": len(groups),
+        "grouped_phrases": int(sizes.sum()),
+        "tail_size": len(singles.phrases),
+        # Average similarity within groups, weighted by the group size
+        "weighted_avg_distance": (
+            round(float((sizes * distances).sum() / sizes.sum()), 4)
+            if len(sizes)
+            else None
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--example", default="taylor_swift_dancing")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[2000])
+    parser.add_argument("--dimensions", type=int, default=3072)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    phrases = load_example_phrases(args.example)
+    cases = [(args.example, phrases)] + [
+        (f"{args.example}_x{size}", scale_phrases(phrases, size)) for size in args.sizes
+    ]
+    for name, case_phrases in cases:
+        results = []
+        for variant, overrides in VARIANTS.items():
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                results.append(
+                    executor.submit(
+                        run_variant,
+                        variant,
+                        overrides,
+                        case_phrases,
+                        args.dimensions,
+                        args.repeats,
+                    ).result()
+                )
+        cold, warm = results
+        print(
+            json.dumps(
+                {
+                    "case": name,
+                    "variants": results,
+                    "speedup": round(
+                        cold["clustering_seconds"] / warm["clustering_seconds"], 2
+                    ),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os
+
+# Settings require the key, the tests never call the embeddings API
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,82 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import web_app.models.clusterizer
+from web_app.models.clusterizer import ClusteringDeadline, PhrasesCluster
+from web_app.tools.clusterizer import Clusterizer
+
+
+def _make_cluster(
+    groups: int = 4, per_group: int = 5, outliers: int = 3, dimensions: int = 32
+) -> tuple[np.ndarray, PhrasesCluster]:
+    """
+    Close embeddings around a few random centers and a few outliers (left as singles),
+    small enough for a single chunk.
+    """
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(groups, dimensions))
+    embeddings = np.vstack(
+        [
+            np.repeat(centers, per_group, axis=0)
+            + rng.normal(scale=0.1, size=(groups * per_group, dimensions)),
+            rng.normal(size=(outliers, dimensions)),
+        ]
+    )
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    phrases = [f"phrase {i}" for i in range(len(embeddings))]
+    return embeddings.astype(np.float32), PhrasesCluster(
+        phrases=phrases, indices=np.arange(len(phrases))
+    )
+
+
+def _clusterize_single_round(
+    embeddings: np.ndarray,
+    cluster: PhrasesCluster,
+    deadline: ClusteringDeadline | None,
+) -> tuple[dict, PhrasesCluster]:
+    # A single pass of the last round, with the tail acceptable as is
+    return Clusterizer._clusterize_phrases(
+        embeddings=embeddings,
+        cluster=cluster,
+        max_tail_size=len(cluster.phrases),
+        pre_combined_groups=None,
+        iteration=100,
+        clustering_iterations=1,
+        deadline=deadline,
+    )
+
+
+def test_deadline_not_exhausted_by_last_round(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    No work is left after the last round, so no time for it isn't exhausting
+    the deadline, even if the clock doesn't leave any time for more passes.
+    """
+    monkeypatch.setattr(
+        web_app.models.clusterizer, "time", SimpleNamespace(time=lambda: 0.0)
+    )
+    embeddings, cluster = _make_cluster()
+    deadline = ClusteringDeadline(at=0.0)
+    groups, singles = _clusterize_single_round(embeddings, cluster, deadline)
+    expected_groups, expected_singles = _clusterize_single_round(
+        embeddings, cluster, None
+    )
+    assert expected_singles.phrases
+    assert not deadline.exhausted
+    assert [x.phrases for x in groups.values()] == [
+        x.phrases for x in expected_groups.values()
+    ]
+    assert singles.phrases == expected_singles.phrases
+
+
+def test_deadline_exhausted_skips_passes() -> None:
+    embeddings, cluster = _make_cluster()
+    deadline = ClusteringDeadline(at=time.time() - 1)
+    groups, singles = _clusterize_single_round(embeddings, cluster, deadline)
+    assert deadline.exhausted
+    assert groups == {}
+    assert sorted(singles.phrases) == sorted(cluster.phrases)
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from web_app.config import get_settings
+from web_app.models.clusterizer import GroupingPhrasesOutput, PhrasesGroup
+from web_app.tools import grouping
+from web_app.tools.grouping import _expand_groups, run_grouping
+
+settings = get_settings()
+
+
+def test_expand_groups_keeps_max_group_size() -> None:
+    max_size = settings.clusterizer.MAX_SUGGESTIONS_PER_EMBEDDINGS_GROUP
+    phrases = [f"phrase {i}" for i in range(max_size - 2)]
+    duplicates = {
+        "phrase 0": ["Phrase 0", "phrase-0", "PHRASE 0!"],
+        "phrase 1": ["Phrase 1"],
+    }
+    groups, overflow = _expand_groups(
+        {"group": PhrasesGroup(phrases=phrases, avg_distance=0.9)}, duplicates
+    )
+    assert groups["group"].phrases == [
+        "phrase 0",
+        "Phrase 0",
+        "phrase-0",
+        *phrases[1:],
+    ]
+    assert groups["group"].avg_distance == 0.9
+    assert overflow == ["PHRASE 0!", "Phrase 1"]
+
+
+def test_expand_groups_without_duplicates() -> None:
+    groups = {"group": PhrasesGroup(phrases=["a", "b"], avg_distance=0.9)}
+    assert _expand_groups(groups, {}) == (groups, [])
+
+
+class _NoCache:
+    def get(self, key: str) -> None:
+        return None
+
+    def set(self, key: str, output: GroupingPhrasesOutput) -> None:
+        pass
+
+
+class _SlowGrouping:
+    def __init__(self) -> None:
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def __call__(self, **kwargs) -> GroupingPhrasesOutput:
+        self.started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return GroupingPhrasesOutput(groups={}, singles=kwargs["phrases_input"])
+
+
+@pytest.fixture
+def slow_grouping(monkeypatch: pytest.MonkeyPatch) -> _SlowGrouping:
+    slow_grouping = _SlowGrouping()
+    monkeypatch.setattr(grouping, "get_grouping_cache", _NoCache)
+    monkeypatch.setattr(grouping, "_run_grouping", slow_grouping)
+    return slow_grouping
+
+
+async def _start_grouping(waiters: int = 1) -> asyncio.Task:
+    request = asyncio.create_task(
+        run_grouping(["a", "b"], client=None, clustering_executor=None)
+    )
+    # Wait for the request to join the running grouping
+    while not any(
+        running.waiters == waiters for running in grouping._running_groupings.values()
+    ):
+        await asyncio.sleep(0.01)
+    return request
+
+
+def test_cancelled_request_cancels_grouping(slow_grouping: _SlowGrouping) -> None:
+    async def main() -> None:
+        request = await _start_grouping()
+        await slow_grouping.started.wait()
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        await asyncio.sleep(0)
+        assert slow_grouping.cancelled
+        assert not grouping._running_groupings
+
+    asyncio.run(main())
+
+
+def test_cancelled_request_keeps_coalesced_grouping(
+    slow_grouping: _SlowGrouping,
+) -> None:
+    async def main() -> None:
+        first = await _start_grouping()
+        second = await _start_grouping(waiters=2)
+        await slow_grouping.started.wait()
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await asyncio.sleep(0)
+        assert not slow_grouping.cancelled
+        assert len(grouping._running_groupings) == 1
+        second.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        await asyncio.sleep(0)
+        assert slow_grouping.cancelled
+        assert not grouping._running_groupings
+
+    asyncio.run(main())
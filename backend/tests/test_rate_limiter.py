@@ -0,0 +1,22 @@
+import asyncio
+
+from web_app.tools.rate_limiter import (
+    AdaptiveConcurrencyLimiter,
+    get_embeddings_rate_limiter,
+)
+
+
+async def _use_slot(rate_limiter: AdaptiveConcurrencyLimiter) -> None:
+    async with rate_limiter.slot(tokens=1):
+        await asyncio.sleep(0)
+
+
+async def _request_embeddings() -> None:
+    rate_limiter = get_embeddings_rate_limiter()
+    # More requests than the concurrency, so some of them wait for the slots
+    await asyncio.gather(*(_use_slot(rate_limiter) for _ in range(100)))
+
+
+def test_rate_limiter_in_another_event_loop() -> None:
+    asyncio.run(_request_embeddings())
+    asyncio.run(_request_embeddings())
@@ -0,0 +1,27 @@
+import numpy as np
+
+from web_app.models.clusterizer import GroupingPhrasesOutput, StoredGroupingResult
+from web_app.tools.results_store import ResultsStore
+
+
+def _result(rows: int) -> StoredGroupingResult:
+    return StoredGroupingResult(
+        output=GroupingPhrasesOutput(groups={}, singles=[]),
+        model="model",
+        dimensions=None,
+        engine="kmeans",
+        centroids=np.zeros((rows, 8), dtype=np.float32),
+        singles_embeddings=np.zeros((0, 8), dtype=np.float32),
+    )
+
+
+def test_evicts_least_recently_used_results(tmp_path) -> None:
+    # Fits about two results of 100 embeddings
+    store = ResultsStore(
+        str(tmp_path / "results.sqlite3"), ttl=3600, max_size_bytes=8000
+    )
+    first, second = store.save(_result(100)), store.save(_result(100))
+    assert store.get(first)
+    third = store.save(_result(100))
+    assert store.get(first) and store.get(third)
+    assert not store.get(second)
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from web_app.tools.clusterizer.utils import (
+    avg_cosine_similarity,
+    cosine_similarity,
+    token_chunks,
+)
+from web_app.tools.similarity_processor.utils import estimate_tokens
+
+
+def _loop_avg_cosine_similarity(embeddings: np.ndarray) -> float:
+    """
+    Previous implementation: cosine similarity of every ordered pair
+    of different embeddings.
+    """
+    distances = []
+    for i, emb in enumerate(embeddings):
+        for j, l_emb in enumerate(embeddings):
+            if i != j:
+                distances.append(cosine_similarity(emb, l_emb))
+    return sum(distances) / len(distances)
+
+
+@pytest.mark.parametrize("size", [2, 3, 10, 50])
+@pytest.mark.parametrize("seed", range(5))
+def test_avg_cosine_similarity_matches_loop(size: int, seed: int) -> None:
+    embeddings = np.random.default_rng(seed).normal(size=(size, 64))
+    assert avg_cosine_similarity(embeddings) == pytest.approx(
+        _loop_avg_cosine_similarity(embeddings)
+    )
+    # Rounded, as stored in the groups
+    assert round(avg_cosine_similarity(embeddings), 2) == round(
+        _loop_avg_cosine_similarity(embeddings), 2
+    )
+
+
+def test_avg_cosine_similarity_accepts_lists_and_float32() -> None:
+    embeddings = np.random.default_rng(42).normal(size=(5, 16))
+    expected = _loop_avg_cosine_similarity(embeddings)
+    assert avg_cosine_similarity(embeddings.tolist()) == pytest.approx(expected)
+    assert avg_cosine_similarity(embeddings.astype(np.float32)) == pytest.approx(
+        expected, abs=1e-6
+    )
+
+
+def test_avg_cosine_similarity_single_row() -> None:
+    # No pairs to average, the loop fails as well
+    embeddings = np.random.default_rng(42).normal(size=(1, 16))
+    with pytest.raises(ZeroDivisionError):
+        _loop_avg_cosine_similarity(embeddings)
+    with pytest.raises(ValueError):
+        avg_cosine_similarity(embeddings)
+
+
+def test_token_chunks_packs_up_to_tokens_budget() -> None:
+    # Short and long phrases mixed
+    phrases = ["a b", "word " * 10, "c", "longer phrase here", "word " * 20, "d"]
+    chunks = list(token_chunks(phrases, max_tokens=25, max_items=100))
+    assert [x for chunk in chunks for x in chunk] == phrases
+    for chunk in chunks:
+        assert sum(estimate_tokens(x) for x in chunk) <= 25
+    assert len(chunks) > 1
+
+
+def test_token_chunks_single_item_over_budget() -> None:
+    large = "word " * 50
+    chunks = list(token_chunks(["a", large, "b"], max_tokens=10, max_items=100))
+    assert chunks == [["a"], [large], ["b"]]
+
+
+def test_token_chunks_max_items() -> None:
+    phrases = [f"phrase {i}" for i in range(10)]
+    chunks = list(token_chunks(phrases, max_tokens=1000, max_items=3))
+    assert [len(x) for x in chunks] == [3, 3, 3, 1]
+    assert [x for chunk in chunks for x in chunk] == phrases
+
+
+def test_token_chunks_empty_input() -> None:
+    assert list(token_chunks([], max_tokens=10, max_items=10)) == []
@@ -1,9 +1,13 @@
 import logging
 
-from fastapi import APIRouter
-from starlette.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, status
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from web_app.config import get_settings
+from web_app.tools.metrics import render_metrics
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 router = APIRouter()
 
@@ -21,3 +25,17 @@ async def root() -> JSONResponse:
 @router.get("/hello/{name}", response_description="Hello!")
 async def say_hello(name: str) -> JSONResponse:
     return JSONResponse(status_code=200, content={"message": f"Hello {name}"})
+
+
+@router.get("/metrics", response_description="Prometheus metrics of the worker.")
+def metrics() -> PlainTextResponse:
+    """
+    Metrics of the worker process that served the request, scrape each worker separately.
+    """
+    if not settings.metrics.METRICS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled."
+        )
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
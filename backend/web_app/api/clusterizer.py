@@ -1,10 +1,40 @@
+import asyncio
+import json
 import logging
+from typing import Any, AsyncIterator
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
 from web_app.config import get_settings
-from web_app.models.clusterizer import GroupingPhrasesInput, GroupingPhrasesOutput
-from web_app.tools.clusterizer import Clusterizer
+from web_app.models.clusterizer import (
+    ClusteringEvent,
+    GroupingPhrasesInput,
+    GroupingPhrasesOutput,
+    IncrementalGroupingPhrasesInput,
+)
+from web_app.models.lookup import LookupPhrasesInput, LookupPhrasesOutput
+from web_app.models.profiling import GroupingProfile
+from web_app.tools.embeddings_cache import get_embeddings_cache
+from web_app.tools.executor import ClusteringExecutor, ClusteringOverloadedException
+from web_app.tools.grouping import run_grouping, run_incremental_grouping
+from web_app.tools.lookup import get_groups_lookup
+from web_app.tools.metrics import collect_request_timings
+from web_app.tools.profiling import (
+    ProfilingBusyException,
+    get_profiles_store,
+    profile_request,
+)
+from web_app.tools.rate_limiter import get_embeddings_rate_limiter
+from web_app.tools.results_store import (
+    GroupingResultNotFoundException,
+    IncompatibleGroupingResultException,
+)
+from web_app.tools.similarity_processor import (
+    EmbeddingsUnavailableException,
+    get_client_pool_stats,
+)
 
 router = APIRouter(prefix="/clusterizer")
 logger = logging.getLogger(__name__)
@@ -16,25 +46,350 @@ settings = get_settings()
     response_description="Group phrases.",
 )
 async def group_phrases(
+    request: Request,
+    response: Response,
     phrases_to_group: GroupingPhrasesInput,
+    profile: bool = False,
 ) -> GroupingPhrasesOutput:
     """
     Combine chunks of suggestions from Redis, and try to group remaining singles.
+    With `profile`, the grouping runs from scratch under the profiler
+    (if `PROFILING_ENABLED`), the profile identifier is in `X-Profile-Id` header.
+    """
+    clustering_executor: ClusteringExecutor = request.app.state.clustering_executor
+    profiles_store = get_profiles_store()
+    if profile and not profiles_store:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Profiling is disabled.",
+        )
+    # Fail fast, before spending time and money on embeddings
+    if clustering_executor.is_full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many grouping requests at the moment, please, try again later.",
+        )
+    try:
+        if not profile:
+            # Organize all suggestions into groups
+            return await run_grouping(
+                phrases_input=phrases_to_group.sorted_unique_phrases,
+                client=request.app.state.embeddings_client,
+                clustering_executor=clustering_executor,
+                engine=phrases_to_group.engine,
+                time_budget=phrases_to_group.time_budget,
+            )
+        with collect_request_timings() as timings, profile_request() as request_profile:
+            output = await run_grouping(
+                phrases_input=phrases_to_group.sorted_unique_phrases,
+                client=request.app.state.embeddings_client,
+                clustering_executor=clustering_executor,
+                engine=phrases_to_group.engine,
+                time_budget=phrases_to_group.time_budget,
+                use_cache=False,
+            )
+        summary = await asyncio.to_thread(
+            profiles_store.save,  # type: ignore[union-attr]
+            profile=request_profile,
+            phrases_count=len(phrases_to_group.sorted_unique_phrases),
+            engine=phrases_to_group.engine,
+            stages=timings,
+        )
+        logger.info(
+            f"Profiled grouping of {summary.phrases_count} phrases: {summary.profile_id}."
+        )
+        response.headers["X-Profile-Id"] = summary.profile_id
+        return output
+    except ProfilingBusyException:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another request is being profiled, please, try again later.",
+        )
+    except EmbeddingsUnavailableException as er:
+        logger.error(f"Can't group phrases without embeddings: {er}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Couldn't get phrases embeddings, please, try again later.",
+        )
+    except ClusteringOverloadedException as er:
+        logger.warning(f"Rejected grouping request: {er}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many grouping requests at the moment, please, try again later.",
+        )
+
+
+@router.post(
+    "/group/incremental/",
+    response_description="Add phrases to the previous grouping result.",
+)
+async def group_phrases_incrementally(
+    request: Request,
+    phrases_to_group: IncrementalGroupingPhrasesInput,
+) -> GroupingPhrasesOutput:
+    """
+    Add new phrases to the stored result (by `result_id` of the previous output),
+    without grouping all the phrases again. Returns the extended result with a new `result_id`.
+    """
+    clustering_executor: ClusteringExecutor = request.app.state.clustering_executor
+    if clustering_executor.is_full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many grouping requests at the moment, please, try again later.",
+        )
+    try:
+        return await run_incremental_grouping(
+            result_id=phrases_to_group.result_id,
+            phrases_input=phrases_to_group.sorted_unique_phrases,
+            client=request.app.state.embeddings_client,
+            clustering_executor=clustering_executor,
+            engine=phrases_to_group.engine,
+            time_budget=phrases_to_group.time_budget,
+        )
+    except GroupingResultNotFoundException:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Previous grouping result not found, it could've expired.",
+        )
+    except IncompatibleGroupingResultException as er:
+        logger.warning(f"Can't extend grouping result: {er}")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Previous grouping result used other embeddings, please, group all the phrases again.",
+        )
+    except EmbeddingsUnavailableException as er:
+        logger.error(f"Can't group phrases without embeddings: {er}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Couldn't get phrases embeddings, please, try again later.",
+        )
+    except ClusteringOverloadedException as er:
+        logger.warning(f"Rejected grouping request: {er}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many grouping requests at the moment, please, try again later.",
+        )
+
+
+@router.post(
+    "/results/{result_id}/lookup/",
+    response_description="Closest groups of the stored result for the phrases.",
+)
+async def lookup_phrases_groups(
+    request: Request,
+    result_id: str,
+    phrases_to_lookup: LookupPhrasesInput,
+) -> LookupPhrasesOutput:
+    """
+    Find the group of the stored result (by `result_id` of the grouping output)
+    each phrase belongs to, or mark the phrase as a single if no group is close enough.
+    """
+    try:
+        results = await get_groups_lookup().lookup(
+            result_id=result_id,
+            phrases_input=phrases_to_lookup.unique_phrases,
+            client=request.app.state.embeddings_client,
+            min_similarity=(
+                phrases_to_lookup.min_similarity
+                if phrases_to_lookup.min_similarity is not None
+                else settings.lookup.LOOKUP_MIN_SIMILARITY
+            ),
+        )
+    except GroupingResultNotFoundException:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Grouping result not found, it could've expired.",
+        )
+    except IncompatibleGroupingResultException as er:
+        logger.warning(f"Can't look up groups of the result: {er}")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Grouping result used other embeddings, please, group the phrases again.",
+        )
+    except EmbeddingsUnavailableException as er:
+        logger.error(f"Can't look up groups without embeddings: {er}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Couldn't get phrases embeddings, please, try again later.",
+        )
+    return LookupPhrasesOutput(results=results)
+
+
+def _sse_message(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@router.post(
+    "/group/stream/",
+    response_description="Stream of grouping events (text/event-stream).",
+)
+async def stream_group_phrases(
+    request: Request,
+    phrases_to_group: GroupingPhrasesInput,
+) -> StreamingResponse:
+    """
+    Group phrases, streaming Server-Sent Events while the grouping runs:
+    `progress` - stage progress, `groups` - groups that won't change anymore,
+    `result` - the complete output (same as `/group/`), `error` - the grouping failed.
     """
-    # Organize all suggestions into groups
-    (
-        embedded_phrases,
-        embeddings,
-    ) = await Clusterizer.get_all_phrases_embeddings(
-        phrases_input=phrases_to_group.sorted_unique_phrases
+    clustering_executor: ClusteringExecutor = request.app.state.clustering_executor
+    if clustering_executor.is_full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many grouping requests at the moment, please, try again later.",
+        )
+    messages: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def on_event(event: ClusteringEvent) -> None:
+        if event.event == "groups":
+            await messages.put(_sse_message("groups", {"groups": event.groups}))
+        else:
+            await messages.put(
+                _sse_message(
+                    "progress",
+                    {
+                        "stage": event.stage,
+                        "done": event.done,
+                        "total": event.total,
+                        "iteration": event.iteration,
+                    },
+                )
+            )
+
+    async def group() -> None:
+        try:
+            result = await run_grouping(
+                phrases_input=phrases_to_group.sorted_unique_phrases,
+                client=request.app.state.embeddings_client,
+                clustering_executor=clustering_executor,
+                on_event=on_event,
+                engine=phrases_to_group.engine,
+                time_budget=phrases_to_group.time_budget,
+            )
+            await messages.put(_sse_message("result", result))
+        except EmbeddingsUnavailableException as er:
+            logger.error(f"Can't group phrases without embeddings: {er}")
+            await messages.put(
+                _sse_message(
+                    "error",
+                    {
+                        "detail": "Couldn't get phrases embeddings, please, try again later."
+                    },
+                )
+            )
+        except ClusteringOverloadedException as er:
+            logger.warning(f"Rejected grouping request: {er}")
+            await messages.put(
+                _sse_message(
+                    "error",
+                    {
+                        "detail": "Too many grouping requests at the moment, "
+                        "please, try again later."
+                    },
+                )
+            )
+        except Exception as er:
+            logger.exception(f"Failed to group phrases: {er}")
+            await messages.put(
+                _sse_message("error", {"detail": "Failed to group phrases."})
+            )
+        finally:
+            await messages.put(None)
+
+    async def stream() -> AsyncIterator[str]:
+        grouping = asyncio.create_task(group())
+        try:
+            while (message := await messages.get()) is not None:
+                yield message
+        finally:
+            # The client disconnected, don't keep grouping for nobody
+            grouping.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # Don't let proxies buffer the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/profiles/{profile_id}/",
+    response_description="Summary of the grouping profile.",
+)
+async def get_profile(profile_id: str) -> GroupingProfile:
+    """
+    Input size, settings, stages wall time and the hot spots of the profiled grouping.
+    """
+    profiles_store = get_profiles_store()
+    summary = (
+        await asyncio.to_thread(profiles_store.get_summary, profile_id)
+        if profiles_store
+        else None
+    )
+    if not summary:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found, it could've been evicted.",
+        )
+    return summary
+
+
+@router.get(
+    "/profiles/{profile_id}/stats/",
+    response_description="Profile stats (pstats format).",
+)
+async def download_profile_stats(profile_id: str) -> Response:
+    """
+    Download the profile, to explore with `pstats`, snakeviz or similar tools.
+    """
+    profiles_store = get_profiles_store()
+    stats = (
+        await asyncio.to_thread(profiles_store.get_stats, profile_id)
+        if profiles_store
+        else None
     )
-    groups, singles = Clusterizer.clusterize_phrases(
-        embedded_phrases=embedded_phrases,
-        embeddings=embeddings,
-        max_tail_size=int(
-            len(embeddings)
-            * settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_TAIL_PERCENTAGE
-        ),
+    if not stats:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found, it could've been evicted.",
+        )
+    return Response(
+        content=stats,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'},
     )
-    # Return success
-    return GroupingPhrasesOutput(groups=groups, singles=singles.phrases)
+
+
+@router.get(
+    "/embeddings-cache/",
+    response_description="Embeddings cache stats.",
+)
+async def embeddings_cache_stats() -> dict[str, int]:
+    """
+    Hit/miss counters and size of the embeddings cache, shared by all the workers.
+    """
+    embeddings_cache = get_embeddings_cache()
+    if not embeddings_cache:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Embeddings cache is disabled.",
+        )
+    return await asyncio.to_thread(embeddings_cache.stats)
+
+
+@router.get(
+    "/embeddings-client/",
+    response_description="Embeddings API client stats.",
+)
+async def embeddings_client_stats(
+    request: Request,
+) -> dict[str, dict[str, int | float]]:
+    """
+    Connection pool usage and rate limiter state of the embeddings API client
+    of the current worker.
+    """
+    return {
+        "pool": get_client_pool_stats(request.app.state.embeddings_client),
+        "rate_limiter": get_embeddings_rate_limiter().stats(),
+    }
@@ -0,0 +1,108 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from web_app.config import get_settings
+from web_app.models.clusterizer import GroupingPhrasesOutput, LargeGroupingPhrasesInput
+from web_app.models.jobs import GroupingJob
+from web_app.tools.jobs import JobsManager, JobsQueueFullException
+
+router = APIRouter(prefix="/clusterizer/jobs")
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _get_jobs_manager(request: Request) -> JobsManager:
+    return request.app.state.jobs_manager
+
+
+async def _get_job_or_404(request: Request, job_id: str) -> GroupingJob:
+    job = await _get_jobs_manager(request).get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found, it could've expired.",
+        )
+    return job
+
+
+@router.post(
+    "/",
+    response_description="Submit phrases to group in the background.",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_grouping_job(
+    request: Request,
+    phrases_to_group: LargeGroupingPhrasesInput,
+) -> GroupingJob:
+    """
+    Queue grouping of phrases, poll the job status and get the result when completed.
+    Inputs above `OUT_OF_CORE_MIN_PHRASES` are grouped out-of-core.
+    """
+    phrases = phrases_to_group.sorted_unique_phrases
+    if (
+        not settings.out_of_core.OUT_OF_CORE_ENABLED
+        and len(phrases) > settings.out_of_core.OUT_OF_CORE_MIN_PHRASES
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Only up to {settings.out_of_core.OUT_OF_CORE_MIN_PHRASES} "
+            f"unique phrases can be grouped at once.",
+        )
+    try:
+        return await _get_jobs_manager(request).submit(
+            phrases=phrases,
+            engine=phrases_to_group.engine,
+            time_budget=phrases_to_group.time_budget,
+        )
+    except JobsQueueFullException as er:
+        logger.warning(f"Rejected grouping job: {er}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many grouping jobs at the moment, please, try again later.",
+        )
+
+
+@router.get(
+    "/{job_id}/",
+    response_description="Grouping job status and progress.",
+)
+async def get_grouping_job(request: Request, job_id: str) -> GroupingJob:
+    return await _get_job_or_404(request, job_id)
+
+
+@router.get(
+    "/{job_id}/result/",
+    response_description="Grouped phrases of the completed job.",
+)
+async def get_grouping_job_result(
+    request: Request, job_id: str
+) -> GroupingPhrasesOutput:
+    job = await _get_job_or_404(request, job_id)
+    if job.status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job isn't completed yet (status: {job.status}).",
+        )
+    result = await _get_jobs_manager(request).get_result(job_id)
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job result not found, it could've expired.",
+        )
+    return result
+
+
+@router.delete(
+    "/{job_id}/",
+    response_description="Cancel the grouping job.",
+)
+async def cancel_grouping_job(request: Request, job_id: str) -> GroupingJob:
+    await _get_job_or_404(request, job_id)
+    job = await _get_jobs_manager(request).cancel(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found, it could've expired.",
+        )
+    return job
@@ -1,11 +1,16 @@
-from typing import Callable, Optional
+from typing import Awaitable, Callable, Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from web_app.api import router as base_router
 from web_app.api.clusterizer import router as clusterizer_router
+from web_app.api.jobs import router as jobs_router
+from web_app.config import get_settings
 from web_app.log import configure_logging
+from web_app.tools.metrics import collect_request_timings
+
+settings = get_settings()
 
 origins = [
     # NPM dev
@@ -26,7 +31,27 @@ def create_app(lifespan: Optional[Callable] = None) -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if settings.metrics.METRICS_SERVER_TIMING_ENABLED:
+        app.middleware("http")(add_server_timing)
     # Enable endpoints
     app.include_router(base_router)
     app.include_router(clusterizer_router)
+    app.include_router(jobs_router)
     return app
+
+
+async def add_server_timing(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """
+    Report the grouping stages of the request in `Server-Timing` header,
+    milliseconds per stage. Streamed responses report the stages
+    finished before the streaming started.
+    """
+    with collect_request_timings() as timings:
+        response = await call_next(request)
+    if timings:
+        response.headers["Server-Timing"] = ", ".join(
+            f"{x};dur={y * 1000:.1f}" for x, y in timings.items()
+        )
+    return response
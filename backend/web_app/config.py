@@ -18,12 +18,28 @@ class SimilarityProcessorSettings:
     OPENAI_EMBEDDINGS_MODEL: str = "text-embedding-3-large"
     OPENAI_EMBEDDINGS_TIMEOUT: int = 15
     OPENAI_EMBEDDINGS_DIMENSIONS: int | None = None
+    # Transfer embeddings as base64-encoded float32 ("base64") or as JSON floats ("float")
+    OPENAI_EMBEDDINGS_ENCODING_FORMAT: str = "base64"
+    # Tokens per minute budget of the embeddings API key
+    OPENAI_EMBEDDINGS_TOKENS_PER_MINUTE: int = 1_000_000
+    # Concurrent embeddings requests, adapted between min and max based on rate limits
+    OPENAI_EMBEDDINGS_MIN_CONCURRENCY: int = 1
+    OPENAI_EMBEDDINGS_MAX_CONCURRENCY: int = 16
+    OPENAI_EMBEDDINGS_INITIAL_CONCURRENCY: int = 4
+    # Connection pool of the embeddings API client, shared by all the requests of the worker
+    OPENAI_MAX_CONNECTIONS: int = 20
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    OPENAI_KEEPALIVE_EXPIRY: float = 30.0
+    # Use HTTP/2, requires `h2` package (not a dependency, install `httpx[http2]`)
+    OPENAI_HTTP2: bool = False
 
 
 @dataclass(frozen=True)
 class CluterizerSettings:
-    # How many embeddings to process at once, when grouping suggestions
+    # How many embeddings to process at once, when grouping suggestions (max items per request)
     EMBEDDINGS_CHUNK_SIZE: int = 1000
+    # Max estimated tokens per embeddings request, phrases are packed up to this budget
+    EMBEDDINGS_CHUNK_MAX_TOKENS: int = 100_000
     # Expected average distance between embeddings to group them
     EMBEDDINGS_CLUSTERING_DISTANCE: float = 0.95
     # How many times to try to group until to stop
@@ -45,6 +61,150 @@ class CluterizerSettings:
     MAX_SUGGESTIONS_PER_EMBEDDINGS_GROUP: int = 10
     # If the tail is larger than that - try to cluster once more with more loose approach
     EMBEDDINGS_CLUSTERING_MAX_TAIL_PERCENTAGE: float = 0.50
+    # Where to run CPU-bound clustering, outside the event loop ("process" or "thread")
+    CLUSTERING_EXECUTOR_TYPE: str = "process"
+    # How many clustering jobs to run at once
+    CLUSTERING_MAX_WORKERS: int = 2
+    # How many clustering jobs to queue when all workers are busy, before rejecting with 503
+    CLUSTERING_MAX_QUEUED_JOBS: int = 4
+    # How many parallel workers group clusters of a single job (None - split cores between jobs)
+    EMBEDDINGS_CLUSTERING_N_JOBS: int | None = None
+    # Max BLAS/OpenMP threads per parallel worker to avoid oversubscribing the cores (None - no limit)
+    EMBEDDINGS_CLUSTERING_WORKER_BLAS_THREADS: int | None = 1
+    # Embed and cluster only one phrase per canonical form (case, punctuation and whitespace
+    # folded), near-duplicates are added back to the group (or singles) of their phrase,
+    # up to the max group size (the rest are singles)
+    PHRASES_CANONICALIZATION_ENABLED: bool = False
+    # Unicode normalization of the canonical form ("NFC", "NFKC", "NFD", "NFKD", None - keep as is)
+    PHRASES_CANONICAL_UNICODE_FORM: str | None = "NFKC"
+    # Ignore the order of words in the canonical form
+    PHRASES_CANONICAL_SORT_WORDS: bool = False
+    # Ignore plural "s" endings of words in the canonical form
+    PHRASES_CANONICAL_FOLD_PLURALS: bool = False
+    # Reduce embeddings before clustering to speed it up ("truncate", "pca",
+    # "random_projection", None - keep as is), groups are still stored with full embeddings.
+    # Or request fewer dimensions from the API with OPENAI_EMBEDDINGS_DIMENSIONS
+    EMBEDDINGS_REDUCTION: str | None = None
+    # Dimensions of the reduced embeddings
+    EMBEDDINGS_REDUCTION_DIMENSIONS: int = 256
+    # Send embeddings to clustering as float16 (half the memory), clustering runs on float32
+    EMBEDDINGS_CLUSTERING_FLOAT16: bool = False
+    # Overlap the embeddings requests with clustering: run the first grouping round on each
+    # chunk of embeddings as soon as it arrives, and the following rounds on all the singles
+    EMBEDDINGS_PIPELINE_ENABLED: bool = False
+    # Group phrases sharing distinctive words (or word pairs) into blocks first, and cluster
+    # embeddings within the blocks, instead of chunking all the phrases with KMeans
+    LEXICAL_BLOCKING_ENABLED: bool = False
+    # Min phrases sharing a word to form a block (blocks are up to the clustering chunk size)
+    LEXICAL_BLOCKING_MIN_BLOCK_SIZE: int = 3
+    # Default clustering engine ("kmeans" or "threshold"), can be selected per request
+    CLUSTERING_ENGINE: str = "kmeans"
+    # Min average distance between embeddings in groups of the "threshold" engine
+    THRESHOLD_CLUSTERING_DISTANCE: float = 0.90
+    # Split larger inputs into blocks of about this size for the "threshold" engine,
+    # to calculate pairwise distances only within the blocks
+    THRESHOLD_CLUSTERING_BLOCK_SIZE: int = 1000
+    # Seed each grouping round with centroids of the previous round's leftover clusters
+    EMBEDDINGS_CLUSTERING_WARM_START: bool = True
+    # Max KMeans restarts (k-means++ seeding), used for small inputs
+    EMBEDDINGS_CLUSTERING_MAX_N_INIT: int = 10
+    # Up to this many embeddings use all the restarts, larger inputs use proportionally fewer
+    # (None - always use all the restarts)
+    EMBEDDINGS_CLUSTERING_FULL_N_INIT_SAMPLES: int | None = 100
+
+
+@dataclass(frozen=True)
+class EmbeddingsCacheSettings:
+    # Whether to keep embeddings locally to call the API only for new phrases
+    EMBEDDINGS_CACHE_ENABLED: bool = True
+    # SQLite file to store embeddings in, shared between all the workers
+    EMBEDDINGS_CACHE_PATH: str = "embeddings_cache.sqlite3"
+    # Max size of stored embeddings, least recently used ones are evicted first
+    EMBEDDINGS_CACHE_MAX_SIZE_MB: int = 1024
+
+
+@dataclass(frozen=True)
+class JobsSettings:
+    # Where to keep jobs and their results ("memory" - in the current process)
+    JOBS_BACKEND: str = "memory"
+    # How many grouping jobs to run at once in the background
+    JOBS_MAX_WORKERS: int = 2
+    # How many jobs to queue before rejecting new ones with 503
+    JOBS_MAX_QUEUED: int = 50
+    # How long to keep finished jobs and their results, in seconds
+    JOBS_RESULT_TTL: int = 3600
+
+
+@dataclass(frozen=True)
+class OutOfCoreSettings:
+    # Whether jobs can group more phrases than fit the regular grouping
+    # (embeddings are kept on disk and grouped by partitions), larger inputs are rejected
+    OUT_OF_CORE_ENABLED: bool = True
+    # Jobs with more phrases are grouped out-of-core
+    OUT_OF_CORE_MIN_PHRASES: int = 8000
+    # Max phrases of a partition grouped at once (bounds the memory)
+    OUT_OF_CORE_PARTITION_SIZE: int = 4000
+    # Phrases per embeddings batch and per batch of the streaming partitioner
+    OUT_OF_CORE_BATCH_SIZE: int = 8000
+    # Directory for the embeddings files (system temporary directory by default)
+    OUT_OF_CORE_PATH: str | None = None
+
+
+@dataclass(frozen=True)
+class ResultsStoreSettings:
+    # Whether to keep grouping results (with groups centroids) to extend them incrementally
+    RESULTS_STORE_ENABLED: bool = True
+    # SQLite file to store results in, shared between all the workers
+    RESULTS_STORE_PATH: str = "results_store.sqlite3"
+    # How long to keep unused results, in seconds
+    RESULTS_STORE_TTL: int = 7 * 24 * 3600
+    # Max size of stored results, least recently used ones are evicted first
+    RESULTS_STORE_MAX_SIZE_MB: int = 1024
+
+
+@dataclass(frozen=True)
+class GroupingCacheSettings:
+    # Whether to reuse the whole result for the same phrases and clustering settings
+    GROUPING_CACHE_ENABLED: bool = True
+    # SQLite file to store results in, shared between all the workers
+    GROUPING_CACHE_PATH: str = "grouping_cache.sqlite3"
+    # How long to reuse the result, in seconds (shorter than the results store TTL,
+    # so the identifiers of cached results are still valid)
+    GROUPING_CACHE_TTL: int = 3600
+    # Max size of cached results, least recently used ones are evicted first
+    GROUPING_CACHE_MAX_SIZE_MB: int = 256
+
+
+@dataclass(frozen=True)
+class LookupSettings:
+    # Index of groups centroids ("brute" - exact, "hnsw" - approximate, requires `hnswlib`)
+    LOOKUP_INDEX_BACKEND: str = "brute"
+    # Phrases less similar to the centroid of their closest group are singles
+    LOOKUP_MIN_SIMILARITY: float = 0.9
+    # How many results indexes to keep in memory of each worker
+    LOOKUP_MAX_CACHED_INDEXES: int = 32
+
+
+@dataclass(frozen=True)
+class MetricsSettings:
+    # Whether to expose Prometheus metrics at `/metrics` (per worker process)
+    # and collect timings of the clustering steps from the executor workers
+    METRICS_ENABLED: bool = True
+    # Whether to add `Server-Timing` header with the grouping stages to the responses
+    METRICS_SERVER_TIMING_ENABLED: bool = False
+
+
+@dataclass(frozen=True)
+class ProfilingSettings:
+    # Whether grouping requests can be profiled with `?profile=true` (debugging only,
+    # the deterministic profiler slows down the whole worker while running)
+    PROFILING_ENABLED: bool = False
+    # SQLite file to store profiles in, shared between all the workers
+    PROFILING_PATH: str = "profiles.sqlite3"
+    # How many latest profiles to keep
+    PROFILING_MAX_PROFILES: int = 20
+    # How many functions with the most own time to list in the profile summary
+    PROFILING_TOP_FUNCTIONS: int = 30
 
 
 @dataclass(frozen=True)
@@ -53,6 +213,14 @@ class Settings:
         OPENAI_API_KEY=os.environ["OPENAI_API_KEY"]
     )
     clusterizer: CluterizerSettings = CluterizerSettings()
+    embeddings_cache: EmbeddingsCacheSettings = EmbeddingsCacheSettings()
+    jobs: JobsSettings = JobsSettings()
+    out_of_core: OutOfCoreSettings = OutOfCoreSettings()
+    results_store: ResultsStoreSettings = ResultsStoreSettings()
+    grouping_cache: GroupingCacheSettings = GroupingCacheSettings()
+    lookup: LookupSettings = LookupSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    profiling: ProfilingSettings = ProfilingSettings()
 
 
 @lru_cache()
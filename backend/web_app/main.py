@@ -8,6 +8,9 @@ from fastapi.responses import JSONResponse
 
 from web_app.app import create_app
 from web_app.config import get_settings
+from web_app.tools.executor import ClusteringExecutor
+from web_app.tools.jobs import JobsManager
+from web_app.tools.similarity_processor import create_embeddings_client
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -16,7 +19,20 @@ settings = get_settings()
 @asynccontextmanager
 async def lifespan(current_app: FastAPI) -> AsyncGenerator:
     # Placeholder to initialize DB, if needed
+    # Keep the clustering workers alive between requests
+    current_app.state.clustering_executor = ClusteringExecutor()
+    # Reuse connections to the embeddings API between requests
+    current_app.state.embeddings_client = create_embeddings_client()
+    # Run large grouping requests in the background
+    current_app.state.jobs_manager = JobsManager(
+        client=current_app.state.embeddings_client,
+        clustering_executor=current_app.state.clustering_executor,
+    )
+    current_app.state.jobs_manager.start()
     yield
+    await current_app.state.jobs_manager.stop()
+    await current_app.state.embeddings_client.aclose()
+    current_app.state.clustering_executor.shutdown()
 
 
 app = create_app(lifespan=lifespan)
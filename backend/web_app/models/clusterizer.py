@@ -1,5 +1,8 @@
+import time
 from dataclasses import dataclass
+from typing import Literal
 
+import numpy as np
 from pydantic import Field, field_validator
 
 from web_app.models import SafeModel
@@ -11,10 +14,73 @@ class PhrasesGroup:
     avg_distance: float | None
 
 
+@dataclass(frozen=True)
+class ClusteringEvent:
+    # "progress" - progress of the stage, "groups" - final groups, won't change anymore,
+    # "timing" - duration of a step of the stage (for metrics, kept in the worker)
+    event: str
+    # "embeddings" or "clustering"
+    stage: str
+    done: int = 0
+    total: int = 0
+    # Recursion level of the clustering
+    iteration: int | None = None
+    groups: dict[str, PhrasesGroup] | None = None
+    # Step of the stage and its duration, for "timing" events
+    step: str | None = None
+    seconds: float | None = None
+
+
 @dataclass(frozen=True)
 class PhrasesCluster:
     phrases: list[str]
-    embeddings: list[list[float]]
+    # Rows of the phrases in the shared embeddings matrix
+    indices: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "PhrasesCluster":
+        return cls(phrases=[], indices=np.empty(0, dtype=np.intp))
+
+    @classmethod
+    def combine(cls, clusters: list["PhrasesCluster"]) -> "PhrasesCluster":
+        if not clusters:
+            return cls.empty()
+        return cls(
+            phrases=[x for cluster in clusters for x in cluster.phrases],
+            indices=np.concatenate([x.indices for x in clusters]),
+        )
+
+
+@dataclass
+class ClusteringDeadline:
+    # UNIX time to finish the clustering by
+    at: float
+    # Whether any clustering pass was skipped, as it wouldn't finish in time
+    exhausted: bool = False
+    # Duration of the latest clustering pass per phrase, to estimate the next ones
+    seconds_per_phrase: float | None = None
+
+    def fits(self, seconds: float) -> bool:
+        """
+        :param seconds: Estimated duration of the next pass.
+        :return: Whether the pass is expected to finish in time,
+        otherwise the budget is exhausted.
+        """
+        if time.time() + seconds <= self.at:
+            return True
+        self.exhausted = True
+        return False
+
+    def fits_pass(self, phrases: int) -> bool:
+        """
+        Whether a pass over the phrases is expected to finish in time,
+        based on the latest pass (only checks the time left, before any pass).
+        """
+        return self.fits((self.seconds_per_phrase or 0) * phrases)
+
+    def record_pass(self, phrases: int, seconds: float) -> None:
+        if phrases:
+            self.seconds_per_phrase = seconds / phrases
 
 
 class PhrasesInput(SafeModel):
@@ -48,6 +114,9 @@ class PhrasesInput(SafeModel):
         return sorted(self.unique_phrases)
 
 
+ClusteringEngine = Literal["kmeans", "threshold"]
+
+
 class GroupingPhrasesInput(PhrasesInput):
     phrases: list[str] = Field(
         ...,
@@ -55,6 +124,32 @@ class GroupingPhrasesInput(PhrasesInput):
         min_length=1,
         max_length=8000,
     )
+    engine: ClusteringEngine | None = Field(
+        None,
+        description="Clustering engine (by default, `CLUSTERING_ENGINE`).",
+    )
+    time_budget: float | None = Field(
+        None,
+        description="Seconds to return the result in: the grouping passes that won't "
+        "finish in time are skipped, leaving their phrases as singles.",
+        gt=0,
+        le=3600,
+    )
+
+
+class LargeGroupingPhrasesInput(GroupingPhrasesInput):
+    phrases: list[str] = Field(
+        ...,
+        description="Phrases to group (more than 8000 are grouped out-of-core).",
+        min_length=1,
+        max_length=100000,
+    )
+
+
+class IncrementalGroupingPhrasesInput(GroupingPhrasesInput):
+    result_id: str = Field(
+        ..., description="Previous grouping result to add the phrases to."
+    )
 
 
 class GroupingPhrasesOutput(SafeModel):
@@ -62,11 +157,34 @@ class GroupingPhrasesOutput(SafeModel):
         ...,
         description="Grouped phrases.",
         min_length=0,
-        max_length=8000,
+        max_length=100000,
     )
     singles: list[str] = Field(
         ...,
         description="Phrases that weren't grouped.",
         min_length=0,
-        max_length=8000,
+        max_length=100000,
+    )
+    result_id: str | None = Field(
+        None,
+        description="Identifier of the stored result, to add phrases to it later.",
     )
+    budget_exhausted: bool = Field(
+        False,
+        description="Some grouping passes were skipped to fit the time budget, "
+        "so more phrases could be grouped without it.",
+    )
+
+
+@dataclass(frozen=True)
+class StoredGroupingResult:
+    output: GroupingPhrasesOutput
+    # Embeddings model (and dimensions) the centroids were calculated with
+    model: str
+    dimensions: int | None
+    # Clustering engine the groups were found with
+    engine: str
+    # Mean of the normalized embeddings of each group, a row per group (in output order)
+    centroids: np.ndarray
+    # Embeddings of the singles, a row per single (in output order)
+    singles_embeddings: np.ndarray
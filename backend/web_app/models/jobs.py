@@ -0,0 +1,34 @@
+from typing import Literal
+
+from pydantic import Field
+
+from web_app.models import SafeModel
+from web_app.models.clusterizer import ClusteringEngine
+
+JobStatus = Literal["queued", "running", "completed", "failed", "cancelled"]
+
+
+class GroupingJob(SafeModel):
+    job_id: str = Field(..., description="Job identifier to poll the status/result.")
+    status: JobStatus = Field(..., description="Current job status.")
+    stage: str | None = Field(
+        None, description="Current pipeline stage of the running job."
+    )
+    progress: float | None = Field(
+        None,
+        description="Progress of the current stage (clustering pass), from 0 to 1.",
+    )
+    phrases_count: int = Field(..., description="Unique phrases to group.")
+    engine: ClusteringEngine | None = Field(
+        None, description="Clustering engine (by default, `CLUSTERING_ENGINE`)."
+    )
+    time_budget: float | None = Field(
+        None, description="Seconds to group the phrases in, from the job start."
+    )
+    created_at: float = Field(..., description="Submission time (UNIX timestamp).")
+    updated_at: float = Field(..., description="Last update time (UNIX timestamp).")
+    error: str | None = Field(None, description="Error message of the failed job.")
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
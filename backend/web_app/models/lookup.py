@@ -0,0 +1,34 @@
+from pydantic import Field
+
+from web_app.models import SafeModel
+from web_app.models.clusterizer import PhrasesInput
+
+
+class LookupPhrasesInput(PhrasesInput):
+    phrases: list[str] = Field(
+        ...,
+        description="Phrases to find the closest groups for.",
+        min_length=1,
+        max_length=1000,
+    )
+    min_similarity: float | None = Field(
+        None,
+        description="Phrases less similar to their closest group are singles "
+        "(by default, `LOOKUP_MIN_SIMILARITY`).",
+        ge=-1,
+        le=1,
+    )
+
+
+class PhraseLookup(SafeModel):
+    phrase: str = Field(..., description="Phrase (normalized).")
+    group_id: str | None = Field(
+        ..., description="Closest group, or null if the phrase is a single."
+    )
+    similarity: float | None = Field(
+        None, description="Cosine similarity to the centroid of the closest group."
+    )
+
+
+class LookupPhrasesOutput(SafeModel):
+    results: list[PhraseLookup] = Field(..., description="Closest group per phrase.")
@@ -0,0 +1,36 @@
+from typing import Any
+
+from pydantic import Field
+
+from web_app.models import SafeModel
+from web_app.models.clusterizer import ClusteringEngine
+
+
+class ProfiledFunction(SafeModel):
+    function: str = Field(..., description="Function location: `file:line(name)`.")
+    calls: int = Field(..., description="How many times the function was called.")
+    own_seconds: float = Field(
+        ..., description="Time spent in the function itself, excluding its calls."
+    )
+    cumulative_seconds: float = Field(
+        ..., description="Time spent in the function, including its calls."
+    )
+
+
+class GroupingProfile(SafeModel):
+    profile_id: str = Field(..., description="Profile identifier to download it.")
+    created_at: float = Field(..., description="Profiling time (UNIX timestamp).")
+    phrases_count: int = Field(..., description="Unique phrases grouped.")
+    engine: ClusteringEngine | None = Field(
+        None, description="Clustering engine (by default, `CLUSTERING_ENGINE`)."
+    )
+    seconds: float = Field(..., description="Wall time of the whole grouping.")
+    stages: dict[str, float] = Field(
+        ..., description="Wall time of the grouping stages, in seconds."
+    )
+    settings: dict[str, Any] = Field(
+        ..., description="Settings of the worker (without secrets)."
+    )
+    hot_spots: list[ProfiledFunction] = Field(
+        ..., description="Functions with the most own time."
+    )
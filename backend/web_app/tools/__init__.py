@@ -3,3 +3,14 @@ class RetryableException(Exception):
     Raise when there's a reason to retry the exception through Celetry
     to get better results. Don't raise for 100% failed state.
     """
+
+
+class RateLimitedException(RetryableException):
+    """
+    Raise when the resource asked to slow down (429), with the time to wait
+    before retrying, if provided by the resource.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -1,91 +1,297 @@
 import asyncio
 import logging
 import math
+import time
+from typing import AsyncGenerator, Awaitable, Callable
 
 import httpx
 import numpy as np
 import shortuuid
-from sklearn.cluster import KMeans, MiniBatchKMeans
-from tqdm.asyncio import tqdm
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
+from threadpoolctl import threadpool_limits
 
 from web_app.config import get_settings
-from web_app.models.clusterizer import PhrasesCluster, PhrasesGroup
-from web_app.tools.clusterizer.utils import cosine_similarity, str_chunks
+from web_app.models.clusterizer import (
+    ClusteringDeadline,
+    ClusteringEvent,
+    PhrasesCluster,
+    PhrasesGroup,
+)
+from web_app.tools.clusterizer.utils import (
+    avg_cosine_similarity,
+    get_clustering_n_jobs,
+    get_kmeans_n_init,
+    phrase_ngrams,
+    token_chunks,
+)
+from web_app.tools.embeddings_cache import get_embeddings_cache
+from web_app.tools.metrics import EMBEDDINGS_REQUEST_SECONDS
 from web_app.tools.similarity_processor import get_embeddings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Called with progress and settled groups, to report them before the whole clustering ends
+ClusteringEventCallback = Callable[[ClusteringEvent], None]
+AsyncClusteringEventCallback = Callable[[ClusteringEvent], Awaitable[None]]
+
 
 class Clusterizer:
     @staticmethod
     async def _get_phrases_chunk_embeddings(
         client: httpx.AsyncClient,
         embeddings_input: list[str],
-    ) -> tuple[list[str], list[list[float]]]:
+    ) -> tuple[list[str], np.ndarray]:
+        start = time.perf_counter()
         phrases_embeddings = await get_embeddings(
             client=client,
             embeddings_input=embeddings_input,
             label="phrases embeddings",
         )
+        EMBEDDINGS_REQUEST_SECONDS.observe(time.perf_counter() - start)
         return embeddings_input, phrases_embeddings
 
     @classmethod
     async def get_all_phrases_embeddings(
         cls,
         phrases_input: list[str],
-    ) -> tuple[list[str], list[list[float]]]:
+        client: httpx.AsyncClient,
+        use_cache: bool = True,
+        on_event: AsyncClusteringEventCallback | None = None,
+    ) -> tuple[list[str], np.ndarray]:
+        """
+        :return: Phrases and the float32 matrix of their embeddings (a row per phrase).
+        """
+        known_embeddings: dict[str, np.ndarray] = {}
+        async for phrases_part, embeddings_part in cls.iter_phrases_embeddings(
+            phrases_input=phrases_input,
+            client=client,
+            use_cache=use_cache,
+            on_event=on_event,
+        ):
+            known_embeddings.update(zip(phrases_part, embeddings_part))
+        # Build the matrix once, keeping the input order
+        matrix = np.empty(
+            (len(phrases_input), len(known_embeddings[phrases_input[0]])),
+            dtype=np.float32,
+        )
+        for i, phrase in enumerate(phrases_input):
+            matrix[i] = known_embeddings[phrase]
+        return phrases_input, matrix
+
+    @classmethod
+    async def iter_phrases_embeddings(
+        cls,
+        phrases_input: list[str],
+        client: httpx.AsyncClient,
+        use_cache: bool = True,
+        on_event: AsyncClusteringEventCallback | None = None,
+    ) -> AsyncGenerator[tuple[list[str], np.ndarray], None]:
+        """
+        Yield embeddings as soon as they are available: the cached ones first,
+        then each chunk requested from the API, in order of completion.
+        :return: Parts of the phrases and float32 matrices of their embeddings.
+        """
+        model = settings.similarity_processor.OPENAI_EMBEDDINGS_MODEL
+        dimensions = settings.similarity_processor.OPENAI_EMBEDDINGS_DIMENSIONS
+        embeddings_cache = get_embeddings_cache() if use_cache else None
+        known_embeddings: dict[str, np.ndarray] = {}
+        # Request only the embeddings that weren't cached before
+        if embeddings_cache:
+            known_embeddings = await asyncio.to_thread(
+                embeddings_cache.get_many, model, dimensions, phrases_input
+            )
+        if known_embeddings:
+            cached_phrases = [x for x in phrases_input if x in known_embeddings]
+            yield cached_phrases, np.vstack(
+                [known_embeddings[x] for x in cached_phrases]
+            )
+        missing_phrases = [x for x in phrases_input if x not in known_embeddings]
+        async for phrases_part, embeddings_part in cls._iter_missing_phrases_embeddings(
+            phrases_input=missing_phrases, client=client, on_event=on_event
+        ):
+            if embeddings_cache:
+                await asyncio.to_thread(
+                    embeddings_cache.set_many,
+                    model,
+                    dimensions,
+                    dict(zip(phrases_part, embeddings_part)),
+                )
+            yield phrases_part, embeddings_part
+
+    @classmethod
+    async def _iter_missing_phrases_embeddings(
+        cls,
+        phrases_input: list[str],
+        client: httpx.AsyncClient,
+        on_event: AsyncClusteringEventCallback | None = None,
+    ) -> AsyncGenerator[tuple[list[str], np.ndarray], None]:
+        if not phrases_input:
+            return
         asyncio_tasks = []
-        phrases = []
-        embeddings = []
-        async with httpx.AsyncClient(
-            timeout=httpx.Timeout(
-                settings.similarity_processor.OPENAI_EMBEDDINGS_TIMEOUT, pool=None
-            ),
-        ) as client:
-            # Chunk embeddings to avoid hitting the API limit
-            for chunk in str_chunks(
-                phrases_input,
-                settings.clusterizer.EMBEDDINGS_CHUNK_SIZE,
-            ):
-                asyncio_tasks.append(
-                    cls._get_phrases_chunk_embeddings(
-                        client=client, embeddings_input=chunk
+        # Chunk embeddings to avoid hitting the API limits, packing by tokens
+        for chunk in token_chunks(
+            phrases_input,
+            max_tokens=settings.clusterizer.EMBEDDINGS_CHUNK_MAX_TOKENS,
+            max_items=settings.clusterizer.EMBEDDINGS_CHUNK_SIZE,
+        ):
+            asyncio_tasks.append(
+                cls._get_phrases_chunk_embeddings(client=client, embeddings_input=chunk)
+            )
+        done = 0
+        for st in asyncio.as_completed(asyncio_tasks):
+            phrases_part, embeddings_part = await st
+            done += len(phrases_part)
+            if on_event:
+                await on_event(
+                    ClusteringEvent(
+                        event="progress",
+                        stage="embeddings",
+                        done=done,
+                        total=len(phrases_input),
                     )
                 )
-            for st in tqdm(
-                asyncio.as_completed(asyncio_tasks),
-                total=len(asyncio_tasks),
-                desc="Getting phrases embeddings",
-            ):
-                phrases_part, embeddings_part = await st
-                phrases += phrases_part
-                embeddings += embeddings_part
-        return phrases, embeddings
+            yield phrases_part, embeddings_part
+        logger.debug(f"Got embeddings for {done} phrases.")
 
     @classmethod
     def clusterize_phrases(
         cls,
         embedded_phrases: list[str],
-        embeddings: list[list[float]],
+        embeddings: np.ndarray,
         max_tail_size: int,
         pre_combined_groups: dict[str, PhrasesGroup] | None = None,
         iteration: int = 0,
+        on_event: ClusteringEventCallback | None = None,
+        deadline: ClusteringDeadline | None = None,
     ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
         """
         Wrapper for clusterizing phrases, to allow tracking stats
         for clusterization iterations only once, on final iteration.
+        :param embeddings: Float32 matrix of embeddings (a row per phrase),
+        clusters reference its rows by indices, so it's never copied as a whole.
+        :param on_event: Called with the progress and with the groups
+        as soon as they are settled.
+        :param deadline: Skip the grouping passes and rounds that won't finish in time,
+        leaving their phrases as singles (marks the deadline exhausted).
         """
         # Assuming the input is sorted alphabetically in hope to improve grouping quality
         # TODO Sort it when processing the input?
         return cls._clusterize_phrases(
-            embedded_phrases=embedded_phrases,
             embeddings=embeddings,
+            cluster=PhrasesCluster(
+                phrases=embedded_phrases,
+                indices=np.arange(len(embedded_phrases)),
+            ),
             max_tail_size=max_tail_size,
             pre_combined_groups=pre_combined_groups,
             iteration=iteration,
+            on_event=on_event,
+            deadline=deadline,
+        )
+
+    @classmethod
+    def pre_group_phrases(
+        cls,
+        embedded_phrases: list[str],
+        embeddings: np.ndarray,
+        on_event: ClusteringEventCallback | None = None,
+        deadline: ClusteringDeadline | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
+        """
+        Run the first grouping round on a part of the input, the following rounds
+        get the singles of all the parts (`clusterize_phrases` with the pre-combined groups).
+        """
+        groups, singles = cls._clusterize_phrases_iteration(
+            embeddings=embeddings,
+            cluster=PhrasesCluster(
+                phrases=embedded_phrases, indices=np.arange(len(embedded_phrases))
+            ),
+            iteration=0,
+            clustering_distance=settings.clusterizer.EMBEDDINGS_CLUSTERING_DISTANCE,
+            clustering_iterations=settings.clusterizer.EMBEDDINGS_CLUSTERING_ITERATIONS,
+            on_event=on_event,
+            deadline=deadline,
+        )
+        return {k: v for x in groups for k, v in x.items()}, PhrasesCluster.combine(
+            singles
         )
 
+    @staticmethod
+    def calculate_centroids(
+        embedded_phrases: list[str],
+        embeddings: np.ndarray,
+        groups: dict[str, PhrasesGroup],
+    ) -> np.ndarray:
+        """
+        :return: Mean of the normalized embeddings of each group, a row per group.
+        """
+        rows = {phrase: i for i, phrase in enumerate(embedded_phrases)}
+        centroids = np.empty((len(groups), embeddings.shape[1]), dtype=np.float32)
+        for i, group in enumerate(groups.values()):
+            group_embeddings = embeddings[[rows[x] for x in group.phrases]]
+            centroids[i] = (
+                group_embeddings
+                / np.linalg.norm(group_embeddings, axis=1, keepdims=True)
+            ).mean(axis=0)
+        return centroids
+
+    @staticmethod
+    def centroid_avg_distance(centroid: np.ndarray, size: int) -> float:
+        """
+        Average cosine similarity between all pairs of different phrases of the group,
+        same as `avg_cosine_similarity` of its embeddings, but based on the centroid only.
+        For `n` normalized embeddings with the sum `s`, the similarities
+        of all the pairs (including self-pairs, equal to 1) sum up to `|s|^2`.
+        """
+        group_sum = centroid.astype(np.float64) * size
+        return float((group_sum @ group_sum - size) / (size * (size - 1)))
+
+    @classmethod
+    def assign_to_groups(
+        cls,
+        centroids: np.ndarray,
+        sizes: np.ndarray,
+        embeddings: np.ndarray,
+        avg_distance_threshold: float,
+        max_group_size: int,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Add embeddings to their closest groups, only if the average distance
+        of the group stays above the threshold (and the group isn't too large).
+        The most similar embeddings are assigned first, each one updates the group centroid.
+        :return: Group (row of centroids) per embedding (-1 if not assigned),
+        updated centroids and sizes.
+        """
+        centroids = centroids.astype(np.float64)
+        sizes = sizes.copy()
+        assignments = np.full(len(embeddings), -1, dtype=np.intp)
+        if not len(centroids) or not len(embeddings):
+            return assignments, centroids.astype(np.float32), sizes
+        normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        similarities = (
+            normalized
+            @ (centroids / np.linalg.norm(centroids, axis=1, keepdims=True)).T
+        )
+        closest = similarities.argmax(axis=1)
+        for i in np.argsort(-similarities.max(axis=1), kind="stable"):
+            group = closest[i]
+            if sizes[group] >= max_group_size:
+                continue
+            new_centroid = (centroids[group] * sizes[group] + normalized[i]) / (
+                sizes[group] + 1
+            )
+            avg_distance = round(
+                cls.centroid_avg_distance(new_centroid, sizes[group] + 1), 2
+            )
+            if avg_distance < avg_distance_threshold:
+                continue
+            centroids[group] = new_centroid
+            sizes[group] += 1
+            assignments[i] = group
+        return assignments, centroids.astype(np.float32), sizes
+
     @staticmethod
     def sort_relevant_groups(
         relevant_groups: dict[str, PhrasesGroup],
@@ -102,82 +308,284 @@ class Clusterizer:
     @classmethod
     def _clusterize_phrases_iteration(
         cls,
-        embedded_phrases: list[str],
-        embeddings: list[list[float]],
+        embeddings: np.ndarray,
+        cluster: PhrasesCluster,
         iteration: int,
         clustering_distance: float,
         clustering_iterations: int,
+        on_event: ClusteringEventCallback | None = None,
+        deadline: ClusteringDeadline | None = None,
     ) -> tuple[list[dict[str, PhrasesGroup]], list[PhrasesCluster]]:
+        init_embeddings_clusters: dict[str, PhrasesCluster] = {}
+        # Use lexical blocks on the first iteration, the following ones
+        # get the ungrouped phrases of the blocks and chunk them together
+        if iteration == 0 and settings.clusterizer.LEXICAL_BLOCKING_ENABLED:
+            init_embeddings_clusters, cluster = cls._calculate_lexical_blocks(
+                cluster=cluster,
+                max_block_size=settings.clusterizer.EMBEDDINGS_CLUSTERING_CHUNK_SIZE,
+                min_block_size=settings.clusterizer.LEXICAL_BLOCKING_MIN_BLOCK_SIZE,
+            )
         # Split phrases into smaller groups based on embeddings
         n_clusters = math.ceil(
-            len(embeddings) / settings.clusterizer.EMBEDDINGS_CLUSTERING_CHUNK_SIZE
+            len(cluster.indices) / settings.clusterizer.EMBEDDINGS_CLUSTERING_CHUNK_SIZE
         )
         if n_clusters == 1:
             # If it's a single cluster - create it manually
-            init_embeddings_clusters = {
-                "single_cluster": PhrasesCluster(
-                    phrases=embedded_phrases, embeddings=embeddings
+            init_embeddings_clusters["single_cluster"] = cluster
+        elif n_clusters > 1:
+            start = time.perf_counter()
+            init_embeddings_clusters.update(
+                cls._calculate_embeddings_clusters(
+                    embeddings=embeddings,
+                    cluster=cluster,
+                    n_clusters=n_clusters,
+                    minibatch=True,
                 )
-            }
-        else:
-            init_embeddings_clusters = cls._calculate_embeddings_clusters(
-                embedded_phrases=embedded_phrases,
-                embeddings=embeddings,
-                n_clusters=n_clusters,
-                minibatch=True,
             )
+            if on_event:
+                on_event(
+                    ClusteringEvent(
+                        event="timing",
+                        stage="clustering",
+                        iteration=iteration,
+                        step="pre_split",
+                        seconds=time.perf_counter() - start,
+                    )
+                )
         return cls._group_multiple_embeddings_clusters(
+            embeddings=embeddings,
             init_embeddings_clusters=init_embeddings_clusters,
             iteration=iteration,
             clustering_distance=clustering_distance,
             clustering_iterations=clustering_iterations,
+            on_event=on_event,
+            deadline=deadline,
+        )
+
+    @staticmethod
+    def _calculate_lexical_blocks(
+        cluster: PhrasesCluster, max_block_size: int, min_block_size: int
+    ) -> tuple[dict[str, PhrasesCluster], PhrasesCluster]:
+        """
+        Split phrases into blocks sharing the same word (or word pair), using an inverted
+        index. Words shared by the most phrases (but not more than the block size)
+        form blocks first, so head terms shared by (almost) all the phrases are skipped.
+        :return: Blocks, and the phrases that didn't get into any block.
+        """
+        index: dict[str, list[int]] = {}
+        for position, phrase in enumerate(cluster.phrases):
+            for ngram in phrase_ngrams(phrase):
+                index.setdefault(ngram, []).append(position)
+        ngrams = sorted(
+            (x for x, y in index.items() if min_block_size <= len(y) <= max_block_size),
+            key=lambda x: (-len(index[x]), x),
+        )
+        blocked = np.zeros(len(cluster.phrases), dtype=bool)
+        blocks: dict[str, PhrasesCluster] = {}
+        for ngram in ngrams:
+            positions = [x for x in index[ngram] if not blocked[x]]
+            if len(positions) < min_block_size:
+                continue
+            blocked[positions] = True
+            blocks[f"lexical_{ngram}"] = PhrasesCluster(
+                phrases=[cluster.phrases[x] for x in positions],
+                indices=cluster.indices[positions],
+            )
+        leftovers = np.flatnonzero(~blocked)
+        logger.debug(
+            f"Split {len(cluster.phrases) - len(leftovers)} phrases "
+            f"into {len(blocks)} lexical blocks, {len(leftovers)} phrases left."
+        )
+        return blocks, PhrasesCluster(
+            phrases=[cluster.phrases[x] for x in leftovers],
+            indices=cluster.indices[leftovers],
         )
 
     @classmethod
     def _group_multiple_embeddings_clusters(
         cls,
+        embeddings: np.ndarray,
         init_embeddings_clusters: dict[str, PhrasesCluster],
         iteration: int,
         clustering_distance: float,
         clustering_iterations: int,
+        on_event: ClusteringEventCallback | None = None,
+        deadline: ClusteringDeadline | None = None,
     ) -> tuple[list[dict[str, PhrasesGroup]], list[PhrasesCluster]]:
         groups = []
         singles = []
-        # Find groups of phrases in each cluster, one by one
-        for i, (_, cluster) in enumerate(
-            tqdm(
-                init_embeddings_clusters.items(),
-                desc=f"Grouping embeddings clusters (iteration: {iteration})",
+        n_jobs = min(get_clustering_n_jobs(), len(init_embeddings_clusters))
+        if n_jobs > 1:
+            # Each cluster is independent, so group them in parallel,
+            # sending only the rows of the cluster to the worker.
+            # Results are returned in the order of the clusters, as in the serial path
+            results = Parallel(n_jobs=n_jobs, return_as="generator")(
+                delayed(cls._group_embeddings_cluster_job)(
+                    cluster_embeddings=embeddings[cluster.indices],
+                    cluster=cluster,
+                    clustering_distance=clustering_distance,
+                    clustering_iterations=clustering_iterations,
+                    deadline=deadline,
+                )
+                for cluster in init_embeddings_clusters.values()
             )
-        ):
-            cluster_groups, cluster_singles = cls._group_embeddings_cluster(
-                embedded_phrases=cluster.phrases,
-                embeddings=cluster.embeddings,
-                clustering_distance=clustering_distance,
-                clustering_iterations=clustering_iterations,
+        else:
+            results = (
+                cls._group_embeddings_cluster_timed(
+                    embeddings=embeddings,
+                    cluster=cluster,
+                    clustering_distance=clustering_distance,
+                    clustering_iterations=clustering_iterations,
+                    deadline=deadline,
+                )
+                for cluster in init_embeddings_clusters.values()
             )
+        # Find groups of phrases in each cluster
+        for i, (cluster_groups, cluster_singles, seconds, exhausted) in enumerate(
+            results
+        ):
             groups.append(cluster_groups)
             singles.append(cluster_singles)
+            # Parallel workers check their own copies of the deadline
+            if deadline and exhausted:
+                deadline.exhausted = True
+            if not on_event:
+                continue
+            on_event(
+                ClusteringEvent(
+                    event="timing",
+                    stage="clustering",
+                    iteration=iteration,
+                    step="group_cluster",
+                    seconds=seconds,
+                )
+            )
+            # Groups are final, they won't go through the clusterization again
+            if cluster_groups:
+                on_event(
+                    ClusteringEvent(
+                        event="groups",
+                        stage="clustering",
+                        iteration=iteration,
+                        groups=cluster_groups,
+                    )
+                )
+            on_event(
+                ClusteringEvent(
+                    event="progress",
+                    stage="clustering",
+                    done=i + 1,
+                    total=len(init_embeddings_clusters),
+                    iteration=iteration,
+                )
+            )
+        logger.debug(
+            f"Grouped {len(init_embeddings_clusters)} embeddings clusters "
+            f"(iteration: {iteration})."
+        )
         return groups, singles
 
+    @classmethod
+    def _group_embeddings_cluster_job(
+        cls,
+        cluster_embeddings: np.ndarray,
+        cluster: PhrasesCluster,
+        clustering_distance: float,
+        clustering_iterations: int,
+        deadline: ClusteringDeadline | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster, float, bool]:
+        """
+        Group a single cluster in a parallel worker, based on its own rows only.
+        """
+        # Limit BLAS threads of the worker to avoid oversubscribing the cores
+        with threadpool_limits(
+            limits=settings.clusterizer.EMBEDDINGS_CLUSTERING_WORKER_BLAS_THREADS
+        ):
+            cluster_groups, cluster_singles, seconds, exhausted = (
+                cls._group_embeddings_cluster_timed(
+                    embeddings=cluster_embeddings,
+                    cluster=PhrasesCluster(
+                        phrases=cluster.phrases,
+                        indices=np.arange(len(cluster.phrases)),
+                    ),
+                    clustering_distance=clustering_distance,
+                    clustering_iterations=clustering_iterations,
+                    deadline=deadline,
+                )
+            )
+        # Map the singles back to the rows of the shared matrix
+        return (
+            cluster_groups,
+            PhrasesCluster(
+                phrases=cluster_singles.phrases,
+                indices=cluster.indices[cluster_singles.indices],
+            ),
+            seconds,
+            exhausted,
+        )
+
+    @classmethod
+    def _group_embeddings_cluster_timed(
+        cls,
+        embeddings: np.ndarray,
+        cluster: PhrasesCluster,
+        clustering_distance: float,
+        clustering_iterations: int,
+        deadline: ClusteringDeadline | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster, float, bool]:
+        """
+        :return: Groups, singles, the grouping wall time, in seconds,
+        and whether the deadline is exhausted.
+        """
+        start = time.perf_counter()
+        cluster_groups, cluster_singles = cls._group_embeddings_cluster(
+            embeddings=embeddings,
+            cluster=cluster,
+            clustering_distance=clustering_distance,
+            clustering_iterations=clustering_iterations,
+            deadline=deadline,
+        )
+        return (
+            cluster_groups,
+            cluster_singles,
+            time.perf_counter() - start,
+            bool(deadline and deadline.exhausted),
+        )
+
     @classmethod
     def _clusterize_phrases(
         cls,
-        embedded_phrases: list[str],
-        embeddings: list[list[float]],
+        embeddings: np.ndarray,
+        cluster: PhrasesCluster,
         max_tail_size: int,
         pre_combined_groups: dict[str, PhrasesGroup] | None,
         iteration: int,
         clustering_distance: float = settings.clusterizer.EMBEDDINGS_CLUSTERING_DISTANCE,
         clustering_iterations: int = settings.clusterizer.EMBEDDINGS_CLUSTERING_ITERATIONS,
+        on_event: ClusteringEventCallback | None = None,
+        deadline: ClusteringDeadline | None = None,
     ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
+        start = time.perf_counter()
         groups, singles = cls._clusterize_phrases_iteration(
-            embedded_phrases=embedded_phrases,
             embeddings=embeddings,
+            cluster=cluster,
             iteration=iteration,
             clustering_distance=clustering_distance,
             clustering_iterations=clustering_iterations,
+            on_event=on_event,
+            deadline=deadline,
         )
+        round_seconds = time.perf_counter() - start
+        if on_event:
+            on_event(
+                ClusteringEvent(
+                    event="timing",
+                    stage="clustering",
+                    iteration=iteration,
+                    step="round",
+                    seconds=round_seconds,
+                )
+            )
         combined_groups: dict[str, PhrasesGroup] = {}
         # If pre-combined groups are provided - add them to the combined groups
         if pre_combined_groups:
@@ -185,70 +593,84 @@ class Clusterizer:
         for group_set in groups:
             combined_groups = {**combined_groups, **group_set}
         # Combine the singles in the expected format
-        combined_singles = PhrasesCluster(phrases=[], embeddings=[])
-        for single in singles:
-            combined_singles.phrases.extend(single.phrases)
-            combined_singles.embeddings.extend(single.embeddings)
+        combined_singles = PhrasesCluster.combine(singles)
         # If there are still iterations left - iterate again
         if iteration < settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_RECURSION:
-            return cls._clusterize_phrases(
-                embedded_phrases=combined_singles.phrases,
-                embeddings=combined_singles.embeddings,
-                max_tail_size=max_tail_size,
-                pre_combined_groups=combined_groups,
-                iteration=iteration + 1,
+            next_clustering_distance = (
+                settings.clusterizer.EMBEDDINGS_CLUSTERING_DISTANCE
+            )
+            next_clustering_iterations = (
+                settings.clusterizer.EMBEDDINGS_CLUSTERING_ITERATIONS
             )
         # If the iterations exhausted and the tail is acceptable - return the results
-        if len(combined_singles.phrases) <= max_tail_size:
+        elif len(combined_singles.phrases) <= max_tail_size:
             return combined_groups, combined_singles
         # If the tail is still too large, but no max tail recursions left - return the results anyway
-        if iteration >= (
+        elif iteration >= (
             settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_RECURSION
             + settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_TAIL_RECURSION
         ):
             return combined_groups, combined_singles
         # If the tail is still too large and there are max tail recursions left -
         # iterate again with the lowest allowed average distance
-        max_tail_clustering_distance = round(
-            (
-                # Calculate the lowest allowed distance
-                settings.clusterizer.EMBEDDINGS_CLUSTERING_DISTANCE
-                - (
-                    # First iteration doesn't count (i-0), so decrease the distance by 1
-                    (settings.clusterizer.EMBEDDINGS_CLUSTERING_ITERATIONS - 1)
-                    * settings.clusterizer.EMBEDDINGS_CLUSTERING_DISTANCE_DECREASE
-                )
-            ),
-            2,
-        )
+        else:
+            next_clustering_distance = round(
+                (
+                    # Calculate the lowest allowed distance
+                    settings.clusterizer.EMBEDDINGS_CLUSTERING_DISTANCE
+                    - (
+                        # First iteration doesn't count (i-0), so decrease the distance by 1
+                        (settings.clusterizer.EMBEDDINGS_CLUSTERING_ITERATIONS - 1)
+                        * settings.clusterizer.EMBEDDINGS_CLUSTERING_DISTANCE_DECREASE
+                    )
+                ),
+                2,
+            )
+            next_clustering_iterations = (
+                settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_TAIL_ITERATIONS
+            )
+        # If the next round (as long as this one, relative to its input)
+        # won't finish in time - return the results so far
+        if deadline and not deadline.fits(
+            round_seconds * len(combined_singles.phrases) / max(len(cluster.phrases), 1)
+        ):
+            return combined_groups, combined_singles
         return cls._clusterize_phrases(
-            embedded_phrases=combined_singles.phrases,
-            embeddings=combined_singles.embeddings,
+            embeddings=embeddings,
+            cluster=combined_singles,
             max_tail_size=max_tail_size,
             pre_combined_groups=combined_groups,
             iteration=iteration + 1,
-            clustering_distance=max_tail_clustering_distance,
-            clustering_iterations=settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_TAIL_ITERATIONS,
+            clustering_distance=next_clustering_distance,
+            clustering_iterations=next_clustering_iterations,
+            on_event=on_event,
+            deadline=deadline,
         )
 
     @classmethod
     def _group_embeddings_cluster(
         cls,
-        embedded_phrases: list[str],
-        embeddings: list[list[float]],
+        embeddings: np.ndarray,
+        cluster: PhrasesCluster,
         clustering_distance: float,
         clustering_iterations: int,
+        deadline: ClusteringDeadline | None = None,
     ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
         # Define result variables to update with each iteration
         result_relevant_groups: dict[str, PhrasesGroup] = {}
-        result_singles: PhrasesCluster = PhrasesCluster(phrases=[], embeddings=[])
-        phrases_input, embeddings_input = embedded_phrases, embeddings
+        result_singles: PhrasesCluster = PhrasesCluster.empty()
+        cluster_input = cluster
         # An expected average of phrases per group.
         embeddings_per_group = settings.clusterizer.SUGGESTIONS_PER_EMBEDDINGS_GROUP
         # How many times to clusterize until to stop (to disallow while loop to run forever)
         # Decrease the required distance (- quality) and decrease the cluster size (+ quality) with each iteration
+        init_centroids = None
         for distance_iteration in range(clustering_iterations):
-            n_clusters = math.ceil(len(phrases_input) / embeddings_per_group)
+            # If the pass won't finish in time - leave the rest ungrouped
+            if deadline and not deadline.fits_pass(len(cluster_input.phrases)):
+                return result_relevant_groups, cluster_input
+            start = time.perf_counter()
+            n_clusters = math.ceil(len(cluster_input.phrases) / embeddings_per_group)
             # Decrease required distance to group embeddings with each iteration,
             # to allow more ideas to be grouped and improve the user experience
             avg_distance_threshold = round(
@@ -262,12 +684,18 @@ class Clusterizer:
             (
                 relevant_groups,
                 result_singles,
+                rejected_clusters,
             ) = cls._group_embeddings_cluster_iteration(
-                embedded_phrases=phrases_input,
-                embeddings=embeddings_input,
+                embeddings=embeddings,
+                cluster=cluster_input,
                 n_clusters=n_clusters,
                 avg_distance_threshold=avg_distance_threshold,
+                init_centroids=init_centroids,
             )
+            if deadline:
+                deadline.record_pass(
+                    len(cluster_input.phrases), time.perf_counter() - start
+                )
             # Save successfully groupped phrases
             result_relevant_groups = {**result_relevant_groups, **relevant_groups}
             # If no singles left - nothing to group again, return results
@@ -277,102 +705,147 @@ class Clusterizer:
             if len(result_singles.phrases) < embeddings_per_group:
                 return result_relevant_groups, result_singles
             # If enough singles left - try to clusterize them again
-            phrases_input, embeddings_input = (
-                result_singles.phrases,
-                result_singles.embeddings,
-            )
+            cluster_input = result_singles
+            if settings.clusterizer.EMBEDDINGS_CLUSTERING_WARM_START:
+                init_centroids = cls._get_warm_start_centroids(
+                    embeddings=embeddings,
+                    rejected_clusters=rejected_clusters,
+                    cluster=cluster_input,
+                    n_clusters=math.ceil(
+                        len(cluster_input.phrases) / embeddings_per_group
+                    ),
+                )
         # Return the final results
         return result_relevant_groups, result_singles
 
+    @staticmethod
+    def _get_warm_start_centroids(
+        embeddings: np.ndarray,
+        rejected_clusters: list[PhrasesCluster],
+        cluster: PhrasesCluster,
+        n_clusters: int,
+    ) -> np.ndarray:
+        """
+        Seed the next grouping round with the centroids of the rejected clusters
+        of the previous round (largest first), as their phrases are the ones left to group.
+        Single-phrase clusters are skipped, as seeding with outliers just keeps them alone.
+        If there are fewer centroids than required - add k-means++ seeds from the phrases.
+        """
+        rejected_clusters = sorted(
+            [x for x in rejected_clusters if len(x.indices) > 1],
+            key=lambda x: len(x.indices),
+            reverse=True,
+        )[:n_clusters]
+        centroids = [embeddings[x.indices].mean(axis=0) for x in rejected_clusters]
+        if len(centroids) < n_clusters:
+            seeds, _ = kmeans_plusplus(
+                embeddings[cluster.indices].astype(np.float32, copy=False),
+                n_clusters=n_clusters - len(centroids),
+                random_state=42,
+            )
+            centroids.extend(seeds)
+        return np.asarray(centroids, dtype=np.float32)
+
     @staticmethod
     def _calculate_embeddings_clusters(
-        embedded_phrases: list[str],
-        embeddings: list[list[float]],
+        embeddings: np.ndarray,
+        cluster: PhrasesCluster,
         n_clusters: int,
         minibatch: bool,
+        init_centroids: np.ndarray | None = None,
     ) -> dict[str, PhrasesCluster]:
-        matrix = np.vstack(embeddings)
+        """
+        :param init_centroids: Start from the provided centroids (single run),
+        instead of k-means++ seeding with multiple restarts.
+        """
+        # The only copy is the rows of the current cluster, as KMeans needs them contiguous
+        # (float16 embeddings are converted, as KMeans runs on float32)
+        matrix = embeddings[cluster.indices].astype(np.float32, copy=False)
+        init: np.ndarray | str = "k-means++"
+        n_init = get_kmeans_n_init(len(matrix))
+        if init_centroids is not None:
+            init, n_init = init_centroids, 1
         if not minibatch:
             kmeans = KMeans(
-                n_clusters=n_clusters, init="k-means++", n_init=10, random_state=42
+                n_clusters=n_clusters, init=init, n_init=n_init, random_state=42
             )
         else:
             kmeans = MiniBatchKMeans(
-                n_clusters=n_clusters, init="k-means++", n_init=10, random_state=42
+                n_clusters=n_clusters, init=init, n_init=n_init, random_state=42
             )
         kmeans.fit_predict(matrix)
-        labels: list[int] = kmeans.labels_
+        labels: np.ndarray = kmeans.labels_
         # Organize clustered phrases
         grouped_phrases: dict[str, PhrasesCluster] = {}
         # Generate unique label for each clustering calculation
         unique_label = str(shortuuid.ShortUUID().random(length=8))
-        for suggestion, label, emb in zip(embedded_phrases, labels, embeddings):
-            formatted_label = f"{label}_{unique_label}"
-            if formatted_label not in grouped_phrases:
-                grouped_phrases[formatted_label] = PhrasesCluster(
-                    phrases=[], embeddings=[]
-                )
-            grouped_phrases[formatted_label].phrases.append(suggestion)
-            grouped_phrases[formatted_label].embeddings.append(emb)
+        # Keep the clusters in order of their first phrase
+        unique_labels, first_positions = np.unique(labels, return_index=True)
+        for label in unique_labels[np.argsort(first_positions)]:
+            positions = np.flatnonzero(labels == label)
+            grouped_phrases[f"{label}_{unique_label}"] = PhrasesCluster(
+                phrases=[cluster.phrases[x] for x in positions],
+                indices=cluster.indices[positions],
+            )
         return grouped_phrases
 
     @classmethod
     def _group_embeddings_cluster_iteration(
         cls,
-        embedded_phrases: list[str],
-        embeddings: list[list[float]],
+        embeddings: np.ndarray,
+        cluster: PhrasesCluster,
         n_clusters: int,
         avg_distance_threshold: float | None,
-    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
+        init_centroids: np.ndarray | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster, list[PhrasesCluster]]:
+        """
+        :return: Relevant groups, singles, and the clusters the singles came from.
+        """
         embeddings_clusters = cls._calculate_embeddings_clusters(
-            embedded_phrases=embedded_phrases,
             embeddings=embeddings,
+            cluster=cluster,
             n_clusters=n_clusters,
             minibatch=False,
+            init_centroids=init_centroids,
         )
         # Split into relevant groups and singles
         relevant_groups: dict[str, PhrasesGroup] = {}
-        singles = PhrasesCluster(phrases=[], embeddings=[])
-        for group_label, cluster in embeddings_clusters.items():
-            if len(cluster.phrases) <= 1:
+        singles: list[PhrasesCluster] = []
+        for group_label, embeddings_cluster in embeddings_clusters.items():
+            if len(embeddings_cluster.phrases) <= 1:
                 # Groups with a single idea move to singles automatically
-                singles.phrases.extend(cluster.phrases)
-                singles.embeddings.extend(cluster.embeddings)
+                singles.append(embeddings_cluster)
                 continue
             # If avg distance threshold not provided (init chunking) - don't filter groups
             if not avg_distance_threshold:
                 # Keep the proper-sized groups that are close to each other
                 relevant_groups[group_label] = PhrasesGroup(
-                    phrases=cluster.phrases,
+                    phrases=embeddings_cluster.phrases,
                     avg_distance=None,
                 )
                 continue
             # Calculate average distance between all phrases in the group
-            distances = []
-            for suggestion, emb in zip(cluster.phrases, cluster.embeddings):
-                for l_suggestion, l_emb in zip(cluster.phrases, cluster.embeddings):
-                    if suggestion != l_suggestion:
-                        distances.append(cosine_similarity(emb, l_emb))
+            # (phrases are unique, so all pairs of different rows are compared).
             # Round to 2 symbols after the dot
-            avg_distance = round(sum(distances) / len(distances), 2)
+            avg_distance = round(
+                avg_cosine_similarity(embeddings[embeddings_cluster.indices]), 2
+            )
             # Groups that aren't close enough move to singles
             if avg_distance < avg_distance_threshold:
-                singles.phrases.extend(cluster.phrases)
-                singles.embeddings.extend(cluster.embeddings)
+                singles.append(embeddings_cluster)
                 continue
             # Avoid having large loosely-connected groups
             if (
-                len(cluster.phrases)
+                len(embeddings_cluster.phrases)
                 > settings.clusterizer.MAX_SUGGESTIONS_PER_EMBEDDINGS_GROUP
             ):
-                singles.phrases.extend(cluster.phrases)
-                singles.embeddings.extend(cluster.embeddings)
+                singles.append(embeddings_cluster)
                 continue
             # Keep the proper-sized groups that are close to each other
             relevant_groups[group_label] = PhrasesGroup(
                 # Don't save embeddings, as the group is already relevant,
                 # so won't go through the clusterization again
-                phrases=cluster.phrases,
+                phrases=embeddings_cluster.phrases,
                 avg_distance=avg_distance,
             )
-        return relevant_groups, singles
+        return relevant_groups, PhrasesCluster.combine(singles), singles
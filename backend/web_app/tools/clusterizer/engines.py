@@ -0,0 +1,297 @@
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+import shortuuid
+from sklearn.cluster import AgglomerativeClustering
+
+from web_app.config import get_settings
+from web_app.models.clusterizer import (
+    ClusteringDeadline,
+    ClusteringEvent,
+    PhrasesCluster,
+    PhrasesGroup,
+)
+from web_app.tools.clusterizer import ClusteringEventCallback, Clusterizer
+from web_app.tools.clusterizer.utils import avg_cosine_similarity
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class BaseClusteringEngine(ABC):
+    """
+    Algorithm to find groups of close phrases in their embeddings.
+    """
+
+    @abstractmethod
+    def clusterize_phrases(
+        self,
+        embedded_phrases: list[str],
+        embeddings: np.ndarray,
+        max_tail_size: int,
+        on_event: ClusteringEventCallback | None = None,
+        pre_grouped: dict[str, PhrasesGroup] | None = None,
+        deadline: ClusteringDeadline | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
+        """
+        :param embeddings: Float32 matrix of embeddings (a row per phrase).
+        :param max_tail_size: How many phrases are acceptable to leave ungrouped.
+        :param on_event: Called with the progress and with the groups
+        as soon as they are settled.
+        :param pre_grouped: Groups found by `pre_group_phrases` in the parts of the input,
+        the provided phrases are the ones left ungrouped there.
+        :param deadline: Time to finish by: the work that isn't expected to finish
+        in time is skipped, leaving its phrases ungrouped (marks the deadline exhausted).
+        :return: Groups (including the pre-grouped ones) and the phrases
+        that weren't grouped.
+        """
+
+    def pre_group_phrases(
+        self,
+        embedded_phrases: list[str],
+        embeddings: np.ndarray,
+        on_event: ClusteringEventCallback | None = None,
+        deadline: ClusteringDeadline | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
+        """
+        Group a part of the input as soon as its embeddings are available,
+        before the rest of it. By default, nothing is grouped in advance.
+        :return: Groups and the phrases left for `clusterize_phrases` with the rest.
+        """
+        return {}, PhrasesCluster(
+            phrases=embedded_phrases, indices=np.arange(len(embedded_phrases))
+        )
+
+
+class KMeansClusteringEngine(BaseClusteringEngine):
+    """
+    KMeans with the expected group size, keeping only the close enough clusters
+    and re-grouping the rest with gradually decreasing threshold.
+    """
+
+    def clusterize_phrases(
+        self,
+        embedded_phrases: list[str],
+        embeddings: np.ndarray,
+        max_tail_size: int,
+        on_event: ClusteringEventCallback | None = None,
+        pre_grouped: dict[str, PhrasesGroup] | None = None,
+        deadline: ClusteringDeadline | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
+        return Clusterizer.clusterize_phrases(
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            max_tail_size=max_tail_size,
+            pre_combined_groups=pre_grouped,
+            # The first round already ran on the parts
+            iteration=0 if pre_grouped is None else 1,
+            on_event=on_event,
+            deadline=deadline,
+        )
+
+    def pre_group_phrases(
+        self,
+        embedded_phrases: list[str],
+        embeddings: np.ndarray,
+        on_event: ClusteringEventCallback | None = None,
+        deadline: ClusteringDeadline | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
+        return Clusterizer.pre_group_phrases(
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            on_event=on_event,
+            deadline=deadline,
+        )
+
+
+class ThresholdClusteringEngine(BaseClusteringEngine):
+    """
+    Single pass of agglomerative clustering (average linkage) on the cosine distance
+    threshold. Large inputs are split into blocks of close phrases first (KMeans),
+    so pairwise distances are calculated only within the blocks.
+    Groups above the max size are split, groups that aren't close enough are singles.
+    The tail size isn't enforced, as the threshold isn't relaxed.
+    """
+
+    def __init__(
+        self,
+        clustering_distance: float = settings.clusterizer.THRESHOLD_CLUSTERING_DISTANCE,
+        block_size: int = settings.clusterizer.THRESHOLD_CLUSTERING_BLOCK_SIZE,
+        max_group_size: int = settings.clusterizer.MAX_SUGGESTIONS_PER_EMBEDDINGS_GROUP,
+    ) -> None:
+        self.clustering_distance = clustering_distance
+        self.block_size = block_size
+        self.max_group_size = max_group_size
+
+    def clusterize_phrases(
+        self,
+        embedded_phrases: list[str],
+        embeddings: np.ndarray,
+        max_tail_size: int,
+        on_event: ClusteringEventCallback | None = None,
+        pre_grouped: dict[str, PhrasesGroup] | None = None,
+        deadline: ClusteringDeadline | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], PhrasesCluster]:
+        cluster = PhrasesCluster(
+            phrases=embedded_phrases, indices=np.arange(len(embedded_phrases))
+        )
+        start = time.perf_counter()
+        blocks = self._split_blocks(embeddings, cluster)
+        if on_event and len(blocks) > 1:
+            on_event(
+                ClusteringEvent(
+                    event="timing",
+                    stage="clustering",
+                    iteration=0,
+                    step="pre_split",
+                    seconds=time.perf_counter() - start,
+                )
+            )
+        groups: dict[str, PhrasesGroup] = {}
+        singles: list[PhrasesCluster] = []
+        # Generate unique label for the clustering calculation
+        unique_label = str(shortuuid.ShortUUID().random(length=8))
+        for i, block in enumerate(blocks):
+            # If the block won't be grouped in time - leave it ungrouped
+            if deadline and not deadline.fits_pass(len(block.indices)):
+                singles.append(block)
+                continue
+            start = time.perf_counter()
+            block_groups: dict[str, PhrasesGroup] = {}
+            for candidate in self._split_oversized(
+                embeddings, self._calculate_clusters(embeddings, block)
+            ):
+                if len(candidate.indices) <= 1:
+                    singles.append(candidate)
+                    continue
+                avg_distance = round(
+                    avg_cosine_similarity(embeddings[candidate.indices]), 2
+                )
+                if avg_distance < self.clustering_distance:
+                    singles.append(candidate)
+                    continue
+                block_groups[f"{len(groups) + len(block_groups)}_{unique_label}"] = (
+                    PhrasesGroup(phrases=candidate.phrases, avg_distance=avg_distance)
+                )
+            groups.update(block_groups)
+            if deadline:
+                deadline.record_pass(len(block.indices), time.perf_counter() - start)
+            if not on_event:
+                continue
+            on_event(
+                ClusteringEvent(
+                    event="timing",
+                    stage="clustering",
+                    iteration=0,
+                    step="group_cluster",
+                    seconds=time.perf_counter() - start,
+                )
+            )
+            # Single pass, so the groups of the block are final
+            if block_groups:
+                on_event(
+                    ClusteringEvent(
+                        event="groups",
+                        stage="clustering",
+                        iteration=0,
+                        groups=block_groups,
+                    )
+                )
+            on_event(
+                ClusteringEvent(
+                    event="progress",
+                    stage="clustering",
+                    done=i + 1,
+                    total=len(blocks),
+                    iteration=0,
+                )
+            )
+        return {**(pre_grouped or {}), **groups}, PhrasesCluster.combine(singles)
+
+    def _split_blocks(
+        self, embeddings: np.ndarray, cluster: PhrasesCluster
+    ) -> list[PhrasesCluster]:
+        """
+        Split the input into blocks of close phrases, KMeans blocks aren't balanced,
+        so the large ones are split again.
+        """
+        if len(cluster.indices) <= self.block_size:
+            return [cluster]
+        blocks = Clusterizer._calculate_embeddings_clusters(
+            embeddings=embeddings,
+            cluster=cluster,
+            n_clusters=math.ceil(len(cluster.indices) / self.block_size),
+            minibatch=True,
+        ).values()
+        if len(blocks) == 1:
+            return list(blocks)
+        return [x for block in blocks for x in self._split_blocks(embeddings, block)]
+
+    def _calculate_clusters(
+        self,
+        embeddings: np.ndarray,
+        cluster: PhrasesCluster,
+        n_clusters: int | None = None,
+    ) -> list[PhrasesCluster]:
+        """
+        :param n_clusters: Split into exactly this many clusters, instead of the threshold.
+        """
+        if len(cluster.indices) < 2:
+            return [cluster]
+        labels = AgglomerativeClustering(
+            n_clusters=n_clusters,
+            distance_threshold=None if n_clusters else 1 - self.clustering_distance,
+            metric="cosine",
+            linkage="average",
+        ).fit_predict(embeddings[cluster.indices].astype(np.float32, copy=False))
+        # Keep the clusters in order of their first phrase
+        unique_labels, first_positions = np.unique(labels, return_index=True)
+        clusters = []
+        for label in unique_labels[np.argsort(first_positions)]:
+            positions = np.flatnonzero(labels == label)
+            clusters.append(
+                PhrasesCluster(
+                    phrases=[cluster.phrases[x] for x in positions],
+                    indices=cluster.indices[positions],
+                )
+            )
+        return clusters
+
+    def _split_oversized(
+        self, embeddings: np.ndarray, clusters: list[PhrasesCluster]
+    ) -> list[PhrasesCluster]:
+        result = []
+        while clusters:
+            cluster = clusters.pop()
+            if len(cluster.indices) <= self.max_group_size:
+                result.append(cluster)
+                continue
+            clusters.extend(
+                self._calculate_clusters(
+                    embeddings,
+                    cluster,
+                    n_clusters=math.ceil(len(cluster.indices) / self.max_group_size),
+                )
+            )
+        # Restore the order of the first phrase
+        return sorted(result, key=lambda x: x.indices.min())
+
+
+def create_clustering_engine(engine: str) -> BaseClusteringEngine:
+    if engine == "kmeans":
+        return KMeansClusteringEngine()
+    if engine == "threshold":
+        return ThresholdClusteringEngine()
+    raise ValueError(f"Unknown clustering engine: {engine}")
+
+
+def get_clustering_distance(engine: str) -> float:
+    """
+    :return: Min average distance between embeddings in groups of the engine.
+    """
+    if engine == "threshold":
+        return settings.clusterizer.THRESHOLD_CLUSTERING_DISTANCE
+    return settings.clusterizer.EMBEDDINGS_CLUSTERING_DISTANCE
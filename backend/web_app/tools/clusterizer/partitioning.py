@@ -0,0 +1,60 @@
+import logging
+import math
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+logger = logging.getLogger(__name__)
+
+
+def partition_embeddings(
+    embeddings: np.ndarray,
+    rows: np.ndarray,
+    partition_size: int,
+    batch_size: int,
+) -> list[np.ndarray]:
+    """
+    Split the rows into partitions of close embeddings, up to the partition size,
+    with streaming KMeans: fitted and applied batch by batch, so only a batch
+    of the (memory-mapped) embeddings is loaded at a time.
+    Oversized partitions are split again, the same way.
+    :param embeddings: Float32 matrix of embeddings, usually memory-mapped.
+    :param rows: Rows of the embeddings to split.
+    :return: Sorted rows of each partition.
+    """
+    rows = np.sort(rows)
+    if len(rows) <= partition_size:
+        return [rows]
+    n_clusters = math.ceil(len(rows) / partition_size)
+    # Batches must have enough rows to initialize all the clusters
+    batch_size = max(batch_size, n_clusters * 3)
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters, batch_size=batch_size, n_init=1, random_state=42
+    )
+    # Random batches, as the rows are usually ordered (alphabetically)
+    shuffled = np.random.default_rng(42).permutation(rows)
+    for i in range(0, len(shuffled), batch_size):
+        batch = np.sort(shuffled[i : i + batch_size])
+        # The last (small) batch is only assigned, not fitted
+        if i == 0 or len(batch) >= n_clusters:
+            kmeans.partial_fit(_load_rows(embeddings, batch))
+    labels = np.empty(len(rows), dtype=np.intp)
+    for i in range(0, len(rows), batch_size):
+        labels[i : i + batch_size] = kmeans.predict(
+            _load_rows(embeddings, rows[i : i + batch_size])
+        )
+    partitions = [rows[labels == x] for x in np.unique(labels)]
+    if len(partitions) == 1:
+        # Can't be split by similarity (e.g., the same embeddings), split by position
+        return [x for x in np.array_split(rows, n_clusters) if len(x)]
+    logger.debug(f"Split {len(rows)} embeddings into {len(partitions)} partitions.")
+    return [
+        partition
+        for x in partitions
+        for partition in partition_embeddings(embeddings, x, partition_size, batch_size)
+    ]
+
+
+def _load_rows(embeddings: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    # Sorted rows are read from the file sequentially, as far as possible
+    return np.asarray(embeddings[rows], dtype=np.float32)
@@ -0,0 +1,50 @@
+import logging
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.random_projection import GaussianRandomProjection
+
+logger = logging.getLogger(__name__)
+
+
+def reduce_embeddings(
+    embeddings: np.ndarray,
+    method: str | None,
+    dimensions: int,
+    float16: bool = False,
+) -> np.ndarray:
+    """
+    Reduce embeddings to speed up clustering, fitted on the embeddings of the request only.
+    :param method: "truncate" - keep the first dimensions (same as requesting fewer
+    dimensions from the API for `text-embedding-3` models), "pca" - project on the top
+    principal components, "random_projection" - Gaussian random projection,
+    None - keep the dimensions.
+    :param float16: Keep the result as float16, to halve its memory (and the data
+    sent to the clustering workers), clustering itself still runs on float32.
+    :return: Normalized embeddings (a row per phrase).
+    """
+    if method is not None and dimensions < embeddings.shape[1]:
+        if method == "truncate":
+            embeddings = embeddings[:, :dimensions]
+        elif method == "pca":
+            # Uncentered (SVD), as centering would change the cosine similarities
+            # the clustering thresholds are based on, not just approximate them
+            components = min(dimensions, len(embeddings) - 1)
+            if components > 0:
+                embeddings = TruncatedSVD(
+                    n_components=components, random_state=42
+                ).fit_transform(embeddings)
+        elif method == "random_projection":
+            embeddings = GaussianRandomProjection(
+                n_components=dimensions, random_state=42
+            ).fit_transform(embeddings)
+        else:
+            raise ValueError(f"Unknown embeddings reduction method: {method}")
+        logger.debug(f"Reduced embeddings to {embeddings.shape[1]} dimensions.")
+    elif not float16:
+        return embeddings
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return np.ascontiguousarray(
+        embeddings / np.where(norms > 0, norms, 1),
+        dtype=np.float16 if float16 else np.float32,
+    )
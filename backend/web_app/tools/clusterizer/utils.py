@@ -1,13 +1,119 @@
+import math
+import os
+import re
+import unicodedata
 from typing import Generator
 
 import numpy as np
 
+from web_app.config import get_settings
+from web_app.tools.similarity_processor.utils import estimate_tokens
+
+settings = get_settings()
+
 
 def cosine_similarity(a: list[float], b: list[float]) -> float:
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
 
+def avg_cosine_similarity(embeddings: list[list[float]] | np.ndarray) -> float:
+    """
+    Mean cosine similarity over all pairs of different embeddings, vectorized.
+    Normalizes the matrix once and uses a single matrix product
+    instead of calling `cosine_similarity` for every ordered pair.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float64)
+    size = matrix.shape[0]
+    if size < 2:
+        raise ValueError(f"At least 2 embeddings are required, got {size}.")
+    normalized = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    similarities = normalized @ normalized.T
+    # Exclude self-pairs (the diagonal) from both the sum and the count
+    return float((similarities.sum() - np.trace(similarities)) / (size * (size - 1)))
+
+
+def phrase_ngrams(phrase: str, max_n: int = 2) -> set[str]:
+    """
+    Normalized words of the phrase (skipping single-symbol ones) and n-grams of them.
+    """
+    words = re.findall(r"\w+", phrase.lower())
+    ngrams = {x for x in words if len(x) > 1}
+    for n in range(2, max_n + 1):
+        ngrams.update(" ".join(words[i : i + n]) for i in range(len(words) - n + 1))
+    return ngrams
+
+
+def canonical_phrase(
+    phrase: str,
+    unicode_form: str | None = None,
+    sort_words: bool = False,
+    fold_plurals: bool = False,
+) -> str:
+    """
+    Canonical form of the phrase to detect near-duplicates: lowercase words only,
+    separated by single spaces. Phrases without words are kept as is.
+    """
+    if unicode_form:
+        phrase = unicodedata.normalize(unicode_form, phrase)
+    words = re.findall(r"\w+", phrase.lower())
+    if not words:
+        return phrase
+    if fold_plurals:
+        words = [
+            x[:-1] if len(x) > 3 and x.endswith("s") and not x.endswith("ss") else x
+            for x in words
+        ]
+    if sort_words:
+        words.sort()
+    return " ".join(words)
+
+
 def str_chunks(lst: list[str], n: int) -> Generator[list[str], None, None]:
     """Yield successive n-sized chunks from lst."""
     for i in range(0, len(lst), n):
         yield lst[i : i + n]
+
+
+def token_chunks(
+    lst: list[str], max_tokens: int, max_items: int
+) -> Generator[list[str], None, None]:
+    """
+    Yield successive chunks from lst, packed up to the estimated tokens budget
+    and the max items count, keeping the order.
+    A single item above the budget is yielded as a separate chunk.
+    """
+    chunk: list[str] = []
+    chunk_tokens = 0
+    for item in lst:
+        item_tokens = estimate_tokens(item)
+        if chunk and (
+            chunk_tokens + item_tokens > max_tokens or len(chunk) >= max_items
+        ):
+            yield chunk
+            chunk, chunk_tokens = [], 0
+        chunk.append(item)
+        chunk_tokens += item_tokens
+    if chunk:
+        yield chunk
+
+
+def get_clustering_n_jobs() -> int:
+    """
+    How many parallel workers to use for grouping clusters. By default,
+    split available cores between concurrently running clustering jobs.
+    """
+    if settings.clusterizer.EMBEDDINGS_CLUSTERING_N_JOBS:
+        return settings.clusterizer.EMBEDDINGS_CLUSTERING_N_JOBS
+    return max(1, (os.cpu_count() or 1) // settings.clusterizer.CLUSTERING_MAX_WORKERS)
+
+
+def get_kmeans_n_init(n_samples: int) -> int:
+    """
+    How many KMeans restarts to use: all of them for small inputs, where they're cheap
+    and help the most, proportionally fewer for larger ones.
+    """
+    max_n_init = settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_N_INIT
+    full_n_init_samples = settings.clusterizer.EMBEDDINGS_CLUSTERING_FULL_N_INIT_SAMPLES
+    if not full_n_init_samples or n_samples <= full_n_init_samples:
+        return max_n_init
+    return max(1, math.ceil(max_n_init * full_n_init_samples / n_samples))
@@ -0,0 +1,188 @@
+import logging
+import sqlite3
+import time
+from contextlib import closing
+from functools import lru_cache
+from typing import Mapping
+
+import numpy as np
+
+from web_app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Keep the number of SQL variables per query below the SQLite limit
+_QUERY_BATCH_SIZE = 500
+
+
+def normalize_phrase(phrase: str) -> str:
+    """
+    Normalize the phrase to use it as a cache key, so the whitespace/case variants
+    of the same phrase share the same embedding.
+    """
+    return " ".join(phrase.split()).lower()
+
+
+class EmbeddingsCache:
+    """
+    Persistent embeddings store (SQLite) keyed by (model, dimensions, normalized phrase),
+    with size-based LRU eviction. Safe to share between multiple processes (workers).
+    """
+
+    def __init__(self, path: str, max_size_bytes: int) -> None:
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        with closing(self._connect()) as connection:
+            # WAL allows concurrent reads from multiple workers while writing
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, "
+                "dimensions INTEGER NOT NULL, "
+                "phrase TEXT NOT NULL, "
+                "embedding BLOB NOT NULL, "
+                "last_used REAL NOT NULL, "
+                "PRIMARY KEY (model, dimensions, phrase))"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used "
+                "ON embeddings (last_used)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS stats ("
+                "name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO stats (name, value) "
+                "VALUES ('hits', 0), ('misses', 0), ('evictions', 0)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, wait for other workers to release the lock
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def get_many(
+        self, model: str, dimensions: int | None, phrases: list[str]
+    ) -> dict[str, np.ndarray]:
+        """
+        :return: Cached float32 embeddings for the provided phrases (original form).
+        """
+        keys: dict[str, list[str]] = {}
+        for phrase in phrases:
+            keys.setdefault(normalize_phrase(phrase), []).append(phrase)
+        found: dict[str, np.ndarray] = {}
+        now = time.time()
+        normalized_phrases = list(keys)
+        hits = 0
+        with closing(self._connect()) as connection:
+            for i in range(0, len(normalized_phrases), _QUERY_BATCH_SIZE):
+                batch = normalized_phrases[i : i + _QUERY_BATCH_SIZE]
+                rows = connection.execute(
+                    "SELECT phrase, embedding FROM embeddings "
+                    "WHERE model = ? AND dimensions = ? AND phrase IN "
+                    f"({', '.join('?' * len(batch))})",  # nosec
+                    (model, dimensions or 0, *batch),
+                ).fetchall()
+                for phrase, embedding in rows:
+                    for original_phrase in keys[phrase]:
+                        found[original_phrase] = np.frombuffer(
+                            embedding, dtype=np.float32
+                        )
+                hits += len(rows)
+                if rows:
+                    # Mark hits as recently used to keep them from eviction
+                    connection.executemany(
+                        "UPDATE embeddings SET last_used = ? "
+                        "WHERE model = ? AND dimensions = ? AND phrase = ?",
+                        [(now, model, dimensions or 0, x) for x, _ in rows],
+                    )
+            self._increment_stats(
+                connection, hits=hits, misses=len(normalized_phrases) - hits
+            )
+        return found
+
+    def set_many(
+        self,
+        model: str,
+        dimensions: int | None,
+        embeddings: Mapping[str, list[float] | np.ndarray],
+    ) -> None:
+        now = time.time()
+        with closing(self._connect()) as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(model, dimensions, phrase, embedding, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        model,
+                        dimensions or 0,
+                        normalize_phrase(phrase),
+                        np.asarray(embedding, dtype=np.float32).tobytes(),
+                        now,
+                    )
+                    for phrase, embedding in embeddings.items()
+                ],
+            )
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Remove least recently used embeddings until the cache fits the size limit.
+        """
+        excess = self._size(connection) - self.max_size_bytes
+        if excess <= 0:
+            return
+        evicted_rows = []
+        for row_id, size in connection.execute(
+            "SELECT rowid, LENGTH(embedding) FROM embeddings ORDER BY last_used"
+        ):
+            evicted_rows.append((row_id,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM embeddings WHERE rowid = ?", evicted_rows)
+        self._increment_stats(connection, evictions=len(evicted_rows))
+
+    @staticmethod
+    def _size(connection: sqlite3.Connection) -> int:
+        return connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    @staticmethod
+    def _increment_stats(connection: sqlite3.Connection, **counters: int) -> None:
+        connection.executemany(
+            "UPDATE stats SET value = value + ? WHERE name = ?",
+            [(value, name) for name, value in counters.items() if value],
+        )
+
+    def stats(self) -> dict[str, int]:
+        """
+        :return: Hit/miss/eviction counters (shared by all workers) and the cache size.
+        """
+        with closing(self._connect()) as connection:
+            stats = dict(connection.execute("SELECT name, value FROM stats").fetchall())
+            stats["entries"] = connection.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()[0]
+            stats["size_bytes"] = self._size(connection)
+        return stats
+
+
+@lru_cache()
+def get_embeddings_cache() -> EmbeddingsCache | None:
+    """
+    Prepare and cache the embeddings cache, if enabled.
+    """
+    if not settings.embeddings_cache.EMBEDDINGS_CACHE_ENABLED:
+        return None
+    return EmbeddingsCache(
+        path=settings.embeddings_cache.EMBEDDINGS_CACHE_PATH,
+        max_size_bytes=settings.embeddings_cache.EMBEDDINGS_CACHE_MAX_SIZE_MB
+        * 1024
+        * 1024,
+    )
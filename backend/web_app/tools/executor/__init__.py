@@ -0,0 +1,478 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.managers import SyncManager
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from web_app.config import get_settings
+from web_app.models.clusterizer import (
+    ClusteringDeadline,
+    ClusteringEvent,
+    PhrasesGroup,
+)
+from web_app.tools.clusterizer import (
+    AsyncClusteringEventCallback,
+    ClusteringEventCallback,
+)
+from web_app.tools.clusterizer.engines import create_clustering_engine
+from web_app.tools.metrics import (
+    CLUSTERING_ACTIVE_JOBS,
+    CLUSTERING_REJECTED_JOBS,
+    CLUSTERING_STEP_SECONDS,
+)
+from web_app.tools.profiling import get_request_profile, run_profiled
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Step, iteration and duration of the clustering steps, for metrics
+StepTimings = list[tuple[str | None, int | None, float]]
+# Event, stage, done, total, iteration and groups (phrases and average distance),
+# plain values to send events between processes
+PackedEvent = tuple[
+    str, str, int, int, int | None, dict[str, tuple[list[str], float | None]] | None
+]
+
+
+def _pack_event(event: ClusteringEvent) -> PackedEvent:
+    return (
+        event.event,
+        event.stage,
+        event.done,
+        event.total,
+        event.iteration,
+        (
+            {k: (v.phrases, v.avg_distance) for k, v in event.groups.items()}
+            if event.groups is not None
+            else None
+        ),
+    )
+
+
+def _unpack_event(packed: PackedEvent) -> ClusteringEvent:
+    event, stage, done, total, iteration, groups = packed
+    return ClusteringEvent(
+        event=event,
+        stage=stage,
+        done=done,
+        total=total,
+        iteration=iteration,
+        groups=(
+            {
+                k: PhrasesGroup(phrases=phrases, avg_distance=avg_distance)
+                for k, (phrases, avg_distance) in groups.items()
+            }
+            if groups is not None
+            else None
+        ),
+    )
+
+
+class ClusteringOverloadedException(Exception):
+    """
+    Raise when all the clustering workers are busy and the queue is full,
+    so the job can't be accepted right now.
+    """
+
+
+class _LoopEventsQueue:
+    """
+    Pass events from the clustering thread to the event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._queue: asyncio.Queue[ClusteringEvent | None] = asyncio.Queue()
+
+    def put(self, event: ClusteringEvent | None) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    async def get(self) -> ClusteringEvent | None:
+        return await self._queue.get()
+
+
+def _clusterize_phrases(
+    embedded_phrases: list[str],
+    embeddings: np.ndarray,
+    max_tail_size: int,
+    engine: str,
+    pre_grouped: dict[str, PhrasesGroup] | None = None,
+    pre_group: bool = False,
+    profile: bool = False,
+    deadline: float | None = None,
+    events_queue: Any | None = None,
+) -> tuple[dict[str, PhrasesGroup], list[str], bool, StepTimings, dict | None]:
+    """
+    :param engine: Name of the clustering engine.
+    :param pre_grouped: Groups found in the parts of the input by pre-grouping.
+    :param pre_group: Only pre-group a part of the input.
+    :param profile: Profile the job, to add it to the profile of the request.
+    :param deadline: UNIX time to finish the clustering by, skipping the passes
+    that won't finish in time.
+    :param events_queue: Queue (with `put` method) to send clustering events to.
+    :return: Groups, singles, whether the deadline is exhausted, timings
+    of the clustering steps (if metrics are enabled) and the job profile stats,
+    if profiled.
+    """
+    job = functools.partial(
+        _run_clustering_engine,
+        embedded_phrases=embedded_phrases,
+        embeddings=embeddings,
+        max_tail_size=max_tail_size,
+        engine=engine,
+        pre_grouped=pre_grouped,
+        pre_group=pre_group,
+        deadline=ClusteringDeadline(at=deadline) if deadline is not None else None,
+        events_queue=events_queue,
+    )
+    if profile:
+        (groups, singles, exhausted, timings), stats = run_profiled(job)
+        return groups, singles, exhausted, timings, stats
+    return *job(), None
+
+
+def _run_clustering_engine(
+    embedded_phrases: list[str],
+    embeddings: np.ndarray,
+    max_tail_size: int,
+    engine: str,
+    pre_grouped: dict[str, PhrasesGroup] | None,
+    pre_group: bool,
+    deadline: ClusteringDeadline | None,
+    events_queue: Any | None,
+) -> tuple[dict[str, PhrasesGroup], list[str], bool, StepTimings]:
+    clustering_engine = create_clustering_engine(engine)
+    timings: StepTimings = []
+    on_event = _get_worker_on_event(
+        events_queue, timings if settings.metrics.METRICS_ENABLED else None
+    )
+    if pre_group:
+        groups, singles = clustering_engine.pre_group_phrases(
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            on_event=on_event,
+            deadline=deadline,
+        )
+    else:
+        groups, singles = clustering_engine.clusterize_phrases(
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            max_tail_size=max_tail_size,
+            on_event=on_event,
+            pre_grouped=pre_grouped,
+            deadline=deadline,
+        )
+    # Return phrases only, singles indices aren't needed by the caller
+    return groups, singles.phrases, bool(deadline and deadline.exhausted), timings
+
+
+def _get_worker_on_event(
+    events_queue: Any | None, timings: StepTimings | None
+) -> ClusteringEventCallback | None:
+    """
+    Collect the timings of the clustering steps in the worker (they're returned
+    with the result), send only the other events to the queue, if anyone listens.
+    """
+    if events_queue is None and timings is None:
+        return None
+
+    def on_event(event: ClusteringEvent) -> None:
+        if event.event == "timing":
+            if timings is not None:
+                timings.append((event.step, event.iteration, event.seconds or 0))
+        elif isinstance(events_queue, _LoopEventsQueue):
+            events_queue.put(event)
+        elif events_queue is not None:
+            # Plain values are much cheaper to pickle than the models
+            events_queue.put(_pack_event(event))
+
+    return on_event
+
+
+def _clusterize_shared_phrases(
+    embedded_phrases: list[str],
+    shared_memory_name: str,
+    shape: tuple[int, int],
+    dtype: str,
+    max_tail_size: int,
+    engine: str,
+    pre_grouped: dict[str, PhrasesGroup] | None = None,
+    pre_group: bool = False,
+    profile: bool = False,
+    deadline: float | None = None,
+    events_queue: Any | None = None,
+) -> tuple[dict[str, PhrasesGroup], list[str], bool, StepTimings, dict | None]:
+    """
+    Worker entrypoint, attaches to the embeddings matrix in the shared memory
+    instead of receiving (pickled) embeddings.
+    """
+    shared_memory = SharedMemory(name=shared_memory_name)
+    embeddings = np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf)
+    try:
+        return _clusterize_phrases(
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            max_tail_size=max_tail_size,
+            engine=engine,
+            pre_grouped=pre_grouped,
+            pre_group=pre_group,
+            profile=profile,
+            deadline=deadline,
+            events_queue=events_queue,
+        )
+    finally:
+        del embeddings
+        try:
+            shared_memory.close()
+        except BufferError:
+            # Views are still referenced by the traceback of the failed job,
+            # don't mask its error, the mapping is released with them
+            logger.warning("Shared embeddings are still in use, not closed.")
+
+
+class ClusteringExecutor:
+    """
+    Run CPU-bound clustering outside the event loop, in a pool of processes
+    (or threads), with a bounded number of running and queued jobs.
+    """
+
+    def __init__(
+        self,
+        executor_type: str = settings.clusterizer.CLUSTERING_EXECUTOR_TYPE,
+        max_workers: int = settings.clusterizer.CLUSTERING_MAX_WORKERS,
+        max_queued_jobs: int = settings.clusterizer.CLUSTERING_MAX_QUEUED_JOBS,
+    ) -> None:
+        if executor_type not in ("process", "thread"):
+            raise ValueError(f"Unknown clustering executor type: {executor_type}")
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_queued_jobs = max_queued_jobs
+        self.active_jobs = 0
+        # Running and queued jobs
+        self._slots = asyncio.Semaphore(max_workers + max_queued_jobs)
+        self._executor: Executor
+        # Started on demand (outside the event loop), to pass events
+        # from the worker processes
+        self._manager: SyncManager | None = None
+        self._manager_lock = threading.Lock()
+        if executor_type == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                # Don't fork the running event loop (and its threads) into workers
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="clustering"
+            )
+
+    @property
+    def is_full(self) -> bool:
+        return self._slots.locked()
+
+    async def clusterize_phrases(
+        self,
+        embedded_phrases: list[str],
+        embeddings: np.ndarray,
+        max_tail_size: int,
+        wait: bool = False,
+        on_event: AsyncClusteringEventCallback | None = None,
+        engine: str = settings.clusterizer.CLUSTERING_ENGINE,
+        pre_grouped: dict[str, PhrasesGroup] | None = None,
+        pre_group: bool = False,
+        deadline: ClusteringDeadline | None = None,
+    ) -> tuple[dict[str, PhrasesGroup], list[str]]:
+        """
+        :param embeddings: Matrix of embeddings, shared with the worker as float32
+        (or as float16, if provided so, to halve the memory).
+        :param engine: Name of the clustering engine.
+        :param wait: Wait for a free slot when the executor is full, instead of failing.
+        :param on_event: Called (in the event loop) with the clustering events
+        from the worker.
+        :param pre_grouped: Groups found in the parts of the input by pre-grouping,
+        the provided phrases are the ones left ungrouped there.
+        :param pre_group: Only pre-group a part of the input, as soon as it's available
+        (the singles are clusterized later with the rest of the input).
+        :param deadline: Skip the clustering passes that won't finish in time,
+        leaving their phrases as singles (marks the deadline exhausted).
+        """
+        if self.is_full and not wait:
+            CLUSTERING_REJECTED_JOBS.inc()
+            raise ClusteringOverloadedException(
+                f"All {self.max_workers} clustering workers are busy "
+                f"and {self.max_queued_jobs} jobs are already queued."
+            )
+        async with self._slots:
+            self.active_jobs += 1
+            CLUSTERING_ACTIVE_JOBS.set(self.active_jobs)
+            try:
+                return await self._clusterize_phrases(
+                    embedded_phrases=embedded_phrases,
+                    matrix=np.ascontiguousarray(
+                        embeddings,
+                        dtype=(
+                            np.float16 if embeddings.dtype == np.float16 else np.float32
+                        ),
+                    ),
+                    max_tail_size=max_tail_size,
+                    engine=engine,
+                    pre_grouped=pre_grouped,
+                    pre_group=pre_group,
+                    deadline=deadline,
+                    on_event=on_event,
+                )
+            finally:
+                self.active_jobs -= 1
+                CLUSTERING_ACTIVE_JOBS.set(self.active_jobs)
+
+    async def _clusterize_phrases(
+        self,
+        embedded_phrases: list[str],
+        matrix: np.ndarray,
+        max_tail_size: int,
+        engine: str,
+        pre_grouped: dict[str, PhrasesGroup] | None,
+        pre_group: bool,
+        deadline: ClusteringDeadline | None,
+        on_event: AsyncClusteringEventCallback | None,
+    ) -> tuple[dict[str, PhrasesGroup], list[str]]:
+        loop = asyncio.get_running_loop()
+        profile = get_request_profile()
+        events_queue: Any | None = None
+        forwarding: asyncio.Task | None = None
+        if on_event:
+            if self.executor_type == "thread":
+                events_queue = _LoopEventsQueue(loop)
+            else:
+                # Starting the manager and creating its queues are blocking calls
+                events_queue = await loop.run_in_executor(
+                    None, self._create_events_queue
+                )
+            forwarding = asyncio.create_task(
+                self._forward_events(events_queue, on_event)
+            )
+        try:
+            if self.executor_type == "thread":
+                groups, singles, exhausted, timings, stats = await loop.run_in_executor(
+                    self._executor,
+                    _clusterize_phrases,
+                    embedded_phrases,
+                    matrix,
+                    max_tail_size,
+                    engine,
+                    pre_grouped,
+                    pre_group,
+                    profile is not None,
+                    deadline.at if deadline else None,
+                    events_queue,
+                )
+            else:
+                groups, singles, exhausted, timings, stats = (
+                    await self._clusterize_shared_phrases(
+                        embedded_phrases=embedded_phrases,
+                        matrix=matrix,
+                        max_tail_size=max_tail_size,
+                        engine=engine,
+                        pre_grouped=pre_grouped,
+                        pre_group=pre_group,
+                        profile=profile is not None,
+                        deadline=deadline.at if deadline else None,
+                        events_queue=events_queue,
+                    )
+                )
+            if deadline and exhausted:
+                deadline.exhausted = True
+            for step, iteration, seconds in timings:
+                CLUSTERING_STEP_SECONDS.observe(seconds, step=step, iteration=iteration)
+            if profile and stats:
+                profile.add_job_stats(stats)
+            return groups, singles
+        finally:
+            if forwarding:
+                # All the worker events are queued before the result, so stop after them
+                await loop.run_in_executor(None, events_queue.put, None)  # type: ignore
+                await forwarding
+
+    @staticmethod
+    async def _forward_events(
+        events_queue: Any, on_event: AsyncClusteringEventCallback
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if isinstance(events_queue, _LoopEventsQueue):
+                event = await events_queue.get()
+            else:
+                packed = await loop.run_in_executor(None, events_queue.get)
+                event = _unpack_event(packed) if packed is not None else None
+            if event is None:
+                return
+            try:
+                await on_event(event)
+            except Exception as er:
+                # Keep consuming, so the worker is never blocked by the consumer
+                logger.exception(f"Failed to handle clustering event: {er}")
+
+    def _create_events_queue(self) -> Any:
+        with self._manager_lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager.Queue()
+
+    async def _clusterize_shared_phrases(
+        self,
+        embedded_phrases: list[str],
+        matrix: np.ndarray,
+        max_tail_size: int,
+        engine: str,
+        pre_grouped: dict[str, PhrasesGroup] | None,
+        pre_group: bool,
+        profile: bool,
+        deadline: float | None,
+        events_queue: Any | None,
+    ) -> tuple[dict[str, PhrasesGroup], list[str], bool, StepTimings, dict | None]:
+        shared_memory = SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        try:
+            shared_matrix: np.ndarray = np.ndarray(
+                matrix.shape, dtype=matrix.dtype, buffer=shared_memory.buf
+            )
+            shared_matrix[:] = matrix
+            del shared_matrix
+            future = self._executor.submit(
+                _clusterize_shared_phrases,
+                embedded_phrases,
+                shared_memory.name,
+                matrix.shape,
+                matrix.dtype.str,
+                max_tail_size,
+                engine,
+                pre_grouped,
+                pre_group,
+                profile,
+                deadline,
+                events_queue,
+            )
+        except BaseException:
+            shared_memory.close()
+            shared_memory.unlink()
+            raise
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            shared_memory.close()
+            if future.done() or future.cancel():
+                shared_memory.unlink()
+            else:
+                # The request is cancelled, but the job is already passed to a worker,
+                # which attaches to the embeddings, so remove them when it finishes
+                future.add_done_callback(lambda _: shared_memory.unlink())
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
@@ -0,0 +1,662 @@
+import asyncio
+import contextlib
+import dataclasses
+import logging
+import time
+
+import httpx
+import numpy as np
+
+from web_app.config import get_settings
+from web_app.models.clusterizer import (
+    ClusteringDeadline,
+    ClusteringEngine,
+    ClusteringEvent,
+    GroupingPhrasesOutput,
+    PhrasesGroup,
+    StoredGroupingResult,
+)
+from web_app.tools.clusterizer import AsyncClusteringEventCallback, Clusterizer
+from web_app.tools.clusterizer.engines import get_clustering_distance
+from web_app.tools.clusterizer.reduction import reduce_embeddings
+from web_app.tools.clusterizer.utils import canonical_phrase
+from web_app.tools.executor import ClusteringExecutor
+from web_app.tools.grouping_cache import get_grouping_cache, get_grouping_key
+from web_app.tools.metrics import (
+    CLUSTERING_TAIL_RATIO,
+    GROUPING_CACHE_REQUESTS,
+    measure_stage,
+)
+from web_app.tools.results_store import get_compatible_result, get_results_store
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclasses.dataclass
+class _RunningGrouping:
+    task: asyncio.Task
+    # Event callbacks of all the requests waiting for the grouping
+    listeners: list[AsyncClusteringEventCallback]
+    # How many requests wait for the grouping
+    waiters: int = 0
+
+
+# Groupings in progress (in this worker) by their cache key, to coalesce identical requests
+_running_groupings: dict[str, _RunningGrouping] = {}
+
+
+async def run_grouping(
+    phrases_input: list[str],
+    client: httpx.AsyncClient,
+    clustering_executor: ClusteringExecutor,
+    wait_for_executor: bool = False,
+    on_event: AsyncClusteringEventCallback | None = None,
+    engine: ClusteringEngine | None = None,
+    use_cache: bool = True,
+    time_budget: float | None = None,
+) -> GroupingPhrasesOutput:
+    """
+    Full grouping pipeline: get embeddings, then clusterize them outside the event loop.
+    The same phrases (with the same settings) get the cached result, if any.
+    Identical requests arriving while the grouping is in progress wait for it
+    (and get its events from then on, if the request that started it listens
+    to them), instead of grouping the same phrases again.
+    The grouping continues while any of the requests waits for it, and is cancelled
+    when all of them are.
+    :param phrases_input: Unique phrases, sorted alphabetically.
+    :param on_event: Called with the progress of the stages and with the groups
+    as soon as they are final.
+    :param engine: Clustering engine, the default one if not provided.
+    :param use_cache: Reuse the cached (or running) grouping, if any. Otherwise,
+    group the phrases from scratch, e.g., to profile the grouping.
+    :param time_budget: Seconds to return the result in (from now): the clustering
+    passes that won't finish in time are skipped, leaving their phrases as singles.
+    Such requests don't wait for the same running grouping, as it's not bounded,
+    and the partial results aren't cached.
+    """
+    deadline = (
+        ClusteringDeadline(at=time.time() + time_budget)
+        if time_budget is not None
+        else None
+    )
+    grouping_cache = get_grouping_cache()
+    if not grouping_cache or not use_cache:
+        return await _run_grouping(
+            phrases_input=phrases_input,
+            client=client,
+            clustering_executor=clustering_executor,
+            wait_for_executor=wait_for_executor,
+            on_event=on_event,
+            engine=engine,
+            deadline=deadline,
+        )
+    key = get_grouping_key(
+        phrases_input, engine or settings.clusterizer.CLUSTERING_ENGINE
+    )
+    if deadline:
+        return await _run_bounded_grouping(
+            key=key,
+            phrases_input=phrases_input,
+            client=client,
+            clustering_executor=clustering_executor,
+            wait_for_executor=wait_for_executor,
+            on_event=on_event,
+            engine=engine,
+            deadline=deadline,
+        )
+    running = _running_groupings.get(key)
+    if not running:
+        cached = await asyncio.to_thread(grouping_cache.get, key)
+        if cached:
+            GROUPING_CACHE_REQUESTS.inc(result="hit")
+            logger.info(f"Reused cached result for {len(phrases_input)} phrases.")
+            return cached
+        # Check again, as the same grouping could start while reading the cache
+        running = _running_groupings.get(key)
+    if running:
+        GROUPING_CACHE_REQUESTS.inc(result="coalesced")
+        logger.info(f"Waiting for the same grouping of {len(phrases_input)} phrases.")
+    else:
+        GROUPING_CACHE_REQUESTS.inc(result="miss")
+        listeners: list[AsyncClusteringEventCallback] = []
+
+        async def on_grouping_event(event: ClusteringEvent) -> None:
+            for listener in list(listeners):
+                await listener(event)
+
+        async def group() -> GroupingPhrasesOutput:
+            output = await _run_grouping(
+                phrases_input=phrases_input,
+                client=client,
+                clustering_executor=clustering_executor,
+                wait_for_executor=wait_for_executor,
+                # Don't send events from the workers if nobody listens to them
+                on_event=on_grouping_event if on_event else None,
+                engine=engine,
+            )
+            await asyncio.to_thread(grouping_cache.set, key, output)
+            return output
+
+        running = _RunningGrouping(
+            task=asyncio.create_task(group()), listeners=listeners
+        )
+        _running_groupings[key] = running
+        running.task.add_done_callback(lambda x: _finish_grouping(key, x))
+    if on_event:
+        running.listeners.append(on_event)
+    running.waiters += 1
+    try:
+        # Don't cancel the grouping with the request, others could wait for it
+        return await asyncio.shield(running.task)
+    finally:
+        running.waiters -= 1
+        if on_event:
+            running.listeners.remove(on_event)
+        if not running.waiters and not running.task.done():
+            # All the requests are cancelled, don't keep grouping for nobody
+            running.task.cancel()
+            _running_groupings.pop(key, None)
+
+
+async def _run_bounded_grouping(
+    key: str,
+    phrases_input: list[str],
+    client: httpx.AsyncClient,
+    clustering_executor: ClusteringExecutor,
+    wait_for_executor: bool,
+    on_event: AsyncClusteringEventCallback | None,
+    engine: ClusteringEngine | None,
+    deadline: ClusteringDeadline,
+) -> GroupingPhrasesOutput:
+    """
+    Group the phrases within the deadline, reusing only the complete cached result.
+    """
+    grouping_cache = get_grouping_cache()
+    cached = await asyncio.to_thread(grouping_cache.get, key)  # type: ignore[union-attr]
+    if cached:
+        GROUPING_CACHE_REQUESTS.inc(result="hit")
+        logger.info(f"Reused cached result for {len(phrases_input)} phrases.")
+        return cached
+    GROUPING_CACHE_REQUESTS.inc(result="miss")
+    output = await _run_grouping(
+        phrases_input=phrases_input,
+        client=client,
+        clustering_executor=clustering_executor,
+        wait_for_executor=wait_for_executor,
+        on_event=on_event,
+        engine=engine,
+        deadline=deadline,
+    )
+    # Cache only the results that are the same as without the budget
+    if not output.budget_exhausted:
+        await asyncio.to_thread(grouping_cache.set, key, output)  # type: ignore
+    return output
+
+
+def _finish_grouping(key: str, task: asyncio.Task) -> None:
+    # The same grouping could start again after this one was cancelled
+    running = _running_groupings.get(key)
+    if running and running.task is task:
+        _running_groupings.pop(key)
+    # Retrieve the exception, as all the requests waiting for it may be cancelled already
+    if not task.cancelled() and task.exception():
+        logger.debug(f"Grouping failed: {task.exception()}")
+
+
+async def _run_grouping(
+    phrases_input: list[str],
+    client: httpx.AsyncClient,
+    clustering_executor: ClusteringExecutor,
+    wait_for_executor: bool,
+    on_event: AsyncClusteringEventCallback | None,
+    engine: ClusteringEngine | None,
+    deadline: ClusteringDeadline | None = None,
+) -> GroupingPhrasesOutput:
+    # Embed and clusterize only one phrase of the near-duplicates
+    phrases_input, duplicates = _collapse_near_duplicates(phrases_input)
+    on_event = _expand_events(on_event, duplicates)
+    if settings.clusterizer.EMBEDDINGS_PIPELINE_ENABLED:
+        embedded_phrases, embeddings, pre_grouped, ungrouped = (
+            await _get_embeddings_and_pre_group(
+                phrases_input=phrases_input,
+                client=client,
+                clustering_executor=clustering_executor,
+                wait_for_executor=wait_for_executor,
+                on_event=on_event,
+                engine=engine,
+                deadline=deadline,
+            )
+        )
+        groups, singles = await _clusterize_phrases(
+            embedded_phrases=ungrouped,
+            embeddings=_get_rows(embedded_phrases, embeddings, ungrouped),
+            clustering_executor=clustering_executor,
+            wait_for_executor=True,
+            on_event=on_event,
+            engine=engine,
+            # The tail is limited relatively to the whole input
+            max_tail_size=int(
+                len(embeddings)
+                * settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_TAIL_PERCENTAGE
+            ),
+            pre_grouped=pre_grouped,
+            deadline=deadline,
+        )
+    else:
+        embedded_phrases, embeddings = await _get_embeddings(
+            phrases_input=phrases_input, client=client, on_event=on_event
+        )
+        groups, singles = await _clusterize_phrases(
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            clustering_executor=clustering_executor,
+            wait_for_executor=wait_for_executor,
+            on_event=on_event,
+            engine=engine,
+            deadline=deadline,
+        )
+    groups, overflow = _expand_groups(groups, duplicates)
+    output = GroupingPhrasesOutput(
+        groups=groups,
+        singles=_expand_phrases(singles, duplicates) + overflow,
+        budget_exhausted=bool(deadline and deadline.exhausted),
+    )
+    with measure_stage("storing"):
+        return await asyncio.to_thread(
+            _store_result,
+            output=output,
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            groups=groups,
+            engine=engine or settings.clusterizer.CLUSTERING_ENGINE,
+            duplicates=duplicates,
+        )
+
+
+async def run_incremental_grouping(
+    result_id: str,
+    phrases_input: list[str],
+    client: httpx.AsyncClient,
+    clustering_executor: ClusteringExecutor,
+    wait_for_executor: bool = False,
+    on_event: AsyncClusteringEventCallback | None = None,
+    engine: ClusteringEngine | None = None,
+    time_budget: float | None = None,
+) -> GroupingPhrasesOutput:
+    """
+    Add phrases to the stored grouping result: get embeddings of the new phrases only,
+    add them to the existing groups that stay close enough, and clusterize
+    only the previous singles with the remaining new phrases.
+    The previous result is kept, the extended one is stored with a new identifier.
+    :param phrases_input: Unique phrases, sorted alphabetically.
+    :param time_budget: Seconds to return the result in (from now), same as for
+    the whole grouping.
+    """
+    deadline = (
+        ClusteringDeadline(at=time.time() + time_budget)
+        if time_budget is not None
+        else None
+    )
+    stored = await asyncio.to_thread(get_compatible_result, result_id)
+    known_phrases = set(stored.output.singles)
+    for group in stored.output.groups.values():
+        known_phrases.update(group.phrases)
+    new_phrases = [x for x in phrases_input if x not in known_phrases]
+    if not new_phrases:
+        return stored.output
+    new_phrases, duplicates = _collapse_near_duplicates(new_phrases)
+    embedded_phrases, embeddings = await _get_embeddings(
+        phrases_input=new_phrases, client=client, on_event=on_event
+    )
+    embedded_phrases, embeddings = _expand_embeddings(
+        embedded_phrases, embeddings, duplicates
+    )
+    # Add new phrases to the existing groups, if they stay close enough
+    group_ids = list(stored.output.groups)
+    assignments, centroids, sizes = await asyncio.to_thread(
+        Clusterizer.assign_to_groups,
+        centroids=stored.centroids,
+        sizes=np.array([len(x.phrases) for x in stored.output.groups.values()]),
+        embeddings=embeddings,
+        # The groups stay as close as the engine that found them keeps them
+        avg_distance_threshold=get_clustering_distance(stored.engine),
+        max_group_size=settings.clusterizer.MAX_SUGGESTIONS_PER_EMBEDDINGS_GROUP,
+    )
+    groups = dict(stored.output.groups)
+    for group_index in np.unique(assignments[assignments >= 0]):
+        group_id = group_ids[group_index]
+        groups[group_id] = PhrasesGroup(
+            phrases=groups[group_id].phrases
+            + [embedded_phrases[x] for x in np.flatnonzero(assignments == group_index)],
+            avg_distance=round(
+                Clusterizer.centroid_avg_distance(
+                    centroids[group_index], int(sizes[group_index])
+                ),
+                2,
+            ),
+        )
+    # Clusterize the previous singles with the new phrases that weren't assigned
+    unassigned = np.flatnonzero(assignments < 0)
+    pool_phrases = list(stored.output.singles) + [
+        embedded_phrases[x] for x in unassigned
+    ]
+    pool_embeddings = np.vstack([stored.singles_embeddings, embeddings[unassigned]])
+    pool_groups, singles = await _clusterize_phrases(
+        embedded_phrases=pool_phrases,
+        embeddings=pool_embeddings,
+        clustering_executor=clustering_executor,
+        wait_for_executor=wait_for_executor,
+        on_event=on_event,
+        engine=engine,
+        deadline=deadline,
+    )
+    logger.info(
+        f"Added {len(embedded_phrases) - len(unassigned)} of {len(embedded_phrases)} "
+        f"new phrases to existing groups, found {len(pool_groups)} new groups."
+    )
+    with measure_stage("storing"):
+        return await asyncio.to_thread(
+            _store_result,
+            output=GroupingPhrasesOutput(
+                groups={**groups, **pool_groups},
+                singles=singles,
+                budget_exhausted=bool(deadline and deadline.exhausted),
+            ),
+            embedded_phrases=pool_phrases,
+            embeddings=pool_embeddings,
+            groups=pool_groups,
+            engine=engine or settings.clusterizer.CLUSTERING_ENGINE,
+            previous_centroids=centroids,
+        )
+
+
+def _collapse_near_duplicates(
+    phrases_input: list[str],
+) -> tuple[list[str], dict[str, list[str]]]:
+    """
+    :return: The first phrase of each canonical form (keeping the order),
+    and the other phrases of the same form by the first one.
+    """
+    if not settings.clusterizer.PHRASES_CANONICALIZATION_ENABLED:
+        return phrases_input, {}
+    phrases: dict[str, list[str]] = {}
+    representatives: dict[str, str] = {}
+    for phrase in phrases_input:
+        representative = representatives.setdefault(
+            canonical_phrase(
+                phrase,
+                unicode_form=settings.clusterizer.PHRASES_CANONICAL_UNICODE_FORM,
+                sort_words=settings.clusterizer.PHRASES_CANONICAL_SORT_WORDS,
+                fold_plurals=settings.clusterizer.PHRASES_CANONICAL_FOLD_PLURALS,
+            ),
+            phrase,
+        )
+        phrases.setdefault(representative, []).append(phrase)
+    duplicates = {x: y[1:] for x, y in phrases.items() if len(y) > 1}
+    if duplicates:
+        logger.info(
+            f"Collapsed {len(phrases_input) - len(phrases)} near-duplicate phrases."
+        )
+    return list(phrases), duplicates
+
+
+def _expand_phrases(phrases: list[str], duplicates: dict[str, list[str]]) -> list[str]:
+    """
+    Add near-duplicates right after their phrase.
+    """
+    if not duplicates:
+        return phrases
+    return [x for phrase in phrases for x in [phrase, *duplicates.get(phrase, [])]]
+
+
+def _expand_groups(
+    groups: dict[str, PhrasesGroup], duplicates: dict[str, list[str]]
+) -> tuple[dict[str, PhrasesGroup], list[str]]:
+    """
+    Add near-duplicates to the groups of their phrases, as long as the groups stay
+    within `MAX_SUGGESTIONS_PER_EMBEDDINGS_GROUP`.
+    :return: Expanded groups and the near-duplicates that didn't fit (singles).
+    """
+    if not duplicates:
+        return groups, []
+    expanded_groups = {}
+    overflow: list[str] = []
+    for group_id, group in groups.items():
+        room = max(
+            settings.clusterizer.MAX_SUGGESTIONS_PER_EMBEDDINGS_GROUP
+            - len(group.phrases),
+            0,
+        )
+        phrases = []
+        for phrase in group.phrases:
+            phrase_duplicates = duplicates.get(phrase, [])
+            phrases.extend([phrase, *phrase_duplicates[:room]])
+            overflow.extend(phrase_duplicates[room:])
+            room -= min(room, len(phrase_duplicates))
+        expanded_groups[group_id] = PhrasesGroup(
+            phrases=phrases, avg_distance=group.avg_distance
+        )
+    return expanded_groups, overflow
+
+
+def _expand_embeddings(
+    embedded_phrases: list[str],
+    embeddings: np.ndarray,
+    duplicates: dict[str, list[str]],
+) -> tuple[list[str], np.ndarray]:
+    """
+    Share embeddings of the phrases with their near-duplicates.
+    """
+    if not duplicates:
+        return embedded_phrases, embeddings
+    rows = [
+        i
+        for i, phrase in enumerate(embedded_phrases)
+        for _ in range(1 + len(duplicates.get(phrase, [])))
+    ]
+    return _expand_phrases(embedded_phrases, duplicates), embeddings[rows]
+
+
+def _expand_events(
+    on_event: AsyncClusteringEventCallback | None, duplicates: dict[str, list[str]]
+) -> AsyncClusteringEventCallback | None:
+    """
+    Add near-duplicates to the groups of the events, as they are final
+    (the ones that don't fit into the groups are added to the singles of the result).
+    """
+    if not on_event or not duplicates:
+        return on_event
+
+    async def expanding_on_event(event: ClusteringEvent) -> None:
+        if event.groups:
+            event = dataclasses.replace(
+                event, groups=_expand_groups(event.groups, duplicates)[0]
+            )
+        await on_event(event)
+
+    return expanding_on_event
+
+
+async def _get_embeddings(
+    phrases_input: list[str],
+    client: httpx.AsyncClient,
+    on_event: AsyncClusteringEventCallback | None,
+) -> tuple[list[str], np.ndarray]:
+    if on_event:
+        await on_event(
+            ClusteringEvent(
+                event="progress", stage="embeddings", total=len(phrases_input)
+            )
+        )
+    with measure_stage("embeddings"):
+        return await Clusterizer.get_all_phrases_embeddings(
+            phrases_input=phrases_input, client=client, on_event=on_event
+        )
+
+
+async def _get_embeddings_and_pre_group(
+    phrases_input: list[str],
+    client: httpx.AsyncClient,
+    clustering_executor: ClusteringExecutor,
+    wait_for_executor: bool,
+    on_event: AsyncClusteringEventCallback | None,
+    engine: ClusteringEngine | None,
+    deadline: ClusteringDeadline | None = None,
+) -> tuple[list[str], np.ndarray, dict[str, PhrasesGroup], list[str]]:
+    """
+    Pre-group each part of the phrases as soon as its embeddings arrive,
+    in the clustering executor, while the rest of the embeddings are still requested.
+    :return: Phrases and the matrix of their embeddings (input order),
+    groups of all the parts and the phrases left ungrouped.
+    """
+    if on_event:
+        await on_event(
+            ClusteringEvent(
+                event="progress", stage="embeddings", total=len(phrases_input)
+            )
+        )
+    known_embeddings: dict[str, np.ndarray] = {}
+    pre_grouping: list[asyncio.Task] = []
+    try:
+        with measure_stage("embeddings"):
+            async for (
+                phrases_part,
+                embeddings_part,
+            ) in Clusterizer.iter_phrases_embeddings(
+                phrases_input=phrases_input, client=client, on_event=on_event
+            ):
+                known_embeddings.update(zip(phrases_part, embeddings_part))
+                pre_grouping.append(
+                    asyncio.create_task(
+                        _clusterize_phrases(
+                            embedded_phrases=phrases_part,
+                            embeddings=embeddings_part,
+                            clustering_executor=clustering_executor,
+                            # Fail fast only for the first part, the next ones are accepted
+                            wait_for_executor=wait_for_executor or bool(pre_grouping),
+                            on_event=on_event,
+                            engine=engine,
+                            pre_group=True,
+                            deadline=deadline,
+                        )
+                    )
+                )
+        # Only the pre-grouping left after the last embeddings
+        with measure_stage("pre_grouping"):
+            results = await asyncio.gather(*pre_grouping)
+    except BaseException:
+        for task in pre_grouping:
+            task.cancel()
+        raise
+    return (
+        phrases_input,
+        np.vstack([known_embeddings[x] for x in phrases_input]),
+        {k: v for part_groups, _ in results for k, v in part_groups.items()},
+        # Keep the order of singles as returned, same as between the grouping rounds
+        [x for _, part_singles in results for x in part_singles],
+    )
+
+
+async def _clusterize_phrases(
+    embedded_phrases: list[str],
+    embeddings: np.ndarray,
+    clustering_executor: ClusteringExecutor,
+    wait_for_executor: bool,
+    on_event: AsyncClusteringEventCallback | None,
+    engine: ClusteringEngine | None,
+    max_tail_size: int | None = None,
+    pre_grouped: dict[str, PhrasesGroup] | None = None,
+    pre_group: bool = False,
+    deadline: ClusteringDeadline | None = None,
+) -> tuple[dict[str, PhrasesGroup], list[str]]:
+    """
+    :param max_tail_size: Tail size limit, relative to the provided phrases by default.
+    :param pre_grouped: Groups found in the parts of the input by pre-grouping,
+    the provided phrases are the ones left ungrouped there.
+    :param pre_group: Only pre-group a part of the input.
+    :param deadline: Skip the clustering passes that won't finish in time.
+    """
+    if on_event and not pre_group:
+        await on_event(ClusteringEvent(event="progress", stage="clustering"))
+    if not embedded_phrases:
+        return dict(pre_grouped or {}), []
+    if max_tail_size is None:
+        max_tail_size = int(
+            len(embeddings)
+            * settings.clusterizer.EMBEDDINGS_CLUSTERING_MAX_TAIL_PERCENTAGE
+        )
+    # Parts are pre-grouped concurrently, so measured as a whole by the caller
+    with measure_stage("clustering") if not pre_group else contextlib.nullcontext():
+        embeddings = await asyncio.to_thread(
+            reduce_embeddings,
+            embeddings,
+            method=settings.clusterizer.EMBEDDINGS_REDUCTION,
+            dimensions=settings.clusterizer.EMBEDDINGS_REDUCTION_DIMENSIONS,
+            float16=settings.clusterizer.EMBEDDINGS_CLUSTERING_FLOAT16,
+        )
+        groups, singles = await clustering_executor.clusterize_phrases(
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            max_tail_size=max_tail_size,
+            wait=wait_for_executor,
+            on_event=on_event,
+            engine=engine or settings.clusterizer.CLUSTERING_ENGINE,
+            pre_grouped=pre_grouped,
+            pre_group=pre_group,
+            deadline=deadline,
+        )
+    if not pre_group:
+        CLUSTERING_TAIL_RATIO.observe(len(singles) / max(max_tail_size, 1))
+    return groups, singles
+
+
+def _get_rows(
+    embedded_phrases: list[str], embeddings: np.ndarray, phrases: list[str]
+) -> np.ndarray:
+    rows = {phrase: i for i, phrase in enumerate(embedded_phrases)}
+    return embeddings[[rows[x] for x in phrases]]
+
+
+def _store_result(
+    output: GroupingPhrasesOutput,
+    embedded_phrases: list[str],
+    embeddings: np.ndarray,
+    groups: dict[str, PhrasesGroup],
+    engine: str,
+    duplicates: dict[str, list[str]] | None = None,
+    previous_centroids: np.ndarray | None = None,
+) -> GroupingPhrasesOutput:
+    """
+    Store the result with its centroids, to extend it incrementally later.
+    Blocking, call it outside the event loop.
+    :param embedded_phrases: Phrases of the embeddings, at least of the singles
+    and of the groups.
+    :param groups: Output groups to calculate the centroids of.
+    :param engine: Clustering engine the groups were found with.
+    :param duplicates: Near-duplicates of the embedded phrases, sharing their embeddings.
+    :param previous_centroids: Centroids of the other output groups, preceding `groups`.
+    :return: Output with the identifier of the stored result (if the store is enabled).
+    """
+    results_store = get_results_store()
+    if not results_store:
+        return output
+    embedded_phrases, embeddings = _expand_embeddings(
+        embedded_phrases, embeddings, duplicates or {}
+    )
+    centroids = Clusterizer.calculate_centroids(
+        embedded_phrases=embedded_phrases, embeddings=embeddings, groups=groups
+    )
+    if previous_centroids is not None:
+        centroids = np.vstack([previous_centroids, centroids])
+    result_id = results_store.save(
+        StoredGroupingResult(
+            output=output,
+            model=settings.similarity_processor.OPENAI_EMBEDDINGS_MODEL,
+            dimensions=settings.similarity_processor.OPENAI_EMBEDDINGS_DIMENSIONS,
+            engine=engine,
+            centroids=centroids,
+            singles_embeddings=_get_rows(embedded_phrases, embeddings, output.singles),
+        )
+    )
+    return output.model_copy(update={"result_id": result_id})
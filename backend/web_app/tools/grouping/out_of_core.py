@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from web_app.config import get_settings
+from web_app.models.clusterizer import (
+    ClusteringDeadline,
+    ClusteringEngine,
+    ClusteringEvent,
+    GroupingPhrasesOutput,
+    PhrasesGroup,
+)
+from web_app.tools.clusterizer import AsyncClusteringEventCallback, Clusterizer
+from web_app.tools.clusterizer.partitioning import partition_embeddings
+from web_app.tools.executor import ClusteringExecutor
+from web_app.tools.grouping import (
+    _clusterize_phrases,
+    _collapse_near_duplicates,
+    _expand_groups,
+    _expand_phrases,
+)
+from web_app.tools.metrics import measure_stage
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def run_out_of_core_grouping(
+    phrases_input: list[str],
+    client: httpx.AsyncClient,
+    clustering_executor: ClusteringExecutor,
+    on_event: AsyncClusteringEventCallback | None = None,
+    engine: ClusteringEngine | None = None,
+    time_budget: float | None = None,
+) -> GroupingPhrasesOutput:
+    """
+    Grouping pipeline for inputs too large to keep all the embeddings in memory.
+    Embeddings are written to a memory-mapped file as they arrive, split into partitions
+    of close phrases by a streaming partitioner, and each partition is loaded, grouped
+    and released on its own. Then singles of all the partitions are grouped once more,
+    the same way. Groups (phrases only) are collected in memory, so peak memory
+    of the embeddings is bounded by the partition (and batch) size, not the input size.
+    The result isn't stored to be extended incrementally.
+    :param phrases_input: Unique phrases, sorted alphabetically.
+    :param on_event: Called with the progress of the stages
+    (clustering progress is per partition, the round is the iteration).
+    :param time_budget: Seconds to return the result in (from now): the clustering
+    passes that won't finish in time are skipped, leaving their phrases as singles.
+    """
+    deadline = (
+        ClusteringDeadline(at=time.time() + time_budget)
+        if time_budget is not None
+        else None
+    )
+    phrases_input, duplicates = _collapse_near_duplicates(phrases_input)
+    with tempfile.TemporaryDirectory(
+        prefix="grouping-", dir=settings.out_of_core.OUT_OF_CORE_PATH
+    ) as path:
+        with measure_stage("embeddings"):
+            embedded_phrases, embeddings = await _write_embeddings(
+                phrases_input=phrases_input,
+                client=client,
+                path=os.path.join(path, "embeddings.npy"),
+                on_event=on_event,
+            )
+        groups: dict[str, PhrasesGroup] = {}
+        singles = await _group_partitions(
+            embedded_phrases=embedded_phrases,
+            embeddings=embeddings,
+            rows=np.arange(len(embedded_phrases)),
+            clustering_executor=clustering_executor,
+            on_event=on_event,
+            engine=engine,
+            groups=groups,
+            iteration=0,
+            deadline=deadline,
+        )
+        # Close phrases could end up in different partitions (if there's time left)
+        if len(embedded_phrases) > settings.out_of_core.OUT_OF_CORE_PARTITION_SIZE and (
+            not deadline or deadline.fits(0)
+        ):
+            rows = {phrase: i for i, phrase in enumerate(embedded_phrases)}
+            singles = await _group_partitions(
+                embedded_phrases=embedded_phrases,
+                embeddings=embeddings,
+                rows=np.array([rows[x] for x in singles], dtype=np.intp),
+                clustering_executor=clustering_executor,
+                on_event=on_event,
+                engine=engine,
+                groups=groups,
+                iteration=1,
+                deadline=deadline,
+            )
+        # Release the file before removing it
+        del embeddings
+    logger.info(
+        f"Grouped {len(phrases_input)} phrases out-of-core: "
+        f"{len(groups)} groups, {len(singles)} singles."
+    )
+    groups, overflow = _expand_groups(groups, duplicates)
+    return GroupingPhrasesOutput(
+        groups=groups,
+        singles=_expand_phrases(singles, duplicates) + overflow,
+        budget_exhausted=bool(deadline and deadline.exhausted),
+    )
+
+
+async def _write_embeddings(
+    phrases_input: list[str],
+    client: httpx.AsyncClient,
+    path: str,
+    on_event: AsyncClusteringEventCallback | None,
+) -> tuple[list[str], np.ndarray]:
+    """
+    Get embeddings batch by batch, writing them to the file as they arrive.
+    :return: Phrases (order of the rows) and the memory-mapped float32 matrix.
+    """
+    embedded_phrases: list[str] = []
+    embeddings: np.ndarray | None = None
+    if on_event:
+        await on_event(
+            ClusteringEvent(
+                event="progress", stage="embeddings", total=len(phrases_input)
+            )
+        )
+    batch_size = settings.out_of_core.OUT_OF_CORE_BATCH_SIZE
+    for i in range(0, len(phrases_input), batch_size):
+        async for phrases_part, embeddings_part in Clusterizer.iter_phrases_embeddings(
+            phrases_input=phrases_input[i : i + batch_size], client=client
+        ):
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    path,
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(len(phrases_input), embeddings_part.shape[1]),
+                )
+            embeddings[
+                len(embedded_phrases) : len(embedded_phrases) + len(phrases_part)
+            ] = embeddings_part
+            embedded_phrases.extend(phrases_part)
+            if on_event:
+                await on_event(
+                    ClusteringEvent(
+                        event="progress",
+                        stage="embeddings",
+                        done=len(embedded_phrases),
+                        total=len(phrases_input),
+                    )
+                )
+        # Keep only clean pages of the file in memory, the OS can drop them
+        embeddings.flush()  # type: ignore[union-attr]
+    return embedded_phrases, embeddings  # type: ignore[return-value]
+
+
+async def _group_partitions(
+    embedded_phrases: list[str],
+    embeddings: np.ndarray,
+    rows: np.ndarray,
+    clustering_executor: ClusteringExecutor,
+    on_event: AsyncClusteringEventCallback | None,
+    engine: ClusteringEngine | None,
+    groups: dict[str, PhrasesGroup],
+    iteration: int,
+    deadline: ClusteringDeadline | None = None,
+) -> list[str]:
+    """
+    Group each partition of the rows on its own, adding its groups to the provided ones.
+    :return: Phrases that weren't grouped in any partition.
+    """
+    with measure_stage("partitioning"):
+        partitions = await asyncio.to_thread(
+            partition_embeddings,
+            embeddings,
+            rows,
+            partition_size=settings.out_of_core.OUT_OF_CORE_PARTITION_SIZE,
+            batch_size=settings.out_of_core.OUT_OF_CORE_BATCH_SIZE,
+        )
+    singles: list[str] = []
+    for i, partition in enumerate(partitions):
+        partition_groups, partition_singles = await _clusterize_phrases(
+            embedded_phrases=[embedded_phrases[x] for x in partition],
+            embeddings=np.asarray(embeddings[partition], dtype=np.float32),
+            clustering_executor=clustering_executor,
+            # Large inputs run as jobs, the jobs queue is the backpressure
+            wait_for_executor=True,
+            on_event=None,
+            engine=engine,
+            deadline=deadline,
+        )
+        groups.update(partition_groups)
+        singles.extend(partition_singles)
+        if on_event:
+            await on_event(
+                ClusteringEvent(
+                    event="progress",
+                    stage="clustering",
+                    done=i + 1,
+                    total=len(partitions),
+                    iteration=iteration,
+                )
+            )
+    return singles
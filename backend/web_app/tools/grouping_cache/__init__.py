@@ -0,0 +1,131 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from contextlib import closing
+from functools import lru_cache
+
+from web_app.config import get_settings
+from web_app.models.clusterizer import GroupingPhrasesOutput
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def get_grouping_key(phrases_input: list[str], engine: str) -> str:
+    """
+    :param phrases_input: Unique phrases, sorted alphabetically.
+    :return: Hash of the phrases and everything else that affects the grouping result:
+    the clustering engine and settings, and the embeddings model.
+    """
+    key = json.dumps(
+        {
+            "phrases": phrases_input,
+            "engine": engine,
+            "model": settings.similarity_processor.OPENAI_EMBEDDINGS_MODEL,
+            "dimensions": settings.similarity_processor.OPENAI_EMBEDDINGS_DIMENSIONS,
+            "clusterizer": dataclasses.asdict(settings.clusterizer),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class GroupingCache:
+    """
+    Persistent whole grouping results cache (SQLite) keyed by `get_grouping_key`,
+    for the same phrases submitted again (reloads, shared links, retries).
+    Results expire after the TTL, least recently used ones are evicted
+    when the cache exceeds the size limit. Safe to share between multiple processes.
+    """
+
+    def __init__(self, path: str, ttl: int, max_size_bytes: int) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_size_bytes = max_size_bytes
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, "
+                "output TEXT NOT NULL, "
+                "created REAL NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, wait for other workers to release the lock
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def get(self, key: str) -> GroupingPhrasesOutput | None:
+        now = time.time()
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT output FROM results WHERE key = ? AND created > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if not row:
+                return None
+            connection.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?", (now, key)
+            )
+        return GroupingPhrasesOutput.model_validate_json(row[0])
+
+    def set(self, key: str, output: GroupingPhrasesOutput) -> None:
+        now = time.time()
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, output, created, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, output.model_dump_json(), now, now),
+            )
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Remove expired results, then least recently used ones
+        until the cache fits the size limit.
+        """
+        evicted = connection.execute(
+            "DELETE FROM results WHERE created <= ?", (time.time() - self.ttl,)
+        ).rowcount
+        excess = (
+            connection.execute(
+                "SELECT COALESCE(SUM(LENGTH(CAST(output AS BLOB))), 0) FROM results"
+            ).fetchone()[0]
+            - self.max_size_bytes
+        )
+        if excess > 0:
+            evicted_rows = []
+            for row_id, size in connection.execute(
+                "SELECT rowid, LENGTH(CAST(output AS BLOB)) FROM results ORDER BY last_used"
+            ):
+                evicted_rows.append((row_id,))
+                excess -= size
+                if excess <= 0:
+                    break
+            connection.executemany("DELETE FROM results WHERE rowid = ?", evicted_rows)
+            evicted += len(evicted_rows)
+        if evicted:
+            logger.info(f"Evicted {evicted} cached grouping results.")
+
+
+@lru_cache()
+def get_grouping_cache() -> GroupingCache | None:
+    """
+    Prepare and cache the grouping results cache, if enabled.
+    """
+    if not settings.grouping_cache.GROUPING_CACHE_ENABLED:
+        return None
+    return GroupingCache(
+        path=settings.grouping_cache.GROUPING_CACHE_PATH,
+        ttl=settings.grouping_cache.GROUPING_CACHE_TTL,
+        max_size_bytes=settings.grouping_cache.GROUPING_CACHE_MAX_SIZE_MB * 1024 * 1024,
+    )
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+
+import httpx
+import shortuuid
+
+from web_app.config import get_settings
+from web_app.models.clusterizer import (
+    ClusteringEngine,
+    ClusteringEvent,
+    GroupingPhrasesOutput,
+)
+from web_app.models.jobs import GroupingJob
+from web_app.tools.executor import ClusteringExecutor
+from web_app.tools.grouping import run_grouping
+from web_app.tools.grouping.out_of_core import run_out_of_core_grouping
+from web_app.tools.jobs.backends import BaseJobsBackend, create_jobs_backend
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class JobsQueueFullException(Exception):
+    """
+    Raise when too many jobs are already queued to accept a new one.
+    """
+
+
+class JobsManager:
+    """
+    Run grouping jobs in the background with a bounded number of workers,
+    keeping their status and results (until TTL expires) in the jobs backend.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        clustering_executor: ClusteringExecutor,
+        backend: BaseJobsBackend | None = None,
+        max_workers: int = settings.jobs.JOBS_MAX_WORKERS,
+        max_queued_jobs: int = settings.jobs.JOBS_MAX_QUEUED,
+        result_ttl: int = settings.jobs.JOBS_RESULT_TTL,
+    ) -> None:
+        self.client = client
+        self.clustering_executor = clustering_executor
+        self.backend = backend or create_jobs_backend(settings.jobs.JOBS_BACKEND)
+        self.max_workers = max_workers
+        self.max_queued_jobs = max_queued_jobs
+        self.result_ttl = result_ttl
+        self._workers: list[asyncio.Task] = []
+        # Jobs running in the current process, to be able to cancel them
+        self._running_jobs: dict[str, asyncio.Task] = {}
+
+    def start(self) -> None:
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"grouping-jobs-worker-{i}")
+            for i in range(self.max_workers)
+        ]
+        self._workers.append(
+            asyncio.create_task(self._evict(), name="grouping-jobs-eviction")
+        )
+
+    async def stop(self) -> None:
+        for task in [*self._workers, *self._running_jobs.values()]:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(
+        self,
+        phrases: list[str],
+        engine: ClusteringEngine | None = None,
+        time_budget: float | None = None,
+    ) -> GroupingJob:
+        """
+        :param phrases: Unique phrases, sorted alphabetically.
+        :param engine: Clustering engine, the default one if not provided.
+        :param time_budget: Seconds to group the phrases in, from the job start.
+        """
+        if await self.backend.queue_size() >= self.max_queued_jobs:
+            raise JobsQueueFullException(
+                f"{self.max_queued_jobs} grouping jobs are already queued."
+            )
+        now = time.time()
+        job = GroupingJob(
+            job_id=str(shortuuid.uuid()),
+            status="queued",
+            phrases_count=len(phrases),
+            engine=engine,
+            time_budget=time_budget,
+            created_at=now,
+            updated_at=now,
+        )
+        await self.backend.create_job(job, phrases)
+        await self.backend.enqueue(job.job_id)
+        return job
+
+    async def get_job(self, job_id: str) -> GroupingJob | None:
+        return await self.backend.get_job(job_id)
+
+    async def get_result(self, job_id: str) -> GroupingPhrasesOutput | None:
+        return await self.backend.get_result(job_id)
+
+    async def cancel(self, job_id: str) -> GroupingJob | None:
+        job = await self.backend.get_job(job_id)
+        if not job or job.is_finished:
+            return job
+        job = await self._update_job(job, status="cancelled")
+        # Queued jobs are skipped by workers, running ones are stopped
+        if job_id in self._running_jobs:
+            self._running_jobs[job_id].cancel()
+        return job
+
+    async def _update_job(
+        self, job: GroupingJob, **update: str | float | None
+    ) -> GroupingJob:
+        job = job.model_copy(update={**update, "updated_at": time.time()})
+        await self.backend.update_job(job)
+        return job
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self.backend.dequeue()
+            job = await self.backend.get_job(job_id)
+            phrases = await self.backend.get_phrases(job_id)
+            # Skip cancelled or expired jobs
+            if not job or job.status != "queued" or phrases is None:
+                continue
+            task = asyncio.create_task(self._run_job(job, phrases))
+            self._running_jobs[job_id] = task
+            try:
+                # Don't propagate the job cancellation to the worker
+                await asyncio.wait({task})
+            finally:
+                self._running_jobs.pop(job_id, None)
+
+    async def _run_job(self, job: GroupingJob, phrases: list[str]) -> None:
+        job = await self._update_job(job, status="running")
+
+        async def on_event(event: ClusteringEvent) -> None:
+            nonlocal job
+            if event.event != "progress":
+                return
+            progress = round(event.done / event.total, 3) if event.total else None
+            job = await self._update_job(job, stage=event.stage, progress=progress)
+
+        try:
+            if (
+                settings.out_of_core.OUT_OF_CORE_ENABLED
+                and len(phrases) > settings.out_of_core.OUT_OF_CORE_MIN_PHRASES
+            ):
+                result = await run_out_of_core_grouping(
+                    phrases_input=phrases,
+                    client=self.client,
+                    clustering_executor=self.clustering_executor,
+                    on_event=on_event,
+                    engine=job.engine,
+                    time_budget=job.time_budget,
+                )
+            else:
+                result = await run_grouping(
+                    phrases_input=phrases,
+                    client=self.client,
+                    clustering_executor=self.clustering_executor,
+                    # The jobs queue is the backpressure, so wait for the clustering workers
+                    wait_for_executor=True,
+                    on_event=on_event,
+                    engine=job.engine,
+                    time_budget=job.time_budget,
+                )
+        except asyncio.CancelledError:
+            logger.info(f"Grouping job {job.job_id} was cancelled.")
+            raise
+        except Exception as er:
+            logger.exception(f"Grouping job {job.job_id} failed: {er}")
+            await self._update_job(job, status="failed", error=str(er))
+            return
+        await self.backend.set_result(job.job_id, result)
+        await self._update_job(job, status="completed", stage=None, progress=None)
+
+    async def _evict(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.result_ttl, 60))
+            evicted = await self.backend.evict_finished(self.result_ttl)
+            if evicted:
+                logger.info(f"Evicted {evicted} expired grouping jobs.")
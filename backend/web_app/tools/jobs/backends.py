@@ -0,0 +1,127 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+
+from web_app.models.clusterizer import GroupingPhrasesOutput
+from web_app.models.jobs import GroupingJob
+
+
+class BaseJobsBackend(ABC):
+    """
+    Storage and queue of grouping jobs. Implement to keep jobs outside the process
+    (for example, in Redis), to share them between workers.
+    """
+
+    @abstractmethod
+    async def create_job(self, job: GroupingJob, phrases: list[str]) -> None:
+        """
+        Store the new job and its input.
+        """
+
+    @abstractmethod
+    async def get_job(self, job_id: str) -> GroupingJob | None:
+        pass
+
+    @abstractmethod
+    async def update_job(self, job: GroupingJob) -> None:
+        pass
+
+    @abstractmethod
+    async def get_phrases(self, job_id: str) -> list[str] | None:
+        """
+        :return: Input phrases of the job, if it isn't finished yet.
+        """
+
+    @abstractmethod
+    async def set_result(self, job_id: str, result: GroupingPhrasesOutput) -> None:
+        pass
+
+    @abstractmethod
+    async def get_result(self, job_id: str) -> GroupingPhrasesOutput | None:
+        pass
+
+    @abstractmethod
+    async def enqueue(self, job_id: str) -> None:
+        pass
+
+    @abstractmethod
+    async def dequeue(self) -> str:
+        """
+        Wait for the next queued job.
+        """
+
+    @abstractmethod
+    async def queue_size(self) -> int:
+        """
+        :return: Number of jobs waiting in the queue.
+        """
+
+    @abstractmethod
+    async def evict_finished(self, ttl: float) -> int:
+        """
+        Remove finished jobs (and their results) not updated for longer than TTL.
+        :return: Number of removed jobs.
+        """
+
+
+class InMemoryJobsBackend(BaseJobsBackend):
+    """
+    Local stand-in, keeps the jobs in the memory of the current process.
+    """
+
+    def __init__(self) -> None:
+        self._jobs: dict[str, GroupingJob] = {}
+        self._phrases: dict[str, list[str]] = {}
+        self._results: dict[str, GroupingPhrasesOutput] = {}
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+
+    async def create_job(self, job: GroupingJob, phrases: list[str]) -> None:
+        self._jobs[job.job_id] = job
+        self._phrases[job.job_id] = phrases
+
+    async def get_job(self, job_id: str) -> GroupingJob | None:
+        return self._jobs.get(job_id)
+
+    async def update_job(self, job: GroupingJob) -> None:
+        if job.job_id in self._jobs:
+            self._jobs[job.job_id] = job
+        if job.is_finished:
+            # Input isn't needed anymore
+            self._phrases.pop(job.job_id, None)
+
+    async def get_phrases(self, job_id: str) -> list[str] | None:
+        return self._phrases.get(job_id)
+
+    async def set_result(self, job_id: str, result: GroupingPhrasesOutput) -> None:
+        self._results[job_id] = result
+
+    async def get_result(self, job_id: str) -> GroupingPhrasesOutput | None:
+        return self._results.get(job_id)
+
+    async def enqueue(self, job_id: str) -> None:
+        self._queue.put_nowait(job_id)
+
+    async def dequeue(self) -> str:
+        return await self._queue.get()
+
+    async def queue_size(self) -> int:
+        return self._queue.qsize()
+
+    async def evict_finished(self, ttl: float) -> int:
+        expired_before = time.time() - ttl
+        expired_jobs = [
+            x.job_id
+            for x in self._jobs.values()
+            if x.is_finished and x.updated_at < expired_before
+        ]
+        for job_id in expired_jobs:
+            self._jobs.pop(job_id, None)
+            self._phrases.pop(job_id, None)
+            self._results.pop(job_id, None)
+        return len(expired_jobs)
+
+
+def create_jobs_backend(backend: str) -> BaseJobsBackend:
+    if backend == "memory":
+        return InMemoryJobsBackend()
+    raise ValueError(f"Unknown jobs backend: {backend}")
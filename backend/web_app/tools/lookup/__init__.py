@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+
+import httpx
+
+from web_app.config import get_settings
+from web_app.models.lookup import PhraseLookup
+from web_app.tools.clusterizer import Clusterizer
+from web_app.tools.lookup.backends import BaseLookupIndex, create_lookup_index
+from web_app.tools.results_store import get_compatible_result
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class GroupsLookup:
+    """
+    Find the closest group of the stored grouping result for new phrases.
+    Indexes of the groups centroids are built once per result and kept in memory
+    (least recently used ones are dropped).
+    """
+
+    def __init__(
+        self,
+        backend: str = settings.lookup.LOOKUP_INDEX_BACKEND,
+        max_cached_indexes: int = settings.lookup.LOOKUP_MAX_CACHED_INDEXES,
+    ) -> None:
+        self.backend = backend
+        self.max_cached_indexes = max_cached_indexes
+        self._indexes: OrderedDict[str, tuple[list[str], BaseLookupIndex | None]] = (
+            OrderedDict()
+        )
+
+    async def lookup(
+        self,
+        result_id: str,
+        phrases_input: list[str],
+        client: httpx.AsyncClient,
+        min_similarity: float = settings.lookup.LOOKUP_MIN_SIMILARITY,
+    ) -> list[PhraseLookup]:
+        """
+        :param phrases_input: Unique phrases.
+        :param min_similarity: Phrases less similar to their closest group are singles.
+        """
+        group_ids, index = await self._get_index(result_id)
+        _, embeddings = await Clusterizer.get_all_phrases_embeddings(
+            phrases_input=phrases_input, client=client
+        )
+        if index is None:
+            return [PhraseLookup(phrase=x, group_id=None) for x in phrases_input]
+        closest, similarities = await asyncio.to_thread(index.search, embeddings)
+        return [
+            PhraseLookup(
+                phrase=phrase,
+                group_id=group_ids[group] if similarity >= min_similarity else None,
+                similarity=round(float(similarity), 4),
+            )
+            for phrase, group, similarity in zip(phrases_input, closest, similarities)
+        ]
+
+    async def _get_index(
+        self, result_id: str
+    ) -> tuple[list[str], BaseLookupIndex | None]:
+        if result_id in self._indexes:
+            self._indexes.move_to_end(result_id)
+            return self._indexes[result_id]
+        stored = await asyncio.to_thread(get_compatible_result, result_id)
+        index = None
+        if len(stored.centroids):
+            index = await asyncio.to_thread(
+                create_lookup_index, self.backend, stored.centroids
+            )
+        self._indexes[result_id] = (list(stored.output.groups), index)
+        if len(self._indexes) > self.max_cached_indexes:
+            self._indexes.popitem(last=False)
+        logger.info(
+            f"Built {self.backend} lookup index of {len(stored.centroids)} groups "
+            f"for result {result_id}."
+        )
+        return self._indexes[result_id]
+
+
+@lru_cache()
+def get_groups_lookup() -> GroupsLookup:
+    """
+    Prepare and cache the groups lookup of the current worker.
+    """
+    return GroupsLookup()
@@ -0,0 +1,68 @@
+import importlib.util
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class BaseLookupIndex(ABC):
+    """
+    Index of groups centroids to find the closest group of each embedding.
+    Implement to plug in another (approximate) nearest neighbours library.
+    """
+
+    @abstractmethod
+    def search(self, embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param embeddings: Float32 matrix of embeddings (a row per phrase).
+        :return: Closest centroid (row) per embedding and the cosine similarity to it.
+        """
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(
+            matrix / np.linalg.norm(matrix, axis=1, keepdims=True), dtype=np.float32
+        )
+
+
+class BruteForceLookupIndex(BaseLookupIndex):
+    """
+    Exact search: a single matrix product with all the (normalized) centroids.
+    """
+
+    def __init__(self, centroids: np.ndarray) -> None:
+        self._centroids = self._normalize(centroids)
+
+    def search(self, embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        similarities = self._normalize(embeddings) @ self._centroids.T
+        closest = similarities.argmax(axis=1)
+        return closest, similarities[np.arange(len(closest)), closest]
+
+
+class HnswLookupIndex(BaseLookupIndex):
+    """
+    Approximate search with HNSW graph (`hnswlib` package), for results with many groups.
+    """
+
+    def __init__(self, centroids: np.ndarray, ef: int = 64, m: int = 16) -> None:
+        hnswlib = importlib.import_module("hnswlib")
+        self._index = hnswlib.Index(space="cosine", dim=centroids.shape[1])
+        self._index.init_index(
+            max_elements=len(centroids), ef_construction=max(ef, 100), M=m
+        )
+        self._index.add_items(self._normalize(centroids), np.arange(len(centroids)))
+        self._index.set_ef(ef)
+
+    def search(self, embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        labels, distances = self._index.knn_query(self._normalize(embeddings), k=1)
+        # Cosine distance is `1 - similarity`
+        return labels[:, 0].astype(np.intp), 1 - distances[:, 0]
+
+
+def create_lookup_index(backend: str, centroids: np.ndarray) -> BaseLookupIndex:
+    if backend == "brute":
+        return BruteForceLookupIndex(centroids)
+    if backend == "hnsw":
+        if not importlib.util.find_spec("hnswlib"):
+            raise ValueError("Lookup index backend `hnsw` requires `hnswlib` package.")
+        return HnswLookupIndex(centroids)
+    raise ValueError(f"Unknown lookup index backend: {backend}")
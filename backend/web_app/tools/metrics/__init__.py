@@ -0,0 +1,225 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+# Upper bounds of the histogram buckets, in seconds by default
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Stage timings of the current request, for `Server-Timing` header
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    """
+    Metric of the current process in Prometheus text format, with optional labels.
+    """
+
+    type = ""
+
+    def __init__(
+        self, name: str, documentation: str, label_names: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _get_labels(self, labels: dict[str, str | int | None]) -> tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.label_names}, "
+                f"got {tuple(labels)}."
+            )
+        return tuple(str(labels[x]) for x in self.label_names)
+
+    def _format_labels(self, values: tuple[str, ...], **extra: str) -> str:
+        labels = {**dict(zip(self.label_names, values)), **extra}
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{x}="{_escape(y)}"' for x, y in labels.items()) + "}"
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self._render_samples(),
+        ]
+
+    def _render_samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str | int | None) -> None:
+        key = self._get_labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{self._format_labels(x)} {y}" for x, y in values.items()]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str | int | None) -> None:
+        key = self._get_labels(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{self._format_labels(x)} {y}" for x, y in values.items()]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = (*sorted(buckets), math.inf)
+        # Count per bucket (not cumulative) and the sum of the observed values
+        self._values: dict[tuple[str, ...], tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str | int | None) -> None:
+        key = self._get_labels(labels)
+        bucket = next(i for i, x in enumerate(self.buckets) if value <= x)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bucket] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            values = {x: (list(y), z) for x, (y, z) in self._values.items()}
+        samples = []
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else str(bound)
+                samples.append(
+                    f"{self.name}_bucket{self._format_labels(key, le=le)} {cumulative}"
+                )
+            samples.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            samples.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return samples
+
+
+_metrics: list[_Metric] = []
+
+
+def render_metrics() -> str:
+    """
+    :return: All the metrics of the current process in Prometheus text format.
+    """
+    return "\n".join(x for metric in _metrics for x in metric.render()) + "\n"
+
+
+@contextmanager
+def collect_request_timings() -> Iterator[dict[str, float]]:
+    """
+    Collect stage timings of the code running within (including its tasks),
+    total seconds by the stage. Nested collections share the outer timings.
+    """
+    timings = _request_timings.get()
+    if timings is not None:
+        yield timings
+        return
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+@contextmanager
+def measure_stage(stage: str) -> Iterator[None]:
+    """
+    Observe the wall time of the grouping stage, and add it to the request timings.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        GROUPING_STAGE_SECONDS.observe(seconds, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0) + seconds
+
+
+GROUPING_STAGE_SECONDS = Histogram(
+    "grouping_stage_seconds",
+    "Wall time of the grouping stages.",
+    ("stage",),
+)
+GROUPING_CACHE_REQUESTS = Counter(
+    "grouping_cache_requests_total",
+    "Grouping requests by the whole results cache outcome "
+    "(hit, miss, coalesced - waited for the same grouping in progress).",
+    ("result",),
+)
+EMBEDDINGS_REQUEST_SECONDS = Histogram(
+    "embeddings_request_seconds",
+    "Embeddings API latency per chunk of phrases, including retries.",
+)
+EMBEDDINGS_RETRIES = Counter(
+    "embeddings_retries_total",
+    "Retried embeddings API requests, by the error.",
+    ("error",),
+)
+CLUSTERING_STEP_SECONDS = Histogram(
+    "clustering_step_seconds",
+    "Wall time of the clustering steps (pre_split - KMeans split into chunks, "
+    "group_cluster - grouping of a single chunk, round - whole grouping round), "
+    "by the round (recursion level).",
+    ("step", "iteration"),
+)
+CLUSTERING_TAIL_RATIO = Histogram(
+    "clustering_tail_ratio",
+    "Ungrouped phrases relative to the max tail size (above 1 - the limit was exceeded).",
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.25, 1.5, 2, 3, 5),
+)
+CLUSTERING_REJECTED_JOBS = Counter(
+    "clustering_rejected_jobs_total",
+    "Clustering jobs rejected, as all the workers were busy and the queue was full.",
+)
+CLUSTERING_ACTIVE_JOBS = Gauge(
+    "clustering_active_jobs",
+    "Running and queued jobs of the clustering executor.",
+)
@@ -0,0 +1,247 @@
+import cProfile
+import dataclasses
+import logging
+import marshal
+import pstats
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, Iterator, TypeVar
+
+import shortuuid
+
+from web_app.config import get_settings
+from web_app.models.profiling import GroupingProfile, ProfiledFunction
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Profile of the current request, if it's profiled
+_request_profile: ContextVar["RequestProfile | None"] = ContextVar(
+    "request_profile", default=None
+)
+# Only a single profiler can run in the process at a time
+_profiling_lock = threading.Lock()
+
+
+class ProfilingBusyException(Exception):
+    """
+    Raise when another request of the worker is being profiled already.
+    """
+
+
+class _ProfileStats:
+    """
+    Profile stats received from the clustering worker, in the form `pstats` loads.
+    """
+
+    def __init__(self, stats: dict) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+class RequestProfile:
+    """
+    Deterministic profile (cProfile) of the request, combined with the profiles
+    of its clustering jobs from the executor workers.
+    """
+
+    def __init__(self) -> None:
+        self._profiler = cProfile.Profile()
+        self._jobs_stats: list[dict] = []
+        self.started_at = time.time()
+        self.seconds = 0.0
+
+    def add_job_stats(self, stats: dict) -> None:
+        self._jobs_stats.append(stats)
+
+    def get_stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self._profiler)
+        for job_stats in self._jobs_stats:
+            stats.add(_ProfileStats(job_stats))
+        return stats
+
+
+def get_request_profile() -> RequestProfile | None:
+    return _request_profile.get()
+
+
+@contextmanager
+def profile_request() -> Iterator[RequestProfile]:
+    """
+    Profile the code running within (including its tasks and clustering jobs).
+    The event loop is profiled as a whole, so concurrent requests are included too.
+    """
+    if not _profiling_lock.acquire(blocking=False):
+        raise ProfilingBusyException("Another request is being profiled.")
+    profile = RequestProfile()
+    token = _request_profile.set(profile)
+    start = time.perf_counter()
+    profile._profiler.enable()
+    try:
+        yield profile
+    finally:
+        profile._profiler.disable()
+        profile.seconds = time.perf_counter() - start
+        _request_profile.reset(token)
+        _profiling_lock.release()
+
+
+def run_profiled(function: Callable[[], T]) -> tuple[T, dict | None]:
+    """
+    Run the clustering job under the profiler, in the executor worker.
+    :return: Result of the function and its profile stats (picklable),
+    if the profiler could be started.
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows a single profiler per process, the request one
+        # covers the thread workers already
+        return function(), None
+    try:
+        result = function()
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return result, profiler.stats
+
+
+def get_settings_snapshot() -> dict[str, Any]:
+    snapshot = dataclasses.asdict(settings)
+    snapshot["similarity_processor"].pop("OPENAI_API_KEY", None)
+    return snapshot
+
+
+class ProfilesStore:
+    """
+    Persistent store (SQLite) of the grouping profiles, with the stats to download
+    (`pstats` format) and a summary. Only the latest profiles are kept.
+    Safe to share between multiple processes (workers).
+    """
+
+    def __init__(self, path: str, max_profiles: int, top_functions: int) -> None:
+        self.path = path
+        self.max_profiles = max_profiles
+        self.top_functions = top_functions
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS profiles ("
+                "profile_id TEXT PRIMARY KEY, "
+                "summary TEXT NOT NULL, "
+                "stats BLOB NOT NULL, "
+                "created REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS profiles_created ON profiles (created)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, wait for other workers to release the lock
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def save(
+        self,
+        profile: RequestProfile,
+        phrases_count: int,
+        engine: str | None,
+        stages: dict[str, float],
+    ) -> GroupingProfile:
+        stats = profile.get_stats()
+        summary = GroupingProfile(
+            profile_id=shortuuid.uuid(),
+            created_at=profile.started_at,
+            phrases_count=phrases_count,
+            engine=engine,
+            seconds=round(profile.seconds, 3),
+            stages={x: round(y, 3) for x, y in stages.items()},
+            settings=get_settings_snapshot(),
+            hot_spots=self._get_hot_spots(stats),
+        )
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "INSERT INTO profiles (profile_id, summary, stats, created) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    summary.profile_id,
+                    summary.model_dump_json(),
+                    # Same as `pstats.Stats.dump_stats` writes
+                    marshal.dumps(stats.stats),  # type: ignore[attr-defined]
+                    summary.created_at,
+                ),
+            )
+            self._evict(connection)
+        return summary
+
+    def get_summary(self, profile_id: str) -> GroupingProfile | None:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT summary FROM profiles WHERE profile_id = ?", (profile_id,)
+            ).fetchone()
+        return GroupingProfile.model_validate_json(row[0]) if row else None
+
+    def get_stats(self, profile_id: str) -> bytes | None:
+        """
+        :return: Profile stats, loadable with `pstats.Stats(path)` (or snakeviz).
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT stats FROM profiles WHERE profile_id = ?", (profile_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _get_hot_spots(self, stats: pstats.Stats) -> list[ProfiledFunction]:
+        functions = sorted(
+            stats.stats.items(),  # type: ignore[attr-defined]
+            key=lambda x: x[1][2],
+            reverse=True,
+        )
+        return [
+            ProfiledFunction(
+                function=f"{filename}:{line}({name})",
+                calls=calls,
+                own_seconds=round(own_seconds, 6),
+                cumulative_seconds=round(cumulative_seconds, 6),
+            )
+            for (filename, line, name), (
+                _,
+                calls,
+                own_seconds,
+                cumulative_seconds,
+                _,
+            ) in functions[: self.top_functions]
+        ]
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        evicted = connection.execute(
+            "DELETE FROM profiles WHERE profile_id NOT IN "
+            "(SELECT profile_id FROM profiles ORDER BY created DESC LIMIT ?)",
+            (self.max_profiles,),
+        ).rowcount
+        if evicted:
+            logger.info(f"Evicted {evicted} old grouping profiles.")
+
+
+@lru_cache()
+def get_profiles_store() -> ProfilesStore | None:
+    """
+    Prepare and cache the profiles store, if profiling is enabled.
+    """
+    if not settings.profiling.PROFILING_ENABLED:
+        return None
+    return ProfilesStore(
+        path=settings.profiling.PROFILING_PATH,
+        max_profiles=settings.profiling.PROFILING_MAX_PROFILES,
+        top_functions=settings.profiling.PROFILING_TOP_FUNCTIONS,
+    )
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
+from web_app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limit concurrent requests to the rate-limited API with AIMD (additive increase,
+    multiplicative decrease) concurrency, and a tokens-per-minute budget.
+    Grow the concurrency slowly on success, halve it and pause on rate limits.
+    Bound to the event loop it's created in.
+    """
+
+    def __init__(
+        self,
+        min_concurrency: int,
+        max_concurrency: int,
+        initial_concurrency: int,
+        tokens_per_minute: int,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(
+            min(max(initial_concurrency, min_concurrency), max_concurrency)
+        )
+        self.tokens_per_minute = tokens_per_minute
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.rate_limited_count = 0
+        # Tokens bucket, refilled continuously up to a minute worth of tokens
+        self._tokens = float(tokens_per_minute)
+        self._tokens_updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self.condition = asyncio.Condition()
+
+    def _refill_tokens(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens
+            + (now - self._tokens_updated_at) * self.tokens_per_minute / 60,
+            float(self.tokens_per_minute),
+        )
+        self._tokens_updated_at = now
+
+    def _get_wait_time(self, tokens: int) -> float | None:
+        """
+        :return: How long to wait before the request is allowed (0 if allowed now),
+        None if waiting for another request to finish.
+        """
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        if self.in_flight >= int(self.concurrency):
+            return None
+        self._refill_tokens()
+        # Requests larger than the whole budget wait for the full bucket
+        required_tokens = min(tokens, self.tokens_per_minute)
+        if self._tokens < required_tokens:
+            return (required_tokens - self._tokens) * 60 / self.tokens_per_minute
+        return 0
+
+    @asynccontextmanager
+    async def slot(self, tokens: int) -> AsyncGenerator[None, None]:
+        """
+        Wait until the request with the provided tokens estimate fits the limits.
+        """
+        async with self.condition:
+            while True:
+                wait_time = self._get_wait_time(tokens)
+                if wait_time == 0:
+                    break
+                try:
+                    await asyncio.wait_for(self.condition.wait(), timeout=wait_time)
+                except asyncio.TimeoutError:
+                    pass
+            self._tokens -= tokens
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    def on_success(self) -> None:
+        # Additive increase, about +1 concurrent request per "window" of requests
+        self.concurrency = min(
+            self.concurrency + 1 / self.concurrency, float(self.max_concurrency)
+        )
+
+    def on_rate_limited(self, retry_after: float | None) -> None:
+        # Multiplicative decrease, and pause all the requests if asked to
+        self.rate_limited_count += 1
+        self.concurrency = max(
+            self.concurrency * self.decrease_factor, float(self.min_concurrency)
+        )
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        logger.warning(
+            f"Rate limited, decreasing concurrency to {int(self.concurrency)} "
+            f"(retry after: {retry_after}s)."
+        )
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "concurrency": round(self.concurrency, 2),
+            "in_flight": self.in_flight,
+            "rate_limited": self.rate_limited_count,
+            "available_tokens": round(self._tokens),
+        }
+
+
+# Embeddings API limiters by their event loop, dropped with the loop
+_embeddings_rate_limiters: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, AdaptiveConcurrencyLimiter
+] = weakref.WeakKeyDictionary()
+
+
+def get_embeddings_rate_limiter() -> AdaptiveConcurrencyLimiter:
+    """
+    Prepare and cache the embeddings API limiter of the running event loop,
+    shared by all the requests of the worker, as the API limits are per key,
+    not per request. Call it within the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    rate_limiter = _embeddings_rate_limiters.get(loop)
+    if not rate_limiter:
+        rate_limiter = AdaptiveConcurrencyLimiter(
+            min_concurrency=settings.similarity_processor.OPENAI_EMBEDDINGS_MIN_CONCURRENCY,
+            max_concurrency=settings.similarity_processor.OPENAI_EMBEDDINGS_MAX_CONCURRENCY,
+            initial_concurrency=settings.similarity_processor.OPENAI_EMBEDDINGS_INITIAL_CONCURRENCY,
+            tokens_per_minute=settings.similarity_processor.OPENAI_EMBEDDINGS_TOKENS_PER_MINUTE,
+        )
+        _embeddings_rate_limiters[loop] = rate_limiter
+    return rate_limiter
@@ -1,7 +1,10 @@
 import logging
+import re
+import time
+from email.utils import parsedate_to_datetime
 from json import JSONDecodeError
 from types import MappingProxyType
-from typing import Any, Literal, Type
+from typing import Any, Callable, Literal, Type
 
 import httpx
 from fastapi.encoders import jsonable_encoder
@@ -9,10 +12,51 @@ from httpx import ConnectError, ConnectTimeout, HTTPStatusError, ReadTimeout
 from pydantic import ValidationError
 
 from web_app.models import SafeModel
-from web_app.tools import RetryableException
+from web_app.tools import RateLimitedException, RetryableException
 
 logger = logging.getLogger(__name__)
 
+# Durations like "1m30s", "6s" or "20ms", used by OpenAI rate limit headers
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+# Max length of the logged service outputs (embeddings responses can be megabytes)
+_MAX_LOGGED_OUTPUT_LENGTH = 1000
+
+
+def _parse_duration(value: str) -> float | None:
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if parts:
+        return sum(float(x) * _DURATION_UNITS[unit] for x, unit in parts)
+    try:
+        # HTTP-date format of the `Retry-After` header
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_retry_after(headers: httpx.Headers) -> float | None:
+    """
+    Get the time to wait (seconds) before retrying from the rate limit headers.
+    """
+    if "retry-after-ms" in headers:
+        retry_after_ms = _parse_duration(headers["retry-after-ms"])
+        if retry_after_ms is not None:
+            return retry_after_ms / 1000
+    for header in (
+        "retry-after",
+        "x-ratelimit-reset-tokens",
+        "x-ratelimit-reset-requests",
+    ):
+        if header in headers:
+            retry_after = _parse_duration(headers[header])
+            if retry_after is not None:
+                return retry_after
+    return None
+
 
 def _validate_request_input(
     method: Literal["POST", "PATCH", "PUT", "GET"] = "POST",
@@ -37,27 +81,32 @@ def _validate_request_output(
     validator: Type[SafeModel] | None = None,
     validate_list: bool = False,
     label: str = "",
-) -> dict | list[dict]:
+    parser: Callable[[httpx.Response], Any] | None = None,
+) -> Any:
     try:
-        if validator:
+        if parser:
+            # Custom parsing (for example, decoding binary payloads)
+            output = parser(resp)
+        elif validator:
             if validate_list:
                 output = [jsonable_encoder(validator(**x)) for x in resp.json()]  # NOQA
             else:
                 output = jsonable_encoder(validator(**resp.json()))  # NOQA
         else:
             output = resp.json()
-    except (TypeError, ValidationError, JSONDecodeError) as er:
+    except (TypeError, ValueError, ValidationError, JSONDecodeError) as er:
         logger.error(
             f"Can't validate resource ({url}) ({label} | validator: {validator} | "
-            f"validate_list: {validate_list}) "
-            f"output ({resp.text}): {er} ({type(er)})"
+            f"validate_list: {validate_list} | parser: {parser}) "
+            f"output ({resp.text[:_MAX_LOGGED_OUTPUT_LENGTH]}): {er} ({type(er)})"
         )
         raise RetryableException(f"{er}\n{label}")
     except Exception as er:
         # TODO Same as above
         logger.error(
             f"Unexpected error when validating resource ({url}) "
-            "({label}) service output ({resp.text}): {er} ({type(er)})"
+            f"({label}) service output ({resp.text[:_MAX_LOGGED_OUTPUT_LENGTH]}): "
+            f"{er} ({type(er)})"
         )
         raise RetryableException(f"{er}\n{label}")
     return output
@@ -109,6 +158,13 @@ async def _async_request(
         )
         raise RetryableException(f"{er}\n{label}")
     except HTTPStatusError as er:
+        if er.response.status_code == 429:
+            retry_after = _parse_retry_after(er.response.headers)
+            logger.warning(
+                f"Rate limited by the resource ({url}) (async | {label}), "
+                f"retry after: {retry_after}s. Retrying."
+            )
+            raise RateLimitedException(f"{er}\n{label}", retry_after=retry_after)
         logger.error(
             f"Response error from the resource ({url}) (async | {label}): {er} ({type(er)}). Retrying."
         )
@@ -132,7 +188,8 @@ async def async_request_api(
     validator: Type[SafeModel] | None = None,
     validate_list: bool = False,
     method: Literal["POST", "PATCH", "PUT", "GET"] = "POST",
-) -> dict | list[dict]:
+    parser: Callable[[httpx.Response], Any] | None = None,
+) -> Any:
     _validate_request_input(method=method, data=data, json_data=json_data)
     resp = await _async_request(
         client=client,
@@ -150,5 +207,6 @@ async def async_request_api(
         validator=validator,
         validate_list=validate_list,
         label=label,
+        parser=parser,
     )
     return output
@@ -0,0 +1,196 @@
+import logging
+import sqlite3
+import time
+from contextlib import closing
+from functools import lru_cache
+
+import numpy as np
+import shortuuid
+
+from web_app.config import get_settings
+from web_app.models.clusterizer import GroupingPhrasesOutput, StoredGroupingResult
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class GroupingResultNotFoundException(Exception):
+    """
+    Raise when the result doesn't exist, expired or the results store is disabled.
+    """
+
+
+class IncompatibleGroupingResultException(Exception):
+    """
+    Raise when the result was stored with another embeddings model (or dimensions),
+    so its centroids can't be compared with the new embeddings.
+    """
+
+
+class ResultsStore:
+    """
+    Persistent grouping results store (SQLite) with the groups centroids
+    and the singles embeddings, to extend results without re-embedding all the phrases.
+    Unused results expire after the TTL, least recently used ones are evicted
+    when the store exceeds the size limit. Safe to share between multiple processes (workers).
+    """
+
+    def __init__(self, path: str, ttl: int, max_size_bytes: int) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_size_bytes = max_size_bytes
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "result_id TEXT PRIMARY KEY, "
+                "model TEXT NOT NULL, "
+                "dimensions INTEGER NOT NULL, "
+                "engine TEXT NOT NULL, "
+                "output TEXT NOT NULL, "
+                "centroids BLOB NOT NULL, "
+                "singles_embeddings BLOB NOT NULL, "
+                "embeddings_size INTEGER NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+
+    # Stored bytes of a result, mostly the embeddings
+    _ROW_SIZE = (
+        "LENGTH(CAST(output AS BLOB)) + LENGTH(centroids) + LENGTH(singles_embeddings)"
+    )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, wait for other workers to release the lock
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def get(self, result_id: str) -> StoredGroupingResult | None:
+        now = time.time()
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT model, dimensions, engine, output, centroids, "
+                "singles_embeddings, embeddings_size FROM results WHERE result_id = ? AND last_used > ?",
+                (result_id, now - self.ttl),
+            ).fetchone()
+            if not row:
+                return None
+            connection.execute(
+                "UPDATE results SET last_used = ? WHERE result_id = ?",
+                (now, result_id),
+            )
+        (
+            model,
+            dimensions,
+            engine,
+            output,
+            centroids,
+            singles_embeddings,
+            embeddings_size,
+        ) = row
+        return StoredGroupingResult(
+            output=GroupingPhrasesOutput.model_validate_json(output),
+            model=model,
+            dimensions=dimensions or None,
+            engine=engine,
+            centroids=self._load_matrix(centroids, embeddings_size),
+            singles_embeddings=self._load_matrix(singles_embeddings, embeddings_size),
+        )
+
+    def save(self, result: StoredGroupingResult) -> str:
+        """
+        :return: Identifier of the saved result, also set in its output.
+        """
+        result_id = shortuuid.uuid()
+        output = result.output.model_copy(update={"result_id": result_id})
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "INSERT INTO results (result_id, model, dimensions, engine, output, "
+                "centroids, singles_embeddings, embeddings_size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    result_id,
+                    result.model,
+                    result.dimensions or 0,
+                    result.engine,
+                    output.model_dump_json(),
+                    np.ascontiguousarray(result.centroids, dtype=np.float32).tobytes(),
+                    np.ascontiguousarray(
+                        result.singles_embeddings, dtype=np.float32
+                    ).tobytes(),
+                    max(
+                        result.centroids.shape[-1], result.singles_embeddings.shape[-1]
+                    ),
+                    time.time(),
+                ),
+            )
+            self._evict(connection)
+        return result_id
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Remove expired results, then least recently used ones
+        until the store fits the size limit.
+        """
+        evicted = connection.execute(
+            "DELETE FROM results WHERE last_used <= ?", (time.time() - self.ttl,)
+        ).rowcount
+        excess = (
+            connection.execute(
+                f"SELECT COALESCE(SUM({self._ROW_SIZE}), 0) FROM results"
+            ).fetchone()[0]
+            - self.max_size_bytes
+        )
+        if excess > 0:
+            evicted_rows = []
+            for row_id, size in connection.execute(
+                f"SELECT rowid, {self._ROW_SIZE} FROM results ORDER BY last_used"
+            ):
+                evicted_rows.append((row_id,))
+                excess -= size
+                if excess <= 0:
+                    break
+            connection.executemany("DELETE FROM results WHERE rowid = ?", evicted_rows)
+            evicted += len(evicted_rows)
+        if evicted:
+            logger.info(f"Evicted {evicted} stored grouping results.")
+
+    @staticmethod
+    def _load_matrix(data: bytes, embeddings_size: int) -> np.ndarray:
+        return np.frombuffer(data, dtype=np.float32).reshape(-1, embeddings_size)
+
+
+@lru_cache()
+def get_results_store() -> ResultsStore | None:
+    """
+    Prepare and cache the results store, if enabled.
+    """
+    if not settings.results_store.RESULTS_STORE_ENABLED:
+        return None
+    return ResultsStore(
+        path=settings.results_store.RESULTS_STORE_PATH,
+        ttl=settings.results_store.RESULTS_STORE_TTL,
+        max_size_bytes=settings.results_store.RESULTS_STORE_MAX_SIZE_MB * 1024 * 1024,
+    )
+
+
+def get_compatible_result(result_id: str) -> StoredGroupingResult:
+    """
+    :return: Stored result, with centroids comparable to the current embeddings.
+    """
+    results_store = get_results_store()
+    stored = results_store.get(result_id) if results_store else None
+    if not stored:
+        raise GroupingResultNotFoundException(f"Grouping result {result_id} not found.")
+    if (stored.model, stored.dimensions) != (
+        settings.similarity_processor.OPENAI_EMBEDDINGS_MODEL,
+        settings.similarity_processor.OPENAI_EMBEDDINGS_DIMENSIONS,
+    ):
+        raise IncompatibleGroupingResultException(
+            f"Grouping result {result_id} was stored with {stored.model} embeddings "
+            f"({stored.dimensions or 'default'} dimensions)."
+        )
+    return stored
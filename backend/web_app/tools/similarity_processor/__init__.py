@@ -1,7 +1,10 @@
+import base64
+import importlib.util
 import logging
 
 import httpx
 import jmespath
+import numpy as np
 from tenacity import (
     RetryCallState,
     retry,
@@ -12,12 +15,23 @@ from tenacity import (
 )
 
 from web_app.config import get_settings
-from web_app.tools import RetryableException
+from web_app.tools import RateLimitedException, RetryableException
+from web_app.tools.metrics import EMBEDDINGS_RETRIES
+from web_app.tools.rate_limiter import get_embeddings_rate_limiter
 from web_app.tools.requester import async_request_api
+from web_app.tools.similarity_processor.utils import estimate_tokens
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+_default_wait = wait_fixed(1) + wait_random(0, 3)
+
+
+class EmbeddingsUnavailableException(Exception):
+    """
+    Raise when the embeddings can't be retrieved after all the retries.
+    """
+
 
 def failed_get_embeddings(
     retry_state: RetryCallState,
@@ -26,20 +40,107 @@ def failed_get_embeddings(
         f"Couldn't get search request embedding with "
         f"{retry_state.attempt_number} attemps ({round(retry_state.idle_for, 2)}s)."
     )
-    return None
+    # Fail loudly, the caller can't proceed without embeddings
+    raise EmbeddingsUnavailableException(
+        f"Couldn't get embeddings with {retry_state.attempt_number} attempts."
+    )
+
+
+def count_retry(retry_state: RetryCallState) -> None:
+    exception = retry_state.outcome.exception() if retry_state.outcome else None
+    EMBEDDINGS_RETRIES.inc(error=type(exception).__name__)
+
+
+def wait_for_retry(retry_state: RetryCallState) -> float:
+    """
+    Wait as long as the API asked to on rate limits, use the default wait otherwise.
+    """
+    exception = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(exception, RateLimitedException) and exception.retry_after:
+        return exception.retry_after + wait_random(0, 1)(retry_state)
+    return _default_wait(retry_state)
+
+
+def create_embeddings_client() -> httpx.AsyncClient:
+    """
+    Create the long-lived embeddings API client, to share its connection pool
+    (and TLS sessions) between all the requests of the worker.
+    """
+    http2 = settings.similarity_processor.OPENAI_HTTP2
+    if http2 and not importlib.util.find_spec("h2"):
+        logger.warning("HTTP/2 requires `h2` package (httpx[http2]), using HTTP/1.1.")
+        http2 = False
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            settings.similarity_processor.OPENAI_EMBEDDINGS_TIMEOUT, pool=None
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.similarity_processor.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.similarity_processor.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.similarity_processor.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        http2=http2,
+    )
+
+
+def get_client_pool_stats(client: httpx.AsyncClient) -> dict[str, int]:
+    """
+    :return: Connection pool usage of the client (relies on httpcore internals,
+    so returns empty stats if they aren't available).
+    """
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    if pool is None:
+        return {}
+    connections = list(getattr(pool, "connections", []))
+    idle_connections = sum(1 for x in connections if x.is_idle())
+    return {
+        "connections": len(connections),
+        "active_connections": len(connections) - idle_connections,
+        "idle_connections": idle_connections,
+        "queued_requests": len(getattr(pool, "_requests", [])),
+        "max_connections": settings.similarity_processor.OPENAI_MAX_CONNECTIONS,
+    }
+
+
+def parse_base64_embeddings(resp: httpx.Response) -> np.ndarray:
+    """
+    Decode base64-encoded (little-endian float32) embeddings straight into a matrix,
+    without parsing thousands of JSON floats into Python objects.
+    """
+    encoded_embeddings = jmespath.search("data[].embedding", resp.json())
+    if not encoded_embeddings:
+        raise ValueError("No embeddings in the response.")
+    embeddings = [
+        np.frombuffer(base64.b64decode(x, validate=True), dtype="<f4")
+        for x in encoded_embeddings
+    ]
+    if len({len(x) for x in embeddings}) != 1:
+        raise ValueError("Got embeddings of different dimensions in the response.")
+    return np.vstack(embeddings).astype(np.float32, copy=False)
+
+
+def parse_float_embeddings(resp: httpx.Response) -> np.ndarray:
+    """
+    Fallback for APIs that don't support base64, parse JSON float arrays.
+    """
+    embeddings = jmespath.search("data[].embedding", resp.json())
+    if not embeddings:
+        raise ValueError("No embeddings in the response.")
+    return np.asarray(embeddings, dtype=np.float32)
 
 
 @retry(
     retry=retry_if_exception_type(RetryableException),
     stop=stop_after_attempt(5),
-    wait=wait_fixed(1) + wait_random(0, 3),
+    wait=wait_for_retry,
+    before_sleep=count_retry,
     retry_error_callback=failed_get_embeddings,
 )
 async def get_embeddings(
     client: httpx.AsyncClient,
     embeddings_input: list[str],
     label: str = "",
-) -> list[list[float]]:
+) -> np.ndarray:
     input_data: dict[str, str | list[str] | int] = {
         "input": embeddings_input,
         "model": settings.similarity_processor.OPENAI_EMBEDDINGS_MODEL,
@@ -47,22 +148,34 @@ async def get_embeddings(
     dimensions = settings.similarity_processor.OPENAI_EMBEDDINGS_DIMENSIONS
     if dimensions:
         input_data["dimensions"] = dimensions
-    response = await async_request_api(
-        client=client,
-        url=settings.similarity_processor.OPENAI_EMBEDDINGS_URL,
-        method="POST",
-        json_data=input_data,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {settings.similarity_processor.OPENAI_API_KEY}",
-        },
-        label=f"{label} ({embeddings_input})",
-    )
-    embeddings = jmespath.search("data[].embedding", response)
-    if not embeddings:
-        raise RetryableException(
-            f"Couldn't get embeddings for {label} ({embeddings_input}). Retrying."
-        )
+    encoding_format = settings.similarity_processor.OPENAI_EMBEDDINGS_ENCODING_FORMAT
+    if encoding_format == "base64":
+        input_data["encoding_format"] = encoding_format
+    rate_limiter = get_embeddings_rate_limiter()
+    async with rate_limiter.slot(
+        tokens=sum(estimate_tokens(x) for x in embeddings_input)
+    ):
+        try:
+            embeddings = await async_request_api(
+                client=client,
+                url=settings.similarity_processor.OPENAI_EMBEDDINGS_URL,
+                method="POST",
+                json_data=input_data,
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {settings.similarity_processor.OPENAI_API_KEY}",
+                },
+                label=f"{label} ({embeddings_input})",
+                parser=(
+                    parse_base64_embeddings
+                    if encoding_format == "base64"
+                    else parse_float_embeddings
+                ),
+            )
+        except RateLimitedException as er:
+            rate_limiter.on_rate_limited(retry_after=er.retry_after)
+            raise
+    rate_limiter.on_success()
     if len(embeddings) != len(embeddings_input):
         raise RetryableException(
             f"Got {len(embeddings)} embeddings for {len(embeddings_input)} "
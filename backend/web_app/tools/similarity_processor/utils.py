@@ -0,0 +1,9 @@
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough tokens estimate without a tokenizer: ~4 symbols per token,
+    but at least a token per word (short keywords are mostly a token per word).
+    """
+    return max(len(text.split()), math.ceil(len(text) / 4), 1)
@@ -1,28 +1,48 @@
 import { defineStore } from 'pinia'
-import { requestGroupPhrasesAxios } from '@/views/clusterizer/requests'
-import type { GroupingPhrasesOutput, PhrasesGroup } from '@/views/clusterizer/types'
+import { requestGroupPhrasesStream } from '@/views/clusterizer/requests'
+import type { GroupingProgress, PhrasesGroup } from '@/views/clusterizer/types'
 
 export const useClusterizerStore = defineStore('clusterizer', {
   state: () => ({
     loading: false as boolean,
+    progress: null as GroupingProgress | null,
     phrases: [] as string[],
     groups: {} as { [key: string]: PhrasesGroup },
     singles: [] as string[]
   }),
+  getters: {
+    // Progress of the current stage in percents, null if unknown
+    progressPercent: (state) => {
+      if (!state.progress || !state.progress.total) {
+        return null
+      }
+      return Math.round(state.progress.done / state.progress.total * 100)
+    }
+  },
   actions: {
     async requestGroupPhrases() {
       this.loading = true
+      this.progress = null
       this.groups = {}
       this.singles = []
-      await requestGroupPhrasesAxios(this.phrases).then((response) => {
-        const responseData = response.data as GroupingPhrasesOutput
-        this.groups = responseData.groups
-        this.singles = responseData.singles
+      await requestGroupPhrasesStream(this.phrases, (message) => {
+        if (message.event === 'progress') {
+          this.progress = message.data
+        } else if (message.event === 'groups') {
+          // Show settled groups while the remaining phrases are still clustered
+          Object.assign(this.groups, message.data.groups)
+        } else if (message.event === 'result') {
+          this.groups = message.data.groups
+          this.singles = message.data.singles
+        } else if (message.event === 'error') {
+          console.error(`Error when grouping phrases: ${message.data.detail}`)
+        }
       }).catch(error => {
         console.error(`Error when grouping phrases: ${error}`)
       })
         .finally(() => {
           this.loading = false
+          this.progress = null
         })
     }
   }
@@ -1,4 +1,5 @@
 import axios from '@axios'
+import type { GroupingStreamEvent } from '@/views/clusterizer/types'
 
 export const requestGroupPhrasesAxios = async (
   phrases: string[]
@@ -9,3 +10,46 @@ export const requestGroupPhrasesAxios = async (
       { phrases }
     )
 }
+
+// Axios can't read the response while it's streamed, so use fetch to read Server-Sent Events
+export const requestGroupPhrasesStream = async (
+  phrases: string[],
+  onEvent: (event: GroupingStreamEvent) => void
+) => {
+  const response = await fetch(
+    `${axios.defaults.baseURL}/clusterizer/group/stream/`,
+    {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ phrases })
+    }
+  )
+  if (!response.ok || !response.body) {
+    throw new Error(`Grouping request failed with status ${response.status}`)
+  }
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+  let buffer = ''
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) {
+      break
+    }
+    buffer += value
+    // Messages are separated by an empty line
+    let separatorIndex
+    while ((separatorIndex = buffer.indexOf('\n\n')) !== -1) {
+      const message = buffer.slice(0, separatorIndex)
+      buffer = buffer.slice(separatorIndex + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event: ')) {
+          event = line.slice(7)
+        } else if (line.startsWith('data: ')) {
+          data += line.slice(6)
+        }
+      }
+      onEvent({ event, data: JSON.parse(data) } as GroupingStreamEvent)
+    }
+  }
+}
@@ -6,4 +6,22 @@ export interface PhrasesGroup {
 export interface GroupingPhrasesOutput {
   groups: { [key: string]: PhrasesGroup }; // Grouped phrases.
   singles: string[]; // Phrases that weren't grouped.
+  result_id: string | null; // Stored result to add phrases to later.
 }
+
+export interface GroupingProgress {
+  stage: string; // "embeddings" or "clustering".
+  done: number; // Processed items of the stage.
+  total: number; // Total items of the stage.
+  iteration: number | null; // Clustering pass.
+}
+
+export interface GroupingGroupsEvent {
+  groups: { [key: string]: PhrasesGroup }; // Groups that won't change anymore.
+}
+
+export type GroupingStreamEvent =
+  | { event: 'progress'; data: GroupingProgress }
+  | { event: 'groups'; data: GroupingGroupsEvent }
+  | { event: 'result'; data: GroupingPhrasesOutput }
+  | { event: 'error'; data: { detail: string } };